@@ -12,6 +12,7 @@ CREATE TABLE cities (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     name_en VARCHAR(100),
+    slug VARCHAR(50) UNIQUE, -- код города в CityResolver
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -22,6 +23,7 @@ CREATE TABLE search_queries (
     query TEXT NOT NULL,
     query_type query_type,
     city_id INTEGER REFERENCES cities(id),
+    canonical_id INTEGER REFERENCES search_queries(id), -- канонический вариант почти одинаковых запросов
     created_at TIMESTAMPTZ DEFAULT NOW(),
     UNIQUE(query, city_id)
 );
@@ -75,16 +77,21 @@ CREATE TABLE position_changes (
     id SERIAL PRIMARY KEY,
     query_id INTEGER REFERENCES search_queries(id),
     date DATE NOT NULL,
+    period VARCHAR(10) NOT NULL DEFAULT 'day', -- day, week
     old_position FLOAT NOT NULL,
     new_position FLOAT NOT NULL,
+    position_change FLOAT NOT NULL, -- old_position - new_position
     change_percent FLOAT NOT NULL,
-    created_at TIMESTAMPTZ DEFAULT NOW()
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE(query_id, date, period)
 );
 
 -- Create anomalies table for tracking unusual patterns
 CREATE TABLE anomalies (
     id SERIAL PRIMARY KEY,
     query_id INTEGER REFERENCES search_queries(id),
+    query TEXT,
+    city_id INTEGER REFERENCES cities(id),
     date DATE NOT NULL,
     metric_type VARCHAR(50) NOT NULL, -- clicks, impressions, position, ctr
     expected_value FLOAT NOT NULL,
@@ -95,12 +102,14 @@ CREATE TABLE anomalies (
 
 -- Indexes
 CREATE INDEX idx_search_queries_city ON search_queries(city_id);
+CREATE INDEX idx_search_queries_canonical ON search_queries(canonical_id);
 CREATE INDEX idx_daily_metrics_date ON daily_metrics(date);
 CREATE INDEX idx_daily_metrics_query ON daily_metrics(query_id);
 CREATE INDEX idx_weekly_metrics_date ON weekly_metrics(week_start);
 CREATE INDEX idx_monthly_metrics_date ON monthly_metrics(month_start);
 CREATE INDEX idx_position_changes_date ON position_changes(date);
 CREATE INDEX idx_anomalies_date ON anomalies(date);
+CREATE INDEX idx_position_changes_date_magnitude ON position_changes(date, period, ABS(position_change) DESC);
 
 -- Functions for automatic updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
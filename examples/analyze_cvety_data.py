@@ -6,64 +6,19 @@ import pandas as pd
 
 from src.collectors.gsc_collector import GSCCollector
 from src.analytics import GSCAnalyzer, Period, Dimension
+from src.utils.city_resolver import city_resolver
 from src.utils.logger import setup_logger
+from src.utils.query_classifier import get_query_type
 
 logger = setup_logger(__name__)
 
 
 def categorize_query(query):
-    # Список городов и их вариации
-    cities = {
-        'алматы': ['алматы', 'almaty'],
-        'астана': ['астана', 'astana', 'нур-султан'],
-        'шымкент': ['шымкент', 'shymkent'],
-        'караганда': ['караганда', 'karaganda'],
-        'костанай': ['костанай', 'kostanay'],
-        'павлодар': ['павлодар', 'pavlodar'],
-        'актау': ['актау', 'aktau'],
-        'актобе': ['актобе', 'aktobe'],
-        'атырау': ['атырау', 'atyrau'],
-        'кокшетау': ['кокшетау', 'kokshetau'],
-        'семей': ['семей', 'semey'],
-        'тараз': ['тараз', 'taraz'],
-        'уральск': ['уральск', 'uralsk'],
-        'усть-каменогорск': ['усть-каменогорск', 'ust-kamenogorsk'],
-        'петропавловск': ['петропавловск', 'petropavlovsk']
-    }
-    
-    # Типы запросов
-    query_types = [
-        'доставка цветов',
-        'цветы',
-        'купить цветы',
-        'заказать цветы',
-        'магазин цветов',
-        'букеты'
-    ]
-    
-    query = query.lower()
-    
-    # Определяем город
-    city = None
-    for city_name, variants in cities.items():
-        if any(variant in query for variant in variants):
-            city = city_name
-            break
-    
+    city = city_resolver.resolve_query(query)
     if not city:
         return None, None
     
-    # Определяем тип запроса
-    query_type = None
-    for qtype in query_types:
-        if qtype in query:
-            query_type = qtype
-            break
-    
-    if not query_type:
-        query_type = 'другое'
-    
-    return city, query_type
+    return city.name.lower(), get_query_type(query)
 
 def analyze_city_queries(df):
     # Создаем новые колонки для города и типа запроса
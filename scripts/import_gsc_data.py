@@ -11,6 +11,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
+from src.utils.city_resolver import city_resolver
+from src.utils.query_classifier import get_query_category
+
 def connect_to_db():
     """Подключение к базе данных"""
     return psycopg2.connect(
@@ -21,47 +24,6 @@ def connect_to_db():
         port="6543"
     )
 
-def categorize_query(query):
-    """Категоризация запроса"""
-    query = query.lower()
-    
-    if any(word in query for word in ['доставка', 'delivery', 'заказать']):
-        return 'delivery'
-    elif any(word in query for word in ['букет', 'bouquet']):
-        return 'bouquets'
-    elif any(word in query for word in ['подарок', 'подарить', 'gift']):
-        return 'gifts'
-    elif any(word in query for word in ['цветы', 'розы', 'пионы', 'flowers', 'roses']):
-        return 'flowers'
-    else:
-        return 'other'
-
-def extract_city(query):
-    """Извлечение города из запроса"""
-    cities = {
-        'алматы': 'Алматы',
-        'астана': 'Астана',
-        'нур-султан': 'Астана',
-        'шымкент': 'Шымкент',
-        'караганда': 'Караганда',
-        'костанай': 'Костанай',
-        'павлодар': 'Павлодар',
-        'актобе': 'Актобе',
-        'тараз': 'Тараз',
-        'семей': 'Семей',
-        'атырау': 'Атырау',
-        'almaty': 'Алматы',
-        'astana': 'Астана',
-        'shymkent': 'Шымкент',
-        'karaganda': 'Караганда'
-    }
-    
-    query = query.lower()
-    for city_key, city_name in cities.items():
-        if city_key in query:
-            return city_name
-    return None
-
 def add_cities(cursor):
     """Добавление городов из запросов"""
     cities = {
@@ -104,9 +66,9 @@ def process_queries(cursor, city_ids):
     
     for _, row in df.iterrows():
         query = row['Top queries']
-        city = extract_city(query)
-        city_id = city_ids.get(city) if city else None
-        query_type = categorize_query(query)
+        city = city_resolver.resolve_query(query)
+        city_id = city_ids.get(city.name) if city else None
+        query_type = get_query_category(query)
         
         print(f"Обрабатываем запрос [{query_type}]: {query}")
         
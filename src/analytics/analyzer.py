@@ -1,15 +1,40 @@
 """
 Основной интерфейс для аналитических модулей.
 """
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
 
 from src.database.supabase_client import SupabaseClient
 from src.analytics.position_analysis import PositionAnalyzer
 from src.analytics.ctr_analysis import CTRAnalyzer
+from src.analytics.ctr_curve import CTRCurve
 from src.analytics.page_analysis import PageAnalyzer
 
+def _analyze_url_chunk(
+    curve: CTRCurve,
+    items: List[Tuple[str, pd.DataFrame, Optional[Dict]]]
+) -> List[Tuple[str, Dict, Dict]]:
+    """
+    Анализ CTR и страницы для части URL в отдельном процессе.
+    
+    Анализаторы создаются без клиента БД: все данные, включая строки
+    page_facts, уже загружены.
+    """
+    ctr_analyzer = CTRAnalyzer(None, curve)
+    page_analyzer = PageAnalyzer(None, facts={})
+    return [
+        (url, ctr_analyzer.analyze_ctr_data(data), page_analyzer.analyze_page_data(data, facts))
+        for url, data, facts in items
+    ]
+
 class SEOAnalyzer:
+    # Минимальное число URL, при котором имеет смысл запускать процессы
+    PARALLEL_MIN_URLS = 50
+    
     def __init__(self, db_client: SupabaseClient):
         """
         Инициализация основного анализатора.
@@ -24,14 +49,20 @@ class SEOAnalyzer:
     def analyze_category(
         self,
         category: str,
-        days: int = 30
+        days: int = 30,
+        workers: Optional[int] = None
     ) -> Dict:
         """
         Комплексный анализ категории.
         
+        Данные по всем URL категории загружаются одним запросом и
+        используются анализаторами CTR и страниц совместно.
+        
         Args:
             category: Категория для анализа
             days: Количество дней для анализа
+            workers: Количество процессов (по умолчанию по числу CPU,
+                     1 - без пула процессов)
             
         Returns:
             Словарь с результатами анализа
@@ -42,21 +73,9 @@ class SEOAnalyzer:
             days=days
         )
         
-        # Анализ CTR для каждого URL в категории
-        ctr_analysis = {}
-        for url in position_analysis['affected_urls']:
-            ctr_analysis[url] = self.ctr_analyzer.analyze_ctr(
-                url=url,
-                days=days
-            )
-            
-        # Анализ страниц
-        page_analysis = {}
-        for url in position_analysis['affected_urls']:
-            page_analysis[url] = self.page_analyzer.analyze_page(
-                url=url,
-                days=days
-            )
+        urls = position_analysis['affected_urls']
+        data = self.ctr_analyzer.load_data(urls, days)
+        ctr_analysis, page_analysis = self._analyze_urls(urls, data, workers)
             
         # Агрегируем результаты
         return {
@@ -75,6 +94,46 @@ class SEOAnalyzer:
             )
         }
         
+    def _analyze_urls(
+        self,
+        urls: List[str],
+        data: pd.DataFrame,
+        workers: Optional[int] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        Анализ CTR и страниц по загруженным данным.
+        
+        Returns:
+            Кортеж (ctr_analysis, page_analysis) со словарями {url: результат}
+        """
+        groups = dict(tuple(data.groupby('url'))) if not data.empty else {}
+        items = [
+            (url, groups.get(url, data.iloc[0:0]), self.page_analyzer.get_page_facts(url))
+            for url in urls
+        ]
+        
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(items) < self.PARALLEL_MIN_URLS:
+            results = _analyze_url_chunk(self.ctr_analyzer.curve, items)
+        else:
+            # Делим URL на части, чтобы не передавать задачи по одной
+            chunk_size = -(-len(items) // (workers * 4))
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = [
+                    result
+                    for chunk_results in pool.map(
+                        _analyze_url_chunk,
+                        [self.ctr_analyzer.curve] * len(chunks),
+                        chunks
+                    )
+                    for result in chunk_results
+                ]
+                
+        ctr_analysis = {url: ctr for url, ctr, _ in results}
+        page_analysis = {url: page for url, _, page in results}
+        return ctr_analysis, page_analysis
+        
     def _generate_summary(
         self,
         position_analysis: Dict,
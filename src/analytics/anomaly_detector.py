@@ -0,0 +1,251 @@
+"""
+Потоковое обнаружение аномалий в ежедневных метриках.
+
+Ряды строятся по search_queries_daily, которую заполняет ежедневный сбор.
+Для каждого ряда (запрос, город, метрика) в таблице anomaly_state хранится
+экспоненциально взвешенное среднее и дисперсия. Строки без города
+относятся к city_id 0. Новый день обновляет
+состояние за O(1) на ряд, а значения, отклонившиеся от ожидаемого больше
+чем на threshold стандартных отклонений, записываются в таблицу anomalies.
+Повторная обработка уже учтенного дня ничего не меняет.
+"""
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class StreamingAnomalyDetector:
+    """Инкрементальный детектор аномалий на основе EWMA."""
+
+    METRICS = ['clicks', 'impressions', 'position', 'ctr']
+    # Ключ ряда: текст запроса и город стабильны между днями, в отличие от id строк
+    KEYS = ['query', 'city_id']
+    STATE_COLUMNS = KEYS + ['metric', 'mean', 'var', 'n', 'last_date']
+
+    def __init__(
+        self,
+        db: PostgresClient,
+        alpha: float = 0.1,
+        threshold: float = 3.0,
+        warmup: int = 7,
+        min_std_ratio: float = 0.1
+    ):
+        """
+        Инициализация детектора.
+
+        Args:
+            db: Клиент базы данных
+            alpha: Вес нового наблюдения в EWMA
+            threshold: Порог отклонения в стандартных отклонениях
+            warmup: Количество наблюдений до начала поиска аномалий
+            min_std_ratio: Минимальное отклонение как доля среднего,
+                           чтобы почти постоянные ряды не давали ложных срабатываний
+        """
+        self.db = db
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_std_ratio = min_std_ratio
+
+    def process_date(self, day: date) -> int:
+        """
+        Обработка метрик за один день.
+
+        Args:
+            day: Дата загруженных метрик
+
+        Returns:
+            int: Количество найденных аномалий
+        """
+        # Строки одного запроса и города по разным страницам сводятся в одну
+        rows = self.db.fetch_all("""
+            SELECT
+                query,
+                COALESCE(city_id, 0) as city_id,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions,
+                SUM(position * impressions) / NULLIF(SUM(impressions), 0) as position,
+                SUM(clicks)::float / NULLIF(SUM(impressions), 0) as ctr
+            FROM search_queries_daily
+            WHERE date = %s
+            GROUP BY 1, 2
+        """, (day,))
+        if not rows:
+            return 0
+
+        observations = pd.DataFrame(rows, columns=self.KEYS + self.METRICS)
+        state = self._load_state(observations['query'].unique().tolist())
+
+        new_state, anomalies = self.step(state, observations, day)
+        self._save(new_state, anomalies)
+
+        logger.info(
+            f"Аномалии за {day}: обновлено рядов {len(new_state)}, "
+            f"найдено аномалий {len(anomalies)}"
+        )
+        return len(anomalies)
+
+    def process_pending(self, max_days: int = 90) -> int:
+        """
+        Обработка всех дней, загруженных после последнего запуска.
+
+        Args:
+            max_days: Глубина истории при первом запуске
+
+        Returns:
+            int: Количество найденных аномалий
+        """
+        watermark = self.db.fetch_one(
+            "SELECT MAX(last_date) as last_date FROM anomaly_state"
+        )
+        last_date = watermark['last_date'] if watermark else None
+        if last_date is None:
+            last_date = date.today() - timedelta(days=max_days + 1)
+
+        days = self.db.fetch_all("""
+            SELECT DISTINCT date
+            FROM search_queries_daily
+            WHERE date > %s
+            ORDER BY date
+        """, (last_date,))
+
+        return sum(self.process_date(row['date']) for row in days)
+
+    def step(
+        self,
+        state: pd.DataFrame,
+        observations: pd.DataFrame,
+        day: date
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Векторизованное обновление состояния новыми наблюдениями.
+
+        Args:
+            state: Текущее состояние (колонки STATE_COLUMNS)
+            observations: Метрики за день (KEYS и METRICS)
+            day: Дата наблюдений
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Обновленное состояние затронутых
+            рядов и найденные аномалии (query, city_id, date, metric_type,
+            expected_value, actual_value, deviation_percent)
+        """
+        long = observations.melt(
+            id_vars=self.KEYS,
+            value_vars=self.METRICS,
+            var_name='metric',
+            value_name='value'
+        ).dropna(subset=['value'])
+
+        merged = long.merge(
+            state.astype({'city_id': int}),
+            on=self.KEYS + ['metric'],
+            how='left'
+        )
+        # Уже учтенные дни пропускаем, чтобы повторная загрузка не искажала состояние
+        merged = merged[~(merged['last_date'] >= day)]
+
+        value = merged['value'].astype(float).to_numpy()
+        mean = merged['mean'].astype(float).to_numpy()
+        var = merged['var'].astype(float).fillna(0.0).to_numpy()
+        n = merged['n'].fillna(0).astype(int).to_numpy()
+        is_new = n == 0
+
+        # Отклонение считаем до обновления состояния
+        std = np.maximum(np.sqrt(var), self.min_std_ratio * np.abs(mean))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.abs(value - mean) / std
+        is_anomaly = (n >= self.warmup) & (std > 0) & (z > self.threshold)
+
+        diff = np.where(is_new, 0.0, value - mean)
+        increment = self.alpha * diff
+        new_mean = np.where(is_new, value, mean + increment)
+        new_var = np.where(is_new, 0.0, (1 - self.alpha) * (var + diff * increment))
+
+        new_state = pd.DataFrame({
+            'query': merged['query'].to_numpy(),
+            'city_id': merged['city_id'].to_numpy(),
+            'metric': merged['metric'].to_numpy(),
+            'mean': new_mean,
+            'var': new_var,
+            'n': n + 1,
+            'last_date': day
+        })
+
+        expected = mean[is_anomaly]
+        actual = value[is_anomaly]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.where(expected != 0, (actual - expected) / np.abs(expected) * 100, 0.0)
+        anomalies = pd.DataFrame({
+            'query': merged['query'].to_numpy()[is_anomaly],
+            'city_id': merged['city_id'].to_numpy()[is_anomaly],
+            'date': day,
+            'metric_type': merged['metric'].to_numpy()[is_anomaly],
+            'expected_value': expected,
+            'actual_value': actual,
+            'deviation_percent': deviation
+        })
+
+        return new_state, anomalies
+
+    def _load_state(self, queries: List[str]) -> pd.DataFrame:
+        """Загрузка состояния для рядов из списка запросов."""
+        rows = self.db.fetch_all(f"""
+            SELECT {', '.join(self.STATE_COLUMNS)}
+            FROM anomaly_state
+            WHERE query = ANY(%s)
+        """, (list(queries),))
+        return pd.DataFrame(rows, columns=self.STATE_COLUMNS)
+
+    def _save(self, state: pd.DataFrame, anomalies: pd.DataFrame) -> None:
+        """Сохранение состояния и аномалий в одной транзакции."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                if not state.empty:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO anomaly_state (
+                            query, city_id, metric, mean, var, n, last_date
+                        )
+                        VALUES %s
+                        ON CONFLICT (query, city_id, metric)
+                        DO UPDATE SET
+                            mean = EXCLUDED.mean,
+                            var = EXCLUDED.var,
+                            n = EXCLUDED.n,
+                            last_date = EXCLUDED.last_date,
+                            updated_at = CURRENT_TIMESTAMP
+                        """,
+                        [
+                            (row.query, int(row.city_id), row.metric, float(row.mean),
+                             float(row.var), int(row.n), row.last_date)
+                            for row in state.itertuples(index=False)
+                        ]
+                    )
+
+                if not anomalies.empty:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO anomalies (
+                            query, city_id, date, metric_type, expected_value,
+                            actual_value, deviation_percent
+                        )
+                        VALUES %s
+                        """,
+                        [
+                            (row.query, int(row.city_id) or None, row.date, row.metric_type,
+                             float(row.expected_value), float(row.actual_value),
+                             float(row.deviation_percent))
+                            for row in anomalies.itertuples(index=False)
+                        ]
+                    )
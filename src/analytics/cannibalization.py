@@ -0,0 +1,295 @@
+"""
+Поиск каннибализации ключевых слов.
+
+По фактам «страница x запрос» строится инвертированный индекс: для каждого
+запроса - список наших страниц, получавших по нему показы. Запрос считается
+каннибализированным, если показы делят несколько страниц или лучшая
+страница в выдаче меняется изо дня в день. Все оценки считаются одним
+векторизованным проходом по индексу, результаты сохраняются в таблицу
+keyword_cannibalization для еженедельного отчета.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class QueryPageIndex:
+    """Инвертированный индекс запрос -> страницы.
+
+    Пары (запрос, страница) отсортированы по запросу и убыванию показов:
+    страницы запроса q занимают позиции offsets[q]:offsets[q + 1], первой
+    идет основная страница. row_queries и row_pages - коды запроса и
+    страницы для каждой строки исходных фактов.
+    """
+    queries: np.ndarray
+    pages: np.ndarray
+    offsets: np.ndarray
+    page_codes: np.ndarray
+    impressions: np.ndarray
+    clicks: np.ndarray
+    row_queries: np.ndarray
+    row_pages: np.ndarray
+
+    @classmethod
+    def build(cls, facts: pd.DataFrame) -> 'QueryPageIndex':
+        """
+        Построение индекса по фактам.
+
+        Args:
+            facts: DataFrame с колонками query, page_url, clicks, impressions
+
+        Returns:
+            QueryPageIndex: Индекс
+        """
+        query_codes, queries = pd.factorize(facts['query'], sort=True)
+        page_codes, pages = pd.factorize(facts['page_url'])
+        pairs = (
+            pd.DataFrame({
+                'q': query_codes,
+                'p': page_codes,
+                'impressions': facts['impressions'].to_numpy(dtype=np.int64),
+                'clicks': facts['clicks'].to_numpy(dtype=np.int64)
+            })
+            .groupby(['q', 'p'], as_index=False, sort=False)[['impressions', 'clicks']].sum()
+            .sort_values(['q', 'impressions'], ascending=[True, False], kind='stable')
+        )
+        offsets = np.searchsorted(pairs['q'].to_numpy(), np.arange(len(queries) + 1))
+        return cls(
+            queries=np.asarray(queries, dtype=object),
+            pages=np.asarray(pages, dtype=object),
+            offsets=offsets,
+            page_codes=pairs['p'].to_numpy(),
+            impressions=pairs['impressions'].to_numpy(),
+            clicks=pairs['clicks'].to_numpy(),
+            row_queries=query_codes,
+            row_pages=page_codes
+        )
+
+    def pages_of(self, query: str) -> list:
+        """Страницы запроса в порядке убывания показов."""
+        position = np.searchsorted(self.queries, query)
+        if position == len(self.queries) or self.queries[position] != query:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.pages[self.page_codes[start:end]].tolist()
+
+
+class CannibalizationDetector:
+    """Детектор каннибализации ключевых слов."""
+
+    COLUMNS = [
+        'query', 'primary_url', 'competing_urls', 'pages_count', 'impressions',
+        'clicks', 'impression_split', 'position_swaps', 'swap_rate', 'score'
+    ]
+
+    def __init__(
+        self,
+        db: Optional[PostgresClient] = None,
+        min_share: float = 0.1,
+        min_split: float = 0.3,
+        min_swaps: int = 2,
+        min_impressions: int = 20
+    ):
+        """
+        Инициализация детектора.
+
+        Args:
+            db: Клиент базы данных
+            min_share: Минимальная доля показов запроса, при которой страница
+                       считается конкурирующей
+            min_split: Минимальная степень разделения показов (1 - индекс
+                       Херфиндаля по долям страниц)
+            min_swaps: Минимальное количество смен лучшей страницы
+            min_impressions: Минимум показов запроса за период
+        """
+        self.db = db
+        self.min_share = min_share
+        self.min_split = min_split
+        self.min_swaps = min_swaps
+        self.min_impressions = min_impressions
+
+    def detect(self, facts: pd.DataFrame) -> pd.DataFrame:
+        """
+        Поиск каннибализированных запросов.
+
+        Args:
+            facts: Дневные факты с колонками date, query, page_url,
+                   clicks, impressions, position
+
+        Returns:
+            pd.DataFrame: Запросы с колонками COLUMNS по убыванию score
+        """
+        facts = facts[facts['impressions'] > 0].dropna(subset=['query', 'page_url'])
+        if facts.empty:
+            return pd.DataFrame(columns=self.COLUMNS)
+
+        index = QueryPageIndex.build(facts)
+        starts = index.offsets[:-1]
+        pair_query = np.repeat(np.arange(len(index.queries)), np.diff(index.offsets))
+
+        total_impressions = np.add.reduceat(index.impressions, starts)
+        total_clicks = np.add.reduceat(index.clicks, starts)
+        share = index.impressions / total_impressions[pair_query]
+        significant = share >= self.min_share
+        pages_count = np.add.reduceat(significant.astype(int), starts)
+        # 0 для одной страницы, 1 - 1/k при равном делении между k страницами
+        split = 1.0 - np.add.reduceat(share ** 2, starts)
+
+        swaps, days = self._position_swaps(facts, index, significant)
+        swap_rate = swaps / np.maximum(days - 1, 1)
+
+        flagged = (
+            (pages_count >= 2)
+            & (total_impressions >= self.min_impressions)
+            & ((split >= self.min_split) | (swaps >= self.min_swaps))
+        )
+        # Показы, которые рискует недополучить основная страница
+        score = total_impressions * (split + swap_rate) / 2
+
+        rows = np.flatnonzero(flagged)
+        result = pd.DataFrame({
+            'query': index.queries[rows],
+            'primary_url': index.pages[index.page_codes[starts[rows]]],
+            'competing_urls': [
+                index.pages[
+                    index.page_codes[start + 1:end][significant[start + 1:end]]
+                ].tolist()
+                for start, end in zip(starts[rows], index.offsets[rows + 1])
+            ],
+            'pages_count': pages_count[rows],
+            'impressions': total_impressions[rows],
+            'clicks': total_clicks[rows],
+            'impression_split': split[rows],
+            'position_swaps': swaps[rows],
+            'swap_rate': swap_rate[rows],
+            'score': score[rows]
+        }, columns=self.COLUMNS)
+        return result.sort_values('score', ascending=False, ignore_index=True)
+
+    @staticmethod
+    def _position_swaps(
+        facts: pd.DataFrame,
+        index: QueryPageIndex,
+        significant: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Количество смен лучшей по позиции страницы и дней с данными по запросам.
+
+        Учитываются только страницы с заметной долей показов, чтобы случайные
+        показы второстепенных страниц не давали ложных смен.
+        """
+        pair_query = np.repeat(np.arange(len(index.queries)), np.diff(index.offsets))
+        # Код пары (запрос, страница) для сравнения строк с парами индекса
+        n_pages = len(index.pages)
+        kept = pair_query[significant] * n_pages + index.page_codes[significant]
+        mask = np.isin(index.row_queries.astype(np.int64) * n_pages + index.row_pages, kept)
+
+        daily = pd.DataFrame({
+            'q': index.row_queries[mask],
+            'p': index.row_pages[mask],
+            'date': facts['date'].to_numpy()[mask],
+            'position': facts['position'].to_numpy(dtype=float)[mask],
+            'impressions': facts['impressions'].to_numpy()[mask]
+        })
+        # Лучшая страница дня: минимальная позиция, при равенстве - больше показов
+        top = (
+            daily.sort_values(['q', 'date', 'position', 'impressions'],
+                              ascending=[True, True, True, False])
+            .drop_duplicates(['q', 'date'])
+        )
+        q = top['q'].to_numpy()
+        p = top['p'].to_numpy()
+        changed = np.r_[False, (q[1:] == q[:-1]) & (p[1:] != p[:-1])]
+
+        n = len(index.queries)
+        swaps = np.bincount(q, weights=changed, minlength=n).astype(int)
+        days = np.bincount(q, minlength=n)
+        return swaps, days
+
+    def load_facts(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Дневные факты «страница x запрос» из search_queries_daily.
+
+        Строки разных городов по одной странице суммируются, позиция
+        усредняется с весом по показам.
+        """
+        rows = self.db.fetch_all("""
+            SELECT
+                date,
+                query,
+                page_url,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions,
+                SUM(position * impressions) / NULLIF(SUM(impressions), 0) as position
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+                AND page_url IS NOT NULL
+            GROUP BY date, query, page_url
+        """, (start_date, end_date))
+        return pd.DataFrame(
+            rows,
+            columns=['date', 'query', 'page_url', 'clicks', 'impressions', 'position']
+        )
+
+    def run(self, days: int = 28, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Поиск каннибализации за последние days дней и сохранение результата.
+
+        Args:
+            days: Длина периода
+            end_date: Последний день периода (по умолчанию вчера)
+
+        Returns:
+            pd.DataFrame: Найденные запросы
+        """
+        end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+        start_date = end_date - timedelta(days=days - 1)
+
+        result = self.detect(self.load_facts(start_date, end_date))
+        self.save(result, start_date, end_date)
+
+        logger.info(f"Каннибализация за {start_date} - {end_date}: {len(result)} запросов")
+        return result
+
+    def save(self, result: pd.DataFrame, period_start: date, period_end: date) -> None:
+        """Сохранение результата; повторный запуск за тот же день заменяет его."""
+        detected_at = datetime.now().date()
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM keyword_cannibalization WHERE detected_at = %s",
+                    (detected_at,)
+                )
+                if result.empty:
+                    return
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO keyword_cannibalization (
+                        detected_at, period_start, period_end, query, primary_url,
+                        competing_urls, pages_count, impressions, clicks,
+                        impression_split, position_swaps, score
+                    )
+                    VALUES %s
+                    """,
+                    [
+                        (
+                            detected_at, period_start, period_end, row.query,
+                            row.primary_url, list(row.competing_urls),
+                            int(row.pages_count), int(row.impressions), int(row.clicks),
+                            float(row.impression_split), int(row.position_swaps),
+                            float(row.score)
+                        )
+                        for row in result.itertuples(index=False)
+                    ]
+                )
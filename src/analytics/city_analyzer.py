@@ -1,8 +1,10 @@
 """Модуль для анализа поисковых запросов по городам."""
-import os
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
 
+import pandas as pd
+
+from src.analytics.ctr_curve import CTRCurve
 from src.database.postgres_client import PostgresClient
 from src.utils.logger import setup_logger
 
@@ -10,134 +12,290 @@ logger = setup_logger(__name__)
 
 class CityAnalyzer:
     """Анализатор поисковых запросов по городам."""
-    
-    def __init__(self):
-        """Инициализация анализатора."""
-        self.db = PostgresClient()
-            
+
+    # Максимум городов, детализируемых одновременно
+    MAX_WORKERS = 8
+
+    def __init__(self, db: Optional[PostgresClient] = None):
+        """Инициализация анализатора.
+
+        Args:
+            db: Клиент базы данных (по умолчанию новый PostgresClient)
+        """
+        self.db = db or PostgresClient()
+
     def analyze_cities(self, days: int = 30) -> Dict[str, Any]:
         """Анализ запросов по городам.
-        
+
+        Статистика берется из сводок city_daily_stats и city_query_activity,
+        которые обновляются при загрузке данных.
+
         Args:
             days: Количество дней для анализа
-            
+
         Returns:
             Dict с результатами анализа по городам
         """
         logger.info(f"Анализируем данные за последние {days} дней")
-        
+
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
-                # Получаем статистику по городам
-                query = """
+                cur.execute("""
                     WITH city_stats AS (
-                        SELECT 
-                            CASE 
-                                WHEN query_type LIKE '%%almaty%%' THEN 'almaty'
-                                WHEN query_type LIKE '%%astana%%' THEN 'astana'
-                                WHEN query_type LIKE '%%shymkent%%' THEN 'shymkent'
-                                WHEN query_type LIKE '%%karaganda%%' THEN 'karaganda'
-                                WHEN query_type LIKE '%%pavlodar%%' THEN 'pavlodar'
-                                WHEN query_type LIKE '%%kostanay%%' THEN 'kostanay'
-                                ELSE 'other'
-                            END as city,
-                            COUNT(DISTINCT query) as query_count,
-                            COALESCE(SUM(clicks), 0) as total_clicks,
-                            COALESCE(SUM(impressions), 0) as total_impressions,
-                            COALESCE(AVG(position), 0) as avg_position,
-                            COALESCE(AVG(CASE WHEN impressions > 0 THEN clicks::float / impressions ELSE 0 END), 0) as avg_ctr
-                        FROM search_queries
-                        WHERE date_collected >= CURRENT_DATE - INTERVAL '%s days'
-                        GROUP BY 
-                            CASE 
-                                WHEN query_type LIKE '%%almaty%%' THEN 'almaty'
-                                WHEN query_type LIKE '%%astana%%' THEN 'astana'
-                                WHEN query_type LIKE '%%shymkent%%' THEN 'shymkent'
-                                WHEN query_type LIKE '%%karaganda%%' THEN 'karaganda'
-                                WHEN query_type LIKE '%%pavlodar%%' THEN 'pavlodar'
-                                WHEN query_type LIKE '%%kostanay%%' THEN 'kostanay'
-                                ELSE 'other'
-                            END
+                        SELECT
+                            COALESCE(c.slug, 'other') as city,
+                            SUM(r.clicks) as total_clicks,
+                            SUM(r.impressions) as total_impressions,
+                            SUM(r.position_sum) / NULLIF(SUM(r.row_count), 0) as avg_position,
+                            SUM(r.ctr_sum) / NULLIF(SUM(r.row_count), 0) as avg_ctr
+                        FROM city_daily_stats r
+                        LEFT JOIN cities c ON c.id = r.city_id
+                        WHERE r.date >= CURRENT_DATE - %(days)s
+                        GROUP BY 1
+                    ),
+                    city_queries AS (
+                        SELECT
+                            COALESCE(c.slug, 'other') as city,
+                            COUNT(DISTINCT a.query) as query_count
+                        FROM city_query_activity a
+                        LEFT JOIN cities c ON c.id = a.city_id
+                        WHERE a.last_seen >= CURRENT_DATE - %(days)s
+                        GROUP BY 1
                     )
-                    SELECT 
-                        city,
-                        query_count,
-                        total_clicks,
-                        total_impressions,
-                        ROUND(avg_position::numeric, 2) as avg_position,
-                        ROUND((avg_ctr * 100)::numeric, 2) as ctr_percentage
-                    FROM city_stats
-                    ORDER BY total_impressions DESC
-                """
-                
-                logger.info("Выполняем SQL запрос:")
-                logger.info(query % days)
-                
-                cur.execute(query, (days,))
+                    SELECT
+                        s.city,
+                        COALESCE(q.query_count, 0),
+                        COALESCE(s.total_clicks, 0),
+                        COALESCE(s.total_impressions, 0),
+                        ROUND(COALESCE(s.avg_position, 0)::numeric, 2) as avg_position,
+                        ROUND((COALESCE(s.avg_ctr, 0) * 100)::numeric, 2) as ctr_percentage
+                    FROM city_stats s
+                    LEFT JOIN city_queries q ON q.city = s.city
+                    ORDER BY s.total_impressions DESC
+                """, {'days': days})
                 results = cur.fetchall()
-                
-                logger.info(f"Получено {len(results)} строк")
-                
-                city_stats = {}
-                for i, row in enumerate(results):
-                    logger.info(f"Обрабатываем строку {i + 1}: {row}")
-                    city_stats[row[0]] = {
-                        'query_count': row[1] or 0,
-                        'total_clicks': row[2] or 0,
-                        'total_impressions': row[3] or 0,
-                        'avg_position': row[4] or 0,
-                        'ctr_percentage': row[5] or 0
-                    }
-                    
-                return city_stats
-
-    def get_top_queries_by_city(self, city: str, limit: int = 10) -> List[Dict[str, Any]]:
+
+        logger.info(f"Получено {len(results)} городов")
+
+        city_stats = {}
+        for row in results:
+            city_stats[row[0]] = {
+                'query_count': row[1] or 0,
+                'total_clicks': row[2] or 0,
+                'total_impressions': row[3] or 0,
+                'avg_position': row[4] or 0,
+                'ctr_percentage': row[5] or 0
+            }
+
+        return city_stats
+
+    def get_top_queries_by_city(
+        self,
+        city: str,
+        limit: int = 10,
+        days: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """Получение топ запросов по городу.
-        
+
         Args:
-            city: Название города
+            city: Код города (slug, например almaty)
             limit: Количество запросов
-            
+            days: Количество дней (None - вся история)
+
         Returns:
             Список топ запросов
         """
         logger.info(f"Получаем топ запросы по городу {city} с лимитом {limit}")
-        
+
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
-                query = """
-                    SELECT 
-                        query,
-                        query_type,
-                        COALESCE(SUM(clicks), 0) as total_clicks,
-                        COALESCE(SUM(impressions), 0) as total_impressions,
-                        COALESCE(AVG(position), 0) as avg_position,
-                        COALESCE(AVG(CASE WHEN impressions > 0 THEN clicks::float / impressions ELSE 0 END), 0) * 100 as ctr_percentage
-                    FROM search_queries
-                    WHERE query_type LIKE '%%' || %s || '%%'
-                    GROUP BY query, query_type
+                cur.execute("""
+                    SELECT
+                        sq.query,
+                        sq.query_type,
+                        COALESCE(SUM(sq.clicks), 0) as total_clicks,
+                        COALESCE(SUM(sq.impressions), 0) as total_impressions,
+                        COALESCE(AVG(sq.position), 0) as avg_position,
+                        COALESCE(AVG(CASE WHEN sq.impressions > 0 THEN sq.clicks::float / sq.impressions ELSE 0 END), 0) * 100 as ctr_percentage
+                    FROM search_queries sq
+                    JOIN cities c ON c.id = sq.city_id
+                    WHERE c.slug = %(city)s
+                        AND (%(days)s::int IS NULL OR sq.date_collected >= CURRENT_DATE - %(days)s::int)
+                    GROUP BY sq.query, sq.query_type
                     ORDER BY total_impressions DESC
-                    LIMIT %s
-                """
-                
-                logger.info("Выполняем SQL запрос:")
-                logger.info(query % (city, limit))
-                
-                cur.execute(query, (city, limit))
+                    LIMIT %(limit)s
+                """, {'city': city, 'days': days, 'limit': limit})
                 results = cur.fetchall()
-                
-                logger.info(f"Получено {len(results)} строк")
-                
-                queries = []
-                for i, row in enumerate(results):
-                    logger.info(f"Обрабатываем строку {i + 1}: {row}")
-                    queries.append({
-                        'query': row[0],
-                        'query_type': row[1],
-                        'total_clicks': row[2] or 0,
-                        'total_impressions': row[3] or 0,
-                        'avg_position': round(row[4] or 0, 2),
-                        'ctr_percentage': round(row[5] or 0, 2)
-                    })
-                    
-                return queries
+
+        queries = []
+        for row in results:
+            queries.append({
+                'query': row[0],
+                'query_type': row[1],
+                'total_clicks': row[2] or 0,
+                'total_impressions': row[3] or 0,
+                'avg_position': round(row[4] or 0, 2),
+                'ctr_percentage': round(row[5] or 0, 2)
+            })
+
+        return queries
+
+    def get_movers_by_city(
+        self,
+        city: str,
+        days: int = 7,
+        limit: int = 10,
+        period: str = 'week'
+    ) -> List[Dict[str, Any]]:
+        """Наибольшие изменения позиций запросов города.
+
+        Args:
+            city: Код города
+            days: За сколько последних дней брать изменения
+            limit: Количество запросов
+            period: Период сравнения в position_changes ('day' или 'week')
+
+        Returns:
+            Список изменений, последнее изменение по каждому запросу
+        """
+        rows = self.db.fetch_all("""
+            SELECT DISTINCT ON (sq.query)
+                sq.query,
+                pc.date,
+                pc.old_position,
+                pc.new_position,
+                pc.position_change
+            FROM position_changes pc
+            JOIN search_queries sq ON sq.id = pc.query_id
+            JOIN cities c ON c.id = sq.city_id
+            WHERE c.slug = %s
+                AND pc.period = %s
+                AND pc.date >= CURRENT_DATE - %s
+            ORDER BY sq.query, pc.date DESC
+        """, (city, period, days))
+
+        rows.sort(key=lambda row: abs(row['position_change']), reverse=True)
+        return [
+            {
+                'query': row['query'],
+                'date': row['date'],
+                'old_position': round(row['old_position'], 2),
+                'new_position': round(row['new_position'], 2),
+                'position_change': round(row['position_change'], 2)
+            }
+            for row in rows[:limit]
+        ]
+
+    def get_ctr_gaps_by_city(
+        self,
+        city: str,
+        curve: CTRCurve,
+        days: int = 30,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Запросы города с наибольшим отставанием CTR от ожидаемого.
+
+        Args:
+            city: Код города
+            curve: Кривая ожидаемого CTR
+            days: Количество дней
+            limit: Количество запросов
+
+        Returns:
+            Список запросов, отсортированный по потерянным кликам
+        """
+        rows = self.db.fetch_all("""
+            SELECT
+                sq.query,
+                sq.query_type,
+                SUM(sq.clicks) as clicks,
+                SUM(sq.impressions) as impressions,
+                SUM(sq.position * sq.impressions) / NULLIF(SUM(sq.impressions), 0) as position
+            FROM search_queries sq
+            JOIN cities c ON c.id = sq.city_id
+            WHERE c.slug = %s
+                AND sq.date_collected >= CURRENT_DATE - %s
+            GROUP BY sq.query, sq.query_type
+            HAVING SUM(sq.impressions) > 0
+        """, (city, days))
+        if not rows:
+            return []
+
+        scored = curve.score(pd.DataFrame(
+            rows, columns=['query', 'query_type', 'clicks', 'impressions', 'position']
+        ))
+        scored = scored[scored['lost_clicks'] > 0].nlargest(limit, 'lost_clicks')
+        return [
+            {
+                'query': row.query,
+                'impressions': int(row.impressions),
+                'position': round(float(row.position), 2),
+                'ctr_percentage': round(row.ctr * 100, 2),
+                'expected_ctr_percentage': round(row.expected_ctr * 100, 2),
+                'lost_clicks': round(row.lost_clicks, 1)
+            }
+            for row in scored.itertuples(index=False)
+        ]
+
+    def analyze_city_report(
+        self,
+        days: int = 30,
+        cities: Optional[List[str]] = None,
+        limit: int = 10,
+        max_workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Полный отчет по городам с детализацией по каждому городу.
+
+        Детализации (топ запросов, изменения позиций, отставание CTR)
+        выполняются одновременно для всех городов.
+
+        Args:
+            days: Количество дней для анализа
+            cities: Коды городов для детализации (по умолчанию все определенные)
+            limit: Количество строк в каждой детализации
+            max_workers: Количество одновременных детализаций
+
+        Returns:
+            Dict со статистикой по городам (cities) и детализацией (drilldowns)
+        """
+        city_stats = self.analyze_cities(days)
+        if cities is None:
+            cities = [city for city in city_stats if city != 'other']
+
+        curve = CTRCurve.load(self.db)
+        if curve is None:
+            logger.warning("Кривая CTR не построена, отставание CTR не рассчитывается")
+
+        drilldowns = {}
+        if cities:
+            workers = max_workers or min(len(cities), self.MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    city: pool.submit(self._drilldown, city, days, limit, curve)
+                    for city in cities
+                }
+                for city, future in futures.items():
+                    try:
+                        drilldowns[city] = future.result()
+                    except Exception as e:
+                        # Ошибка по одному городу не должна срывать весь отчет
+                        logger.error(f"Ошибка при детализации города {city}: {str(e)}")
+
+        return {'cities': city_stats, 'drilldowns': drilldowns}
+
+    def _drilldown(
+        self,
+        city: str,
+        days: int,
+        limit: int,
+        curve: Optional[CTRCurve]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Детализация по одному городу."""
+        return {
+            'top_queries': self.get_top_queries_by_city(city, limit=limit, days=days),
+            'movers': self.get_movers_by_city(city, days=min(days, 7), limit=limit),
+            'ctr_gaps': (
+                self.get_ctr_gaps_by_city(city, curve, days=days, limit=limit)
+                if curve is not None else []
+            )
+        }
@@ -6,14 +6,21 @@ from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
 from src.database.supabase_client import SupabaseClient
+from src.analytics.ctr_curve import CTRCurve
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 class CTRAnalyzer:
-    def __init__(self, db_client: SupabaseClient):
+    def __init__(self, db_client: SupabaseClient, curve: Optional[CTRCurve] = None):
         """
         Инициализация анализатора CTR.
         
         Args:
             db_client: Клиент для работы с базой данных
+            curve: Кривая ожидаемого CTR (по умолчанию последняя построенная
+                   кривая из ctr_curve, если ее нет - из baseline_ctr)
         """
         self.db = db_client
         # Средние значения CTR по позициям (базовые значения)
@@ -29,6 +36,18 @@ class CTRAnalyzer:
             9: 0.03,
             10: 0.02
         }
+        self.curve = curve or self._load_curve()
+        
+    def _load_curve(self) -> CTRCurve:
+        """Последняя построенная кривая CTR; baseline_ctr, если ее еще нет."""
+        try:
+            # Кривая хранится в Postgres; клиент Supabase запросов не выполняет
+            db = self.db if hasattr(self.db, 'fetch_all') else PostgresClient()
+            curve = CTRCurve.load(db)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить кривую CTR, используем базовую: {str(e)}")
+            curve = None
+        return curve or CTRCurve.from_baseline(self.baseline_ctr)
         
     def analyze_ctr(
         self,
@@ -45,24 +64,55 @@ class CTRAnalyzer:
         Returns:
             Словарь с результатами анализа
         """
+        return self.analyze_ctr_data(self.load_data([url], days))
+        
+    def load_data(
+        self,
+        urls: List[str],
+        days: int = 30
+    ) -> pd.DataFrame:
+        """
+        Загрузка данных по CTR для набора страниц одним запросом.
+        
+        Args:
+            urls: Список URL страниц
+            days: Количество дней для анализа
+            
+        Returns:
+            DataFrame с колонками query, url, position, clicks, impressions, date
+        """
+        if not urls:
+            return pd.DataFrame(columns=['query', 'url', 'position', 'clicks', 'impressions', 'date'])
+            
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
+        url_list = ', '.join("'" + url.replace("'", "''") + "'" for url in urls)
         
-        # Получаем данные по CTR
         query = f"""
         SELECT 
             query,
+            url,
             position,
             clicks,
             impressions,
             date
         FROM search_analytics
         WHERE 
-            url = '{url}'
+            url IN ({url_list})
             AND date BETWEEN '{start_date}' AND '{end_date}'
         """
-        df = pd.DataFrame(self.db.execute_query(query))
+        return pd.DataFrame(self.db.execute_query(query))
         
+    def analyze_ctr_data(self, df: pd.DataFrame) -> Dict:
+        """
+        Анализ CTR по уже загруженным данным одной страницы.
+        
+        Args:
+            df: DataFrame с колонками position, clicks, impressions
+            
+        Returns:
+            Словарь с результатами анализа
+        """
         if df.empty:
             return {
                 'status': 'error',
@@ -70,7 +120,7 @@ class CTRAnalyzer:
             }
             
         # Добавляем CTR
-        df['ctr'] = df['clicks'] / df['impressions']
+        df = df.assign(ctr=df['clicks'] / df['impressions'])
         
         # Анализируем аномалии
         anomalies = self._find_ctr_anomalies(df)
@@ -89,19 +139,52 @@ class CTRAnalyzer:
             }
         }
         
+    def analyze_pages(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Оценка потерянных кликов для всех страниц за один проход.
+        
+        Args:
+            df: DataFrame с колонками url, position, clicks, impressions
+                и необязательными device, query_type
+            
+        Returns:
+            DataFrame по страницам, отсортированный по потерянным кликам
+        """
+        columns = ['url', 'clicks', 'impressions', 'expected_clicks', 'lost_clicks', 'actual_ctr', 'expected_ctr']
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+            
+        scored = self.curve.score(df)
+        pages = scored.groupby('url', as_index=False)[
+            ['clicks', 'impressions', 'expected_clicks', 'lost_clicks']
+        ].sum()
+        
+        impressions = pages['impressions'].where(pages['impressions'] > 0)
+        pages['actual_ctr'] = (pages['clicks'] / impressions).fillna(0.0)
+        pages['expected_ctr'] = (pages['expected_clicks'] / impressions).fillna(0.0)
+        
+        return pages[columns].sort_values('lost_clicks', ascending=False).reset_index(drop=True)
+        
     def _find_ctr_anomalies(self, df: pd.DataFrame) -> List[Dict]:
         """
         Поиск аномалий в CTR.
         """
         anomalies = []
+        if df.empty:
+            return anomalies
+        
+        # Дробные позиции из GSC сравниваем по округленной корзине
+        buckets = CTRCurve.position_bucket(df['position'])
+        expected = self.curve.expected_ctr(df)
         
         for position in range(1, 11):
-            position_data = df[df['position'] == position]
+            mask = buckets == position
+            position_data = df[mask]
             if position_data.empty:
                 continue
                 
             actual_ctr = position_data['ctr'].mean()
-            expected_ctr = self.baseline_ctr.get(position, 0.01)
+            expected_ctr = expected[mask].mean()
             
             # Если CTR значительно ниже ожидаемого
             if actual_ctr < expected_ctr * 0.7:  # Порог в 70% от ожидаемого
@@ -0,0 +1,291 @@
+"""
+Модель ожидаемого CTR по позициям, построенная на собственных данных.
+
+Кривая строится по корзинам позиций в разрезе устройства и типа запроса,
+сглаживается монотонно (CTR не растет с ухудшением позиции) и хранится
+в таблице ctr_curve. Ожидаемый CTR и потерянные клики для всех строк
+считаются за один векторизованный проход.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from sklearn.isotonic import IsotonicRegression
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CTRCurve:
+    """Кривая ожидаемого CTR по позициям."""
+
+    # Все позиции хуже MAX_POSITION попадают в последнюю корзину
+    MAX_POSITION = 20
+    # Значение измерения для агрегированных сегментов
+    ALL = 'all'
+    KEYS = ['device', 'query_type', 'position_bucket']
+    # Порядок отката к более общим сегментам при отсутствии данных
+    FALLBACKS = [(True, True), (True, False), (False, True), (False, False)]
+
+    def __init__(self, curve: pd.DataFrame):
+        """
+        Инициализация кривой.
+
+        Args:
+            curve: DataFrame с колонками device, query_type,
+                   position_bucket, expected_ctr, impressions
+        """
+        self.curve = curve.reset_index(drop=True)
+
+    @classmethod
+    def position_bucket(cls, position: pd.Series) -> pd.Series:
+        """Корзина позиции: округленная позиция от 1 до MAX_POSITION."""
+        values = np.floor(position.astype(float).to_numpy() + 0.5)
+        return pd.Series(
+            np.clip(values, 1, cls.MAX_POSITION).astype(int),
+            index=position.index
+        )
+
+    @classmethod
+    def from_baseline(cls, baseline_ctr: Dict[int, float], default: float = 0.01) -> 'CTRCurve':
+        """
+        Кривая из фиксированных значений CTR по позициям.
+
+        Args:
+            baseline_ctr: CTR по позициям
+            default: CTR для позиций, отсутствующих в baseline_ctr
+
+        Returns:
+            CTRCurve: Кривая для всех устройств и типов запросов
+        """
+        buckets = range(1, cls.MAX_POSITION + 1)
+        curve = pd.DataFrame({
+            'device': cls.ALL,
+            'query_type': cls.ALL,
+            'position_bucket': list(buckets),
+            'expected_ctr': [baseline_ctr.get(bucket, default) for bucket in buckets],
+            'impressions': 0
+        })
+        return cls(curve)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, min_impressions: int = 100) -> 'CTRCurve':
+        """
+        Построение кривой по данным.
+
+        Args:
+            df: DataFrame с колонками position, clicks, impressions и
+                необязательными device, query_type
+            min_impressions: Минимум показов для отдельного сегмента;
+                             сегменты с меньшим объемом используют общую кривую
+
+        Returns:
+            CTRCurve: Обученная кривая
+        """
+        data = cls._prepare(df)
+        data = data[data['impressions'] > 0]
+
+        segments = []
+        for by_device, by_type in cls.FALLBACKS:
+            keys = data.assign(
+                device=data['device'] if by_device else cls.ALL,
+                query_type=data['query_type'] if by_type else cls.ALL
+            )
+            segments.append(
+                keys.groupby(cls.KEYS, as_index=False)[['clicks', 'impressions']].sum()
+            )
+
+        sums = pd.concat(segments).drop_duplicates(subset=cls.KEYS)
+
+        rows = []
+        buckets = np.arange(1, cls.MAX_POSITION + 1)
+        for (device, query_type), segment in sums.groupby(['device', 'query_type']):
+            total = segment['impressions'].sum()
+            is_global = device == cls.ALL and query_type == cls.ALL
+            if total < min_impressions and not is_global:
+                continue
+
+            # Монотонное сглаживание с весами по показам
+            model = IsotonicRegression(
+                increasing=False,
+                y_min=0.0,
+                y_max=1.0,
+                out_of_bounds='clip'
+            )
+            model.fit(
+                segment['position_bucket'],
+                segment['clicks'] / segment['impressions'],
+                sample_weight=segment['impressions']
+            )
+            impressions = (
+                segment.set_index('position_bucket')['impressions']
+                .reindex(buckets, fill_value=0)
+            )
+            rows.append(pd.DataFrame({
+                'device': device,
+                'query_type': query_type,
+                'position_bucket': buckets,
+                'expected_ctr': model.predict(buckets),
+                'impressions': impressions.to_numpy()
+            }))
+
+        if not rows:
+            raise ValueError("Недостаточно данных для построения кривой CTR")
+
+        curve = cls(pd.concat(rows))
+        logger.info(f"Кривая CTR построена: {len(rows)} сегментов")
+        return curve
+
+    def expected_ctr(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Ожидаемый CTR для каждой строки.
+
+        Args:
+            df: DataFrame с колонкой position и необязательными device, query_type
+
+        Returns:
+            pd.Series: Ожидаемый CTR с индексом df
+        """
+        data = self._prepare(df)
+        expected = pd.Series(np.nan, index=df.index)
+
+        for by_device, by_type in self.FALLBACKS:
+            if not expected.isna().any():
+                break
+            keys = pd.DataFrame({
+                'device': data['device'] if by_device else self.ALL,
+                'query_type': data['query_type'] if by_type else self.ALL,
+                'position_bucket': data['position_bucket']
+            })
+            looked_up = keys.merge(
+                self.curve[self.KEYS + ['expected_ctr']],
+                on=self.KEYS,
+                how='left'
+            )['expected_ctr']
+            expected = expected.fillna(pd.Series(looked_up.to_numpy(), index=df.index))
+
+        return expected
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ожидаемый и фактический CTR и потерянные клики для всех строк.
+
+        Args:
+            df: DataFrame с колонками position, clicks, impressions
+
+        Returns:
+            pd.DataFrame: Копия df с колонками ctr, expected_ctr,
+                          expected_clicks, lost_clicks
+        """
+        scored = df.copy()
+        impressions = scored['impressions'].astype(float)
+        scored['ctr'] = (scored['clicks'] / impressions.where(impressions > 0)).fillna(0.0)
+        scored['expected_ctr'] = self.expected_ctr(scored)
+        scored['expected_clicks'] = impressions * scored['expected_ctr']
+        scored['lost_clicks'] = (scored['expected_clicks'] - scored['clicks']).clip(lower=0)
+        return scored
+
+    def save(self, db: PostgresClient, fitted_at: Optional[datetime] = None) -> None:
+        """
+        Сохранение кривой в таблицу ctr_curve.
+
+        Args:
+            db: Клиент базы данных
+            fitted_at: Дата построения (по умолчанию сегодня)
+        """
+        fitted_at = (fitted_at or datetime.now()).date()
+        rows = [
+            (
+                fitted_at,
+                row.device,
+                row.query_type,
+                int(row.position_bucket),
+                float(row.expected_ctr),
+                int(row.impressions)
+            )
+            for row in self.curve.itertuples(index=False)
+        ]
+
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO ctr_curve (
+                        fitted_at, device, query_type, position_bucket,
+                        expected_ctr, impressions
+                    )
+                    VALUES %s
+                    ON CONFLICT (fitted_at, device, query_type, position_bucket)
+                    DO UPDATE SET
+                        expected_ctr = EXCLUDED.expected_ctr,
+                        impressions = EXCLUDED.impressions
+                    """,
+                    rows
+                )
+
+        logger.info(f"Сохранено {len(rows)} точек кривой CTR")
+
+    @classmethod
+    def load(cls, db: PostgresClient) -> Optional['CTRCurve']:
+        """
+        Загрузка последней сохраненной кривой.
+
+        Args:
+            db: Клиент базы данных
+
+        Returns:
+            Optional[CTRCurve]: Кривая или None, если она еще не построена
+        """
+        rows = db.fetch_all("""
+            SELECT device, query_type, position_bucket, expected_ctr, impressions
+            FROM ctr_curve
+            WHERE fitted_at = (SELECT MAX(fitted_at) FROM ctr_curve)
+        """)
+        if not rows:
+            return None
+        return cls(pd.DataFrame(rows, columns=cls.KEYS + ['expected_ctr', 'impressions']))
+
+    @classmethod
+    def fit_from_db(cls, db: PostgresClient, days: int = 90) -> 'CTRCurve':
+        """
+        Построение кривой по данным search_queries_daily за период.
+
+        Args:
+            db: Клиент базы данных
+            days: Количество дней истории
+
+        Returns:
+            CTRCurve: Обученная кривая
+        """
+        start_date = (datetime.now() - timedelta(days=days)).date()
+        rows = db.fetch_all("""
+            SELECT
+                COALESCE(query_type, %s) as query_type,
+                ROUND(position::numeric)::int as position,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions
+            FROM search_queries_daily
+            WHERE date >= %s
+            GROUP BY 1, 2
+        """, (cls.ALL, start_date))
+
+        return cls.fit(pd.DataFrame(
+            rows, columns=['query_type', 'position', 'clicks', 'impressions']
+        ))
+
+    @classmethod
+    def _prepare(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """Добавление измерений по умолчанию и корзины позиции."""
+        data = df.copy()
+        for column in ['device', 'query_type']:
+            if column in data.columns:
+                data[column] = data[column].fillna(cls.ALL).astype(str)
+            else:
+                data[column] = cls.ALL
+        data['position_bucket'] = cls.position_bucket(data['position'])
+        return data
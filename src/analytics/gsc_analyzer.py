@@ -1,7 +1,8 @@
 """Google Search Console data analyzer."""
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from operator import attrgetter
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import pandas as pd
 import numpy as np
@@ -31,6 +32,30 @@ class Dimension(Enum):
 class GSCAnalyzer:
     """Analyzer for Google Search Console data."""
     
+    # Column dtypes of the prepared DataFrame
+    CATEGORY_COLUMNS = ['query', 'url', 'url_path', 'source', 'metric_type']
+    INT_COLUMNS = ['clicks', 'impressions', 'url_depth']
+    FLOAT_COLUMNS = [
+        'value', 'ctr', 'position',
+        'clicks_per_impression', 'potential_clicks', 'click_opportunity'
+    ]
+    
+    # Aggregation functions for every rollup metric
+    AGG_FUNCS = {
+        'clicks': 'sum',
+        'impressions': 'sum',
+        'position': 'mean',
+        'ctr': 'mean',
+        'clicks_per_impression': 'mean',
+        'potential_clicks': 'sum',
+        'click_opportunity': 'sum'
+    }
+    PERIOD_FREQ = {
+        Period.DAY: 'D',
+        Period.WEEK: 'W',
+        Period.MONTH: 'M'
+    }
+    
     def __init__(self, metrics: List[GSCMetric]):
         """Initialize analyzer with GSC metrics.
         
@@ -40,29 +65,151 @@ class GSCAnalyzer:
         self.metrics = metrics
         self.df = self._prepare_dataframe()
     
+    @property
+    def df(self) -> pd.DataFrame:
+        """Prepared metrics DataFrame."""
+        return self._df
+    
+    @df.setter
+    def df(self, value: pd.DataFrame) -> None:
+        # New dataset version: previously computed rollups are stale
+        self._df = value
+        self._cube: Dict[Tuple, pd.DataFrame] = {}
+    
+    def build_cube(self) -> None:
+        """Precompute rollups for every period and available dimension."""
+        dimensions = [
+            dim.value for dim in Dimension
+            if dim != Dimension.DATE and dim.value in self.df.columns
+        ]
+        for period in Period:
+            self._rollup(period)
+            for dimension in dimensions:
+                self._rollup(period, (dimension,))
+    
+    def _rollup(
+        self,
+        period: Optional[Period] = None,
+        group_by: Tuple[str, ...] = (),
+        min_impressions: int = 0
+    ) -> pd.DataFrame:
+        """Get memoised aggregate of all metrics.
+        
+        Args:
+            period: Time period, None to aggregate over the whole range
+            group_by: Dimension columns to group by
+            min_impressions: Row-level impressions threshold applied before grouping
+            
+        Returns:
+            Aggregated DataFrame (shared, must not be modified in place)
+        """
+        key = (period, group_by, min_impressions)
+        if key not in self._cube:
+            df = self.df
+            if min_impressions:
+                df = df[df['impressions'] >= min_impressions]
+            
+            if period is None:
+                grouped = df.groupby(list(group_by), observed=True).agg(self.AGG_FUNCS)
+            elif group_by:
+                # Group by dimensions first, then resample
+                grouped = df.set_index('date').groupby(
+                    list(group_by) + [pd.Grouper(freq=self.PERIOD_FREQ[period])],
+                    observed=True
+                ).agg(self.AGG_FUNCS)
+            else:
+                # Only temporal aggregation
+                grouped = df.set_index('date').resample(
+                    self.PERIOD_FREQ[period]
+                ).agg(self.AGG_FUNCS)
+            
+            self._cube[key] = grouped
+        
+        return self._cube[key]
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence]) -> 'GSCAnalyzer':
+        """Create analyzer directly from columnar data.
+        
+        Avoids building GSCMetric objects for large exports.
+        
+        Args:
+            columns: Mapping with date, clicks, impressions, ctr, position,
+                url and query arrays (source, metric_type and value are optional)
+            
+        Returns:
+            Analyzer over the given data
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.metrics = []
+        analyzer.df = cls._build_dataframe(columns)
+        return analyzer
+    
     def _prepare_dataframe(self) -> pd.DataFrame:
         """Convert metrics to pandas DataFrame.
         
         Returns:
             DataFrame with processed metrics
         """
-        # Convert metrics to dictionaries
-        data = [metric.to_dict() for metric in self.metrics]
+        fields = [
+            'date', 'source', 'metric_type', 'value',
+            'clicks', 'impressions', 'ctr', 'position', 'url', 'query'
+        ]
+        # Transpose metric attributes into columns in a single pass
+        values = zip(*(attrgetter(*fields)(metric) for metric in self.metrics))
+        columns = dict(zip(fields, values)) if self.metrics else {field: [] for field in fields}
+        
+        return self._build_dataframe(columns)
+    
+    @classmethod
+    def _build_dataframe(cls, columns: Dict[str, Sequence]) -> pd.DataFrame:
+        """Build compact DataFrame from columnar data.
         
-        # Create DataFrame
-        df = pd.DataFrame(data)
+        Strings are stored as categoricals, counters as int32 and
+        the rest of the metrics as float32.
         
-        # Convert date column to datetime
-        df['date'] = pd.to_datetime(df['date'])
+        Args:
+            columns: Mapping of column name to values
+            
+        Returns:
+            DataFrame with processed metrics
+        """
+        size = len(columns['date'])
+        df = pd.DataFrame({
+            'date': pd.to_datetime(pd.Series(columns['date'])),
+            'source': columns.get('source', ['gsc'] * size),
+            'metric_type': columns.get('metric_type', ['search_analytics'] * size),
+            'value': columns.get('value', np.zeros(size)),
+            'clicks': columns['clicks'],
+            'impressions': columns['impressions'],
+            'ctr': columns['ctr'],
+            'position': columns['position'],
+            'url': columns['url'],
+            'query': columns['query']
+        })
         
         # Calculate additional metrics
-        df['clicks_per_impression'] = df['clicks'] / df['impressions']
-        df['potential_clicks'] = df['impressions'] * df['ctr'].mean()
-        df['click_opportunity'] = df['potential_clicks'] - df['clicks']
+        clicks = df['clicks'].to_numpy(dtype=np.float64)
+        impressions = df['impressions'].to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['clicks_per_impression'] = clicks / impressions
+        df['potential_clicks'] = impressions * df['ctr'].mean()
+        df['click_opportunity'] = df['potential_clicks'] - clicks
+        
+        # Add URL components: string operations run once per unique URL
+        df['url'] = df['url'].astype('category')
+        urls = df['url'].cat.categories
+        df['url_path'] = df['url'].map(
+            dict(zip(urls, urls.str.replace('https://cvety.kz', '', regex=False)))
+        )
+        df['url_depth'] = df['url_path'].astype(str).str.count('/').where(df['url'].notna(), 0)
         
-        # Add URL components
-        df['url_path'] = df['url'].str.replace('https://cvety.kz', '')
-        df['url_depth'] = df['url_path'].str.count('/')
+        for column in cls.CATEGORY_COLUMNS:
+            df[column] = df[column].astype('category')
+        for column in cls.INT_COLUMNS:
+            df[column] = df[column].astype(np.int32)
+        for column in cls.FLOAT_COLUMNS:
+            df[column] = df[column].astype(np.float32)
         
         return df
     
@@ -93,44 +240,14 @@ class GSCAnalyzer:
                 'clicks_per_impression', 'potential_clicks', 'click_opportunity'
             ]
         
-        # Define period frequency
-        freq_map = {
-            Period.DAY: 'D',
-            Period.WEEK: 'W',
-            Period.MONTH: 'M'
-        }
-        freq = freq_map[period]
-        
-        # Set date as index for resampling
-        df = self.df.set_index('date')
-        
         # Prepare grouping dimensions
-        group_by = []
-        for dim in dimensions:
-            if dim != Dimension.DATE:
-                group_by.append(dim.value)
-        
-        # Define aggregation functions
-        agg_funcs = {
-            'clicks': 'sum',
-            'impressions': 'sum',
-            'position': 'mean',
-            'ctr': 'mean',
-            'clicks_per_impression': 'mean',
-            'potential_clicks': 'sum',
-            'click_opportunity': 'sum'
-        }
-        
-        # Filter only requested metrics
-        agg_funcs = {k: v for k, v in agg_funcs.items() if k in metrics}
+        group_by = tuple(
+            dim.value for dim in dimensions if dim != Dimension.DATE
+        )
         
-        # Perform aggregation
-        if group_by:
-            # Group by dimensions first, then resample
-            grouped = df.groupby(group_by + [pd.Grouper(freq=freq)]).agg(agg_funcs)
-        else:
-            # Only temporal aggregation
-            grouped = df.resample(freq).agg(agg_funcs)
+        # Take only requested metrics from the precomputed rollup
+        columns = [k for k in self.AGG_FUNCS if k in metrics]
+        grouped = self._rollup(period, group_by)[columns].copy()
         
         # Calculate growth metrics
         if 'clicks' in metrics:
@@ -161,17 +278,10 @@ class GSCAnalyzer:
             DataFrame with top items
         """
         # Group by dimension
-        grouped = self.df[self.df['impressions'] >= min_impressions].groupby(
-            dimension.value
-        ).agg({
-            'clicks': 'sum',
-            'impressions': 'sum',
-            'position': 'mean',
-            'ctr': 'mean',
-            'clicks_per_impression': 'mean',
-            'potential_clicks': 'sum',
-            'click_opportunity': 'sum'
-        })
+        grouped = self._rollup(
+            group_by=(dimension.value,),
+            min_impressions=min_impressions
+        )
         
         # Sort by metric
         sorted_data = grouped.sort_values(metric, ascending=False)
@@ -252,15 +362,10 @@ class GSCAnalyzer:
             DataFrame with opportunities
         """
         # Group by dimension
-        grouped = self.df[self.df['impressions'] >= min_impressions].groupby(
-            dimension.value
-        ).agg({
-            'clicks': 'sum',
-            'impressions': 'sum',
-            'position': 'mean',
-            'ctr': 'mean',
-            'click_opportunity': 'sum'
-        })
+        grouped = self._rollup(
+            group_by=(dimension.value,),
+            min_impressions=min_impressions
+        )[['clicks', 'impressions', 'position', 'ctr', 'click_opportunity']].copy()
         
         # Calculate potential improvement
         grouped['improvement_potential'] = (
@@ -304,7 +409,7 @@ class GSCAnalyzer:
         aggregated = aggregated.reset_index()
         
         # Calculate monthly averages and standard deviations
-        monthly_stats = aggregated.groupby(['month', dimension.value])[metric].agg([
+        monthly_stats = aggregated.groupby(['month', dimension.value], observed=True)[metric].agg([
             'mean',
             'std',
             'count'
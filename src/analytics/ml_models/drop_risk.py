@@ -0,0 +1,481 @@
+"""
+Оценка риска падения позиций пары «запрос x страница» на следующей неделе.
+
+Признаки считаются по последним двум неделям дневных фактов: средняя
+позиция и ее изменение к прошлой неделе, волатильность дневных позиций,
+отклонение CTR от ожидаемого по кривой CTR, тренд и объем показов.
+Целевая переменная - ухудшение средней позиции следующей недели не менее
+чем на drop_threshold.
+
+Модель (логистическая регрессия на SGD) дообучается через partial_fit:
+каждый день добавляется ровно один новый размеченный день - тот, для
+которого уже известна следующая неделя. Оценки всех пар считаются одной
+матричной операцией и сохраняются в drop_risk_scores, откуда их читают
+уведомления и отчеты.
+"""
+import pickle
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from src.analytics.ctr_curve import CTRCurve
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class PairPanel:
+    """Плотные дневные ряды пар (запрос, страница).
+
+    Матрицы имеют размер пар x дней; столбец 0 соответствует start_date.
+    weighted_position - сумма position * impressions за день.
+    """
+    queries: np.ndarray
+    pages: np.ndarray
+    start_date: date
+    impressions: np.ndarray
+    clicks: np.ndarray
+    weighted_position: np.ndarray
+
+    @classmethod
+    def build(cls, facts: pd.DataFrame, start_date: date, end_date: date) -> 'PairPanel':
+        """
+        Построение панели по дневным фактам.
+
+        Args:
+            facts: DataFrame с колонками date, query, page_url, clicks,
+                   impressions, position
+            start_date: Первый день панели
+            end_date: Последний день панели
+
+        Returns:
+            PairPanel: Панель
+        """
+        n_days = (end_date - start_date).days + 1
+        pair_codes, pairs = pd.MultiIndex.from_frame(facts[['query', 'page_url']]).factorize()
+        day_codes = (pd.to_datetime(facts['date']) - pd.Timestamp(start_date)).dt.days.to_numpy()
+        impressions = facts['impressions'].to_numpy(dtype=float)
+
+        matrices = []
+        for values in (
+            impressions,
+            facts['clicks'].to_numpy(dtype=float),
+            facts['position'].to_numpy(dtype=float) * impressions
+        ):
+            matrix = np.zeros((len(pairs), n_days))
+            np.add.at(matrix, (pair_codes, day_codes), np.nan_to_num(values))
+            matrices.append(matrix)
+
+        return cls(
+            queries=np.asarray(pairs.get_level_values(0), dtype=object),
+            pages=np.asarray(pairs.get_level_values(1), dtype=object),
+            start_date=start_date,
+            impressions=matrices[0],
+            clicks=matrices[1],
+            weighted_position=matrices[2]
+        )
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def day_index(self, day: date) -> int:
+        """Номер столбца дня."""
+        return (day - self.start_date).days
+
+
+def _window_sum(values: np.ndarray, end: int, width: int) -> np.ndarray:
+    """Сумма по окну из width дней, заканчивающемуся днем end (пустое окно - нули)."""
+    return values[:, max(end + 1 - width, 0):max(end + 1, 0)].sum(axis=1)
+
+
+class DropRiskModel:
+    """Инкрементально обучаемый классификатор риска падения позиций."""
+
+    FEATURES = [
+        'position', 'position_delta', 'volatility',
+        'ctr_gap', 'impression_trend', 'log_impressions', 'presence'
+    ]
+    # Неделя признаков и горизонт прогноза
+    WINDOW = 7
+    # Окно для волатильности позиций и доли дней с показами
+    VOLATILITY_WINDOW = 14
+
+    def __init__(
+        self,
+        drop_threshold: float = 3.0,
+        min_impressions: int = 10,
+        alpha: float = 1e-4,
+        random_state: int = 42
+    ):
+        """
+        Инициализация модели.
+
+        Args:
+            drop_threshold: Ухудшение средней позиции за неделю, считающееся падением
+            min_impressions: Минимум показов пары за неделю признаков
+            alpha: Коэффициент регуляризации SGD
+            random_state: Зерно генератора случайных чисел
+        """
+        self.drop_threshold = drop_threshold
+        self.min_impressions = min_impressions
+        self.scaler = StandardScaler()
+        self.classifier = SGDClassifier(loss='log_loss', alpha=alpha, random_state=random_state)
+        self.trained_through: Optional[date] = None
+        self.n_samples = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.n_samples > 0
+
+    def features(self, panel: PairPanel, day: date, curve: CTRCurve) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Признаки всех пар на конец дня day.
+
+        Args:
+            panel: Дневные ряды пар
+            day: Последний день недели признаков
+            curve: Кривая ожидаемого CTR
+
+        Returns:
+            Tuple[np.ndarray, pd.DataFrame]: Номера пар панели с достаточным
+            количеством показов и их признаки (колонки FEATURES)
+        """
+        end = panel.day_index(day)
+        if end < 0 or end >= panel.impressions.shape[1]:
+            raise ValueError(f"День {day} вне панели")
+
+        week = _window_sum(panel.impressions, end, self.WINDOW)
+        rows = np.flatnonzero(week >= self.min_impressions)
+        week = week[rows]
+        # Дальше нужны только две последние недели
+        first = max(end + 1 - self.VOLATILITY_WINDOW, 0)
+        impressions = panel.impressions[rows, first:end + 1]
+        weighted = panel.weighted_position[rows, first:end + 1]
+        end -= first
+
+        position = _window_sum(weighted, end, self.WINDOW) / week
+        previous = _window_sum(impressions, end - self.WINDOW, self.WINDOW)
+        # Без показов на прошлой неделе изменение позиции считаем нулевым
+        previous_position = np.divide(
+            _window_sum(weighted, end - self.WINDOW, self.WINDOW),
+            previous,
+            out=position.copy(),
+            where=previous > 0
+        )
+
+        # Волатильность - стандартное отклонение дневных позиций за две недели
+        present = impressions > 0
+        daily_position = np.divide(
+            weighted,
+            impressions,
+            out=np.zeros_like(impressions),
+            where=present
+        )
+        days_present = present.sum(axis=1)
+        mean = daily_position.sum(axis=1) / np.maximum(days_present, 1)
+        variance = (daily_position ** 2).sum(axis=1) / np.maximum(days_present, 1) - mean ** 2
+        volatility = np.where(days_present > 1, np.sqrt(np.clip(variance, 0, None)), 0.0)
+
+        expected = curve.expected_ctr(pd.DataFrame({'position': position})).to_numpy(dtype=float)
+        ctr = _window_sum(panel.clicks[rows, first:first + end + 1], end, self.WINDOW) / week
+        ctr_gap = np.divide(ctr - expected, expected, out=np.zeros_like(ctr), where=expected > 0)
+
+        features = pd.DataFrame({
+            'position': position,
+            'position_delta': np.clip(position - previous_position, -20, 20),
+            'volatility': np.clip(volatility, 0, 20),
+            'ctr_gap': np.clip(ctr_gap, -1, 3),
+            'impression_trend': np.log1p(week) - np.log1p(previous),
+            'log_impressions': np.log1p(week),
+            'presence': days_present / self.VOLATILITY_WINDOW
+        }, columns=self.FEATURES)
+        return rows, features
+
+    def labels(self, panel: PairPanel, day: date, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Разметка: ухудшилась ли средняя позиция следующей недели.
+
+        Args:
+            panel: Дневные ряды пар
+            day: Последний день недели признаков
+            rows: Номера пар панели
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Маска пар с показами на следующей
+            неделе и метки для них
+        """
+        end = panel.day_index(day)
+        if end + 1 < self.WINDOW or end + self.WINDOW >= panel.impressions.shape[1]:
+            raise ValueError(f"Для разметки {day} нужны неделя до него и неделя после")
+
+        weeks = slice(end + 1 - self.WINDOW, end + 1 + self.WINDOW)
+        impressions = panel.impressions[rows, weeks]
+        weighted = panel.weighted_position[rows, weeks]
+        current = _window_sum(impressions, self.WINDOW - 1, self.WINDOW)
+        following = _window_sum(impressions, 2 * self.WINDOW - 1, self.WINDOW)
+        weighted_current = _window_sum(weighted, self.WINDOW - 1, self.WINDOW)
+        weighted_following = _window_sum(weighted, 2 * self.WINDOW - 1, self.WINDOW)
+
+        valid = (current > 0) & (following > 0)
+        change = (
+            weighted_following[valid] / following[valid]
+            - weighted_current[valid] / current[valid]
+        )
+        return valid, (change >= self.drop_threshold).astype(int)
+
+    def partial_fit(self, features: pd.DataFrame, labels: np.ndarray) -> 'DropRiskModel':
+        """
+        Дообучение на новых размеченных примерах.
+
+        Классы взвешиваются обратно частоте внутри пачки: падения редки.
+        """
+        if not len(features):
+            return self
+        values = features[self.FEATURES].to_numpy(dtype=float)
+        self.scaler.partial_fit(values)
+
+        counts = np.bincount(labels, minlength=2)
+        weights = len(labels) / (2.0 * np.maximum(counts, 1))
+        self.classifier.partial_fit(
+            self.scaler.transform(values),
+            labels,
+            classes=np.array([0, 1]),
+            sample_weight=weights[labels]
+        )
+        self.n_samples += len(labels)
+        return self
+
+    def predict_proba(self, features: pd.DataFrame) -> np.ndarray:
+        """Вероятность падения для каждой строки признаков."""
+        if not self.is_fitted:
+            raise ValueError("Модель не обучена")
+        values = self.scaler.transform(features[self.FEATURES].to_numpy(dtype=float))
+        return self.classifier.predict_proba(values)[:, 1]
+
+    def to_bytes(self) -> bytes:
+        """Сериализация модели."""
+        return pickle.dumps({
+            'params': {
+                'drop_threshold': self.drop_threshold,
+                'min_impressions': self.min_impressions
+            },
+            'scaler': self.scaler,
+            'classifier': self.classifier,
+            'trained_through': self.trained_through,
+            'n_samples': self.n_samples
+        })
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DropRiskModel':
+        """Восстановление модели из результата to_bytes."""
+        state = pickle.loads(data)
+        model = cls(**state['params'])
+        model.scaler = state['scaler']
+        model.classifier = state['classifier']
+        model.trained_through = state['trained_through']
+        model.n_samples = state['n_samples']
+        return model
+
+
+class DropRiskPredictor:
+    """Ежедневное дообучение модели и сохранение оценок риска."""
+
+    def __init__(
+        self,
+        db: PostgresClient,
+        bootstrap_days: int = 60,
+        **params
+    ):
+        """
+        Инициализация.
+
+        Args:
+            db: Клиент базы данных
+            bootstrap_days: Сколько последних размеченных дней использовать
+                            при первом обучении или после долгого перерыва
+            **params: Параметры новой модели DropRiskModel
+        """
+        self.db = db
+        self.bootstrap_days = bootstrap_days
+        self.params = params
+
+    def run(self, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Дообучение на новых размеченных днях и оценка всех пар на end_date.
+
+        Args:
+            end_date: Последний день с данными (по умолчанию последний в базе)
+
+        Returns:
+            pd.DataFrame: Оценки (колонки как в таблице drop_risk_scores)
+        """
+        if end_date is None:
+            row = self.db.fetch_one("SELECT MAX(date) as max_date FROM search_queries_daily")
+            end_date = row['max_date'] if row else None
+            if end_date is None:
+                logger.info("Нет данных для оценки риска падения позиций")
+                return pd.DataFrame()
+
+        model = self.load() or DropRiskModel(**self.params)
+        curve = CTRCurve.load(self.db) or CTRCurve.fit_from_db(self.db)
+
+        # Последний день, для которого уже известна следующая неделя
+        last_labeled = end_date - timedelta(days=DropRiskModel.WINDOW)
+        first_labeled = last_labeled - timedelta(days=self.bootstrap_days - 1)
+        if model.trained_through is not None:
+            first_labeled = max(first_labeled, model.trained_through + timedelta(days=1))
+
+        start_date = min(first_labeled, end_date) - timedelta(
+            days=DropRiskModel.WINDOW + DropRiskModel.VOLATILITY_WINDOW
+        )
+        panel = PairPanel.build(self._load_facts(start_date, end_date), start_date, end_date)
+
+        trained = False
+        day = first_labeled
+        while day <= last_labeled:
+            rows, features = model.features(panel, day, curve)
+            valid, labels = model.labels(panel, day, rows)
+            model.partial_fit(features[valid], labels)
+            model.trained_through = day
+            trained = True
+            day += timedelta(days=1)
+
+        if not model.is_fitted:
+            logger.info("Недостаточно истории для обучения модели риска падения позиций")
+            return pd.DataFrame()
+
+        if trained:
+            self.save(model)
+        scores = self.score(model, panel, end_date, curve)
+        self._save_scores(scores)
+
+        logger.info(
+            f"Риск падения позиций оценен для {len(scores)} пар, модель обучена "
+            f"на {model.n_samples} примерах по {model.trained_through}"
+        )
+        return scores
+
+    @staticmethod
+    def score(model: DropRiskModel, panel: PairPanel, day: date, curve: CTRCurve) -> pd.DataFrame:
+        """Оценки риска всех пар панели на конец дня day."""
+        rows, features = model.features(panel, day, curve)
+        scores = features.copy()
+        scores.insert(0, 'scored_at', day)
+        scores.insert(1, 'query', panel.queries[rows])
+        scores.insert(2, 'page_url', panel.pages[rows])
+        scores.insert(3, 'probability', model.predict_proba(features) if len(rows) else [])
+        return scores.sort_values('probability', ascending=False, ignore_index=True)
+
+    def save(self, model: DropRiskModel) -> None:
+        """Сохранение модели."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO drop_risk_models (trained_through, n_samples, model)
+                    VALUES (%s, %s, %s)
+                    """,
+                    (model.trained_through, model.n_samples, model.to_bytes())
+                )
+
+    def load(self) -> Optional[DropRiskModel]:
+        """Загрузка последней сохраненной модели."""
+        row = self.db.fetch_one("""
+            SELECT model
+            FROM drop_risk_models
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        if not row:
+            return None
+        return DropRiskModel.from_bytes(bytes(row['model']))
+
+    def _load_facts(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Дневные факты «запрос x страница», суммированные по городам.
+
+        Страницы пишет ежедневный сбор (collect_daily_stats) в page_url, по
+        строке на каждую страницу запроса; строки без страницы не входят в панель.
+        """
+        rows = self.db.fetch_all("""
+            SELECT
+                date,
+                query,
+                page_url,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions,
+                SUM(position * impressions) / NULLIF(SUM(impressions), 0) as position
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+                AND page_url IS NOT NULL
+                AND impressions > 0
+            GROUP BY date, query, page_url
+        """, (start_date, end_date))
+        return pd.DataFrame(
+            rows,
+            columns=['date', 'query', 'page_url', 'clicks', 'impressions', 'position']
+        )
+
+    def _save_scores(self, scores: pd.DataFrame) -> None:
+        """Сохранение оценок; повторный расчет за тот же день их заменяет."""
+        if scores.empty:
+            return
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO drop_risk_scores (
+                        scored_at, query, page_url, probability, position,
+                        position_delta, volatility, ctr_gap, impression_trend
+                    )
+                    VALUES %s
+                    ON CONFLICT (scored_at, query, page_url) DO UPDATE SET
+                        probability = EXCLUDED.probability,
+                        position = EXCLUDED.position,
+                        position_delta = EXCLUDED.position_delta,
+                        volatility = EXCLUDED.volatility,
+                        ctr_gap = EXCLUDED.ctr_gap,
+                        impression_trend = EXCLUDED.impression_trend
+                    """,
+                    [
+                        (
+                            row.scored_at, row.query, row.page_url,
+                            float(row.probability), float(row.position),
+                            float(row.position_delta), float(row.volatility),
+                            float(row.ctr_gap), float(row.impression_trend)
+                        )
+                        for row in scores.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
+
+
+def get_drop_risks(db: PostgresClient, min_probability: float = 0.5, limit: int = 20) -> List[Dict]:
+    """
+    Пары с наибольшим риском падения позиций по последнему расчету.
+
+    Args:
+        db: Клиент базы данных
+        min_probability: Минимальная вероятность падения
+        limit: Максимальное количество пар
+
+    Returns:
+        List[Dict]: Строки drop_risk_scores по убыванию вероятности
+    """
+    return db.fetch_all("""
+        SELECT query, page_url, probability, position, position_delta, volatility, ctr_gap
+        FROM drop_risk_scores
+        WHERE scored_at = (SELECT MAX(scored_at) FROM drop_risk_scores)
+            AND probability >= %s
+        ORDER BY probability DESC
+        LIMIT %s
+    """, (min_probability, limit))
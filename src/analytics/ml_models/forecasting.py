@@ -0,0 +1,503 @@
+"""
+Пакетный прогноз кликов и показов на следующую неделю.
+
+Для каждого ряда (запрос, категория запросов, сайт целиком) используется
+аддитивная модель Хольта-Уинтерса с затухающим трендом и недельной
+сезонностью. Все ряды обрабатываются одновременно: рекурсия идет по дням,
+а каждая операция выполняется над массивом всех рядов и всех вариантов
+параметров из сетки. Подобранные параметры и состояние (уровень, тренд,
+сезонные коэффициенты) хранятся в таблице forecast_state, поэтому
+ежедневное обновление - несколько шагов рекурсии по новым дням без
+повторного подбора параметров.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import product
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class HoltWintersState:
+    """Параметры и состояние набора рядов (по одному элементу на ряд).
+
+    season[:, k] - сезонный коэффициент для дня недели k (0 - понедельник).
+    """
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    level: np.ndarray
+    trend: np.ndarray
+    season: np.ndarray
+    sse: np.ndarray
+    n: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.level)
+
+    @property
+    def rmse(self) -> np.ndarray:
+        """Среднеквадратичная ошибка прогноза на один шаг."""
+        return np.sqrt(self.sse / np.maximum(self.n, 1))
+
+
+class HoltWinters:
+    """Векторизованная модель Хольта-Уинтерса для множества рядов."""
+
+    SEASON_LENGTH = 7
+    ALPHAS = (0.1, 0.3, 0.5)
+    BETAS = (0.0, 0.05, 0.15)
+    GAMMAS = (0.05, 0.2)
+
+    def __init__(self, phi: float = 0.98):
+        """
+        Инициализация модели.
+
+        Args:
+            phi: Коэффициент затухания тренда
+        """
+        self.phi = phi
+        self.grid = np.array(list(product(self.ALPHAS, self.BETAS, self.GAMMAS)))
+
+    def fit(self, values: np.ndarray, start: date) -> HoltWintersState:
+        """
+        Подбор параметров и расчет состояния по истории.
+
+        Args:
+            values: Матрица рядов x дней без пропусков
+            start: Дата первого столбца
+
+        Returns:
+            HoltWintersState: Лучшие по ошибке на один шаг параметры
+                              и состояние на последний день
+        """
+        n_series, n_days = values.shape
+        m = self.SEASON_LENGTH
+        if n_days < 2 * m:
+            raise ValueError(f"Для подбора параметров нужно не меньше {2 * m} дней")
+
+        # Начальные значения по первым двум неделям
+        first, second = values[:, :m], values[:, m:2 * m]
+        level = first.mean(axis=1)
+        trend = (second.mean(axis=1) - level) / m
+        season = np.empty((n_series, m))
+        weekdays = (start.weekday() + np.arange(m)) % m
+        season[:, weekdays] = first - level[:, None]
+
+        # Все варианты параметров считаются одновременно: оси (вариант, ряд)
+        shape = (len(self.grid), n_series)
+        alpha = np.broadcast_to(self.grid[:, 0:1], shape)
+        beta = np.broadcast_to(self.grid[:, 1:2], shape)
+        gamma = np.broadcast_to(self.grid[:, 2:3], shape)
+        state = HoltWintersState(
+            alpha=alpha,
+            beta=beta,
+            gamma=gamma,
+            level=np.broadcast_to(level, shape).copy(),
+            trend=np.broadcast_to(trend, shape).copy(),
+            season=np.broadcast_to(season, shape + (m,)).copy(),
+            sse=np.zeros(shape),
+            n=np.zeros(shape, dtype=int)
+        )
+        # Первая неделя ушла на инициализацию
+        self._run(state, values[:, m:], start + timedelta(days=m))
+
+        best = state.sse.argmin(axis=0)
+        series = np.arange(n_series)
+        return HoltWintersState(
+            alpha=alpha[best, series],
+            beta=beta[best, series],
+            gamma=gamma[best, series],
+            level=state.level[best, series],
+            trend=state.trend[best, series],
+            season=state.season[best, series],
+            sse=state.sse[best, series],
+            n=state.n[best, series]
+        )
+
+    def update(
+        self,
+        state: HoltWintersState,
+        values: np.ndarray,
+        start: date,
+        mask: Optional[np.ndarray] = None
+    ) -> HoltWintersState:
+        """
+        Продолжение рекурсии по новым дням с сохраненными параметрами.
+
+        Args:
+            state: Состояние рядов (изменяется на месте)
+            values: Матрица рядов x новых дней
+            start: Дата первого столбца
+            mask: Матрица той же формы; False - день уже учтен для ряда
+
+        Returns:
+            HoltWintersState: Обновленное состояние
+        """
+        self._run(state, values, start, mask)
+        return state
+
+    def forecast(self, state: HoltWintersState, last_date: date, horizon: int = 7) -> np.ndarray:
+        """
+        Прогноз на horizon дней после last_date.
+
+        Args:
+            state: Состояние рядов
+            last_date: Последний учтенный день
+            horizon: Горизонт прогноза в днях
+
+        Returns:
+            np.ndarray: Матрица рядов x дней прогноза, не меньше нуля
+        """
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(self.phi ** steps)
+        weekdays = (last_date.weekday() + steps) % self.SEASON_LENGTH
+        result = (
+            state.level[:, None]
+            + damped[None, :] * state.trend[:, None]
+            + state.season[:, weekdays]
+        )
+        return np.maximum(result, 0.0)
+
+    def _run(
+        self,
+        state: HoltWintersState,
+        values: np.ndarray,
+        start: date,
+        mask: Optional[np.ndarray] = None
+    ) -> None:
+        """Шаги рекурсии по дням; оси состояния: (..., ряд)."""
+        phi = self.phi
+        for day in range(values.shape[1]):
+            weekday = (start.weekday() + day) % self.SEASON_LENGTH
+            y = values[:, day]
+            active = True if mask is None else mask[:, day]
+
+            season = state.season[..., weekday]
+            damped_trend = phi * state.trend
+            error = y - (state.level + damped_trend + season)
+            level = state.alpha * (y - season) + (1 - state.alpha) * (state.level + damped_trend)
+            trend = state.beta * (level - state.level) + (1 - state.beta) * damped_trend
+            new_season = state.gamma * (y - level) + (1 - state.gamma) * season
+
+            state.sse = np.where(active, state.sse + error ** 2, state.sse)
+            state.n = np.where(active, state.n + 1, state.n)
+            state.level = np.where(active, level, state.level)
+            state.trend = np.where(active, trend, state.trend)
+            state.season[..., weekday] = np.where(active, new_season, season)
+
+
+class ClickForecaster:
+    """Прогноз кликов и показов по запросам и категориям с хранением состояния."""
+
+    METRICS = ['clicks', 'impressions']
+    TOTAL_KEY = 'all'
+    STATE_COLUMNS = [
+        'series_type', 'series_key', 'metric', 'alpha', 'beta', 'gamma',
+        'level', 'trend', 'season', 'sse', 'n', 'last_date', 'fitted_at'
+    ]
+
+    def __init__(
+        self,
+        db: PostgresClient,
+        history_days: int = 90,
+        refit_days: int = 28,
+        min_impressions: int = 50
+    ):
+        """
+        Инициализация прогноза.
+
+        Args:
+            db: Клиент базы данных
+            history_days: Глубина истории для подбора параметров
+            refit_days: Через сколько дней параметры подбираются заново
+            min_impressions: Минимум показов запроса за историю для прогноза
+        """
+        self.db = db
+        self.history_days = history_days
+        self.refit_days = refit_days
+        self.min_impressions = min_impressions
+        self.model = HoltWinters()
+
+    def build_series(self, facts: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ряды по запросам, категориям и сайту целиком.
+
+        Args:
+            facts: DataFrame с колонками date, query, query_type, clicks, impressions
+
+        Returns:
+            pd.DataFrame: Длинная таблица series_type, series_key, metric, date, value
+        """
+        facts = facts.assign(query_type=facts['query_type'].fillna('прочее'))
+        totals = facts.groupby('query')['impressions'].transform('sum')
+        queries = facts[totals >= self.min_impressions]
+
+        frames = [
+            queries.groupby(['query', 'date'], as_index=False)[self.METRICS].sum()
+            .rename(columns={'query': 'series_key'}).assign(series_type='query'),
+            facts.groupby(['query_type', 'date'], as_index=False)[self.METRICS].sum()
+            .rename(columns={'query_type': 'series_key'}).assign(series_type='category'),
+            facts.groupby('date', as_index=False)[self.METRICS].sum()
+            .assign(series_key=self.TOTAL_KEY, series_type='total'),
+        ]
+        return pd.concat(frames, ignore_index=True).melt(
+            id_vars=['series_type', 'series_key', 'date'],
+            value_vars=self.METRICS,
+            var_name='metric',
+            value_name='value'
+        )
+
+    @staticmethod
+    def to_matrix(series: pd.DataFrame, start: date, end: date) -> pd.DataFrame:
+        """Широкая матрица рядов x дней; дни без строк в GSC - нулевые."""
+        keys = ['series_type', 'series_key', 'metric']
+        return (
+            series.pivot_table(index=keys, columns='date', values='value', aggfunc='sum')
+            .reindex(columns=pd.date_range(start, end).date, fill_value=0)
+            .fillna(0.0)
+        )
+
+    def run(self, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Обновление состояния по новым дням и прогноз на следующую неделю.
+
+        Ряды без состояния или с устаревшими параметрами подбираются по всей
+        истории, остальные продолжаются с сохраненного состояния.
+
+        Args:
+            end_date: Последний день с данными (по умолчанию последний в базе)
+
+        Returns:
+            pd.DataFrame: Прогнозы (колонки как в таблице forecasts)
+        """
+        if end_date is None:
+            row = self.db.fetch_one("SELECT MAX(date) as max_date FROM search_queries_daily")
+            end_date = row['max_date'] if row else None
+            if end_date is None:
+                logger.info("Нет данных для прогноза")
+                return pd.DataFrame()
+
+        start_date = end_date - timedelta(days=self.history_days - 1)
+        matrix = self.to_matrix(
+            self.build_series(self._load_facts(start_date, end_date)),
+            start_date,
+            end_date
+        )
+        saved = self._load_state().set_index(['series_type', 'series_key', 'metric'])
+        saved = saved.reindex(matrix.index)
+
+        refit_before = end_date - timedelta(days=self.refit_days)
+        is_fresh = (
+            saved['last_date'].notna()
+            & (saved['last_date'] >= start_date)
+            & (saved['fitted_at'] > refit_before)
+        ).to_numpy()
+        values = matrix.to_numpy(dtype=float)
+
+        fresh = self._restore(saved[is_fresh])
+        if len(fresh):
+            # Для каждого ряда учитываем только дни после его last_date
+            dates = np.array(matrix.columns)
+            last = saved.loc[is_fresh, 'last_date'].to_numpy()
+            mask = dates[None, :] > last[:, None]
+            first_new = int(mask.any(axis=0).argmax()) if mask.any() else len(dates)
+            self.model.update(
+                fresh,
+                values[is_fresh, first_new:],
+                dates[first_new] if first_new < len(dates) else end_date,
+                mask[:, first_new:]
+            )
+
+        fitted = self.model.fit(values[~is_fresh], start_date) if (~is_fresh).any() else None
+
+        state_frames, forecast_frames = [], []
+        for selected, state, fitted_at in [
+            (is_fresh, fresh, saved.loc[is_fresh, 'fitted_at'].to_numpy()),
+            (~is_fresh, fitted, end_date)
+        ]:
+            if state is None or not len(state):
+                continue
+            index = matrix.index[selected]
+            state_frames.append(self._state_frame(index, state, end_date, fitted_at))
+            forecast_frames.append(
+                self._forecast_frame(index, state, values[selected], end_date)
+            )
+
+        states = pd.concat(state_frames, ignore_index=True)
+        forecasts = pd.concat(forecast_frames, ignore_index=True)
+        self._save(states, forecasts)
+
+        logger.info(
+            f"Прогноз на {end_date + timedelta(days=1)}: {len(forecasts)} рядов, "
+            f"подобрано заново {int((~is_fresh).sum())}"
+        )
+        return forecasts
+
+    @staticmethod
+    def shortfalls(forecasts: pd.DataFrame, threshold: float = 0.2) -> pd.DataFrame:
+        """
+        Ряды, для которых прогноз ниже фактической прошлой недели.
+
+        Args:
+            forecasts: Результат run
+            threshold: Минимальное относительное падение
+
+        Returns:
+            pd.DataFrame: Прогнозы по возрастанию expected_change
+        """
+        result = forecasts[forecasts['expected_change'] <= -threshold]
+        return result.sort_values('expected_change')
+
+    def _forecast_frame(
+        self,
+        index: pd.MultiIndex,
+        state: HoltWintersState,
+        values: np.ndarray,
+        end_date: date
+    ) -> pd.DataFrame:
+        """Прогноз суммы за следующую неделю с интервалом +-2 стандартных ошибки."""
+        horizon = HoltWinters.SEASON_LENGTH
+        forecast = self.model.forecast(state, end_date, horizon).sum(axis=1)
+        # Ошибки по дням считаем независимыми
+        margin = 2 * state.rmse * np.sqrt(horizon)
+        frame = index.to_frame(index=False)
+        frame['forecast_date'] = end_date
+        frame['period_start'] = end_date + timedelta(days=1)
+        frame['period_end'] = end_date + timedelta(days=horizon)
+        frame['forecast'] = forecast
+        frame['lower'] = np.maximum(forecast - margin, 0.0)
+        frame['upper'] = forecast + margin
+        actual = values[:, -horizon:].sum(axis=1)
+        frame['last_week_actual'] = actual
+        # Относительное изменение прогноза к прошлой неделе (NaN без показов)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['expected_change'] = np.where(actual > 0, forecast / actual - 1, np.nan)
+        return frame
+
+    @staticmethod
+    def _state_frame(
+        index: pd.MultiIndex,
+        state: HoltWintersState,
+        last_date: date,
+        fitted_at
+    ) -> pd.DataFrame:
+        """Состояние рядов в виде строк таблицы forecast_state."""
+        frame = index.to_frame(index=False)
+        frame['alpha'] = state.alpha
+        frame['beta'] = state.beta
+        frame['gamma'] = state.gamma
+        frame['level'] = state.level
+        frame['trend'] = state.trend
+        frame['season'] = list(state.season)
+        frame['sse'] = state.sse
+        frame['n'] = state.n
+        frame['last_date'] = last_date
+        frame['fitted_at'] = fitted_at
+        return frame
+
+    @staticmethod
+    def _restore(saved: pd.DataFrame) -> HoltWintersState:
+        """Состояние из строк таблицы forecast_state."""
+        return HoltWintersState(
+            alpha=saved['alpha'].to_numpy(dtype=float),
+            beta=saved['beta'].to_numpy(dtype=float),
+            gamma=saved['gamma'].to_numpy(dtype=float),
+            level=saved['level'].to_numpy(dtype=float),
+            trend=saved['trend'].to_numpy(dtype=float),
+            season=np.array(saved['season'].tolist(), dtype=float).reshape(
+                len(saved), HoltWinters.SEASON_LENGTH
+            ),
+            sse=saved['sse'].to_numpy(dtype=float),
+            n=saved['n'].to_numpy(dtype=int)
+        )
+
+    def _load_facts(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Дневные клики и показы по запросам из search_queries_daily."""
+        rows = self.db.fetch_all("""
+            SELECT date, query, query_type, SUM(clicks) as clicks, SUM(impressions) as impressions
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+            GROUP BY date, query, query_type
+        """, (start_date, end_date))
+        return pd.DataFrame(
+            rows, columns=['date', 'query', 'query_type', 'clicks', 'impressions']
+        )
+
+    def _load_state(self) -> pd.DataFrame:
+        """Сохраненное состояние всех рядов."""
+        rows = self.db.fetch_all(f"""
+            SELECT {', '.join(self.STATE_COLUMNS)}
+            FROM forecast_state
+        """)
+        return pd.DataFrame(rows, columns=self.STATE_COLUMNS)
+
+    def _save(self, states: pd.DataFrame, forecasts: pd.DataFrame) -> None:
+        """Сохранение состояния и прогнозов в одной транзакции."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO forecast_state ({', '.join(self.STATE_COLUMNS)})
+                    VALUES %s
+                    ON CONFLICT (series_type, series_key, metric) DO UPDATE SET
+                        alpha = EXCLUDED.alpha,
+                        beta = EXCLUDED.beta,
+                        gamma = EXCLUDED.gamma,
+                        level = EXCLUDED.level,
+                        trend = EXCLUDED.trend,
+                        season = EXCLUDED.season,
+                        sse = EXCLUDED.sse,
+                        n = EXCLUDED.n,
+                        last_date = EXCLUDED.last_date,
+                        fitted_at = EXCLUDED.fitted_at,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    [
+                        (
+                            row.series_type, row.series_key, row.metric,
+                            float(row.alpha), float(row.beta), float(row.gamma),
+                            float(row.level), float(row.trend),
+                            [float(value) for value in row.season],
+                            float(row.sse), int(row.n), row.last_date, row.fitted_at
+                        )
+                        for row in states.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO forecasts (
+                        forecast_date, series_type, series_key, metric,
+                        period_start, period_end, forecast, lower, upper,
+                        last_week_actual, expected_change
+                    )
+                    VALUES %s
+                    ON CONFLICT (forecast_date, series_type, series_key, metric) DO UPDATE SET
+                        forecast = EXCLUDED.forecast,
+                        lower = EXCLUDED.lower,
+                        upper = EXCLUDED.upper,
+                        last_week_actual = EXCLUDED.last_week_actual,
+                        expected_change = EXCLUDED.expected_change
+                    """,
+                    [
+                        (
+                            row.forecast_date, row.series_type, row.series_key, row.metric,
+                            row.period_start, row.period_end, float(row.forecast),
+                            float(row.lower), float(row.upper), float(row.last_week_actual),
+                            None if np.isnan(row.expected_change) else float(row.expected_change)
+                        )
+                        for row in forecasts.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
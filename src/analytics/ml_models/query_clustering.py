@@ -0,0 +1,406 @@
+"""
+Кластеризация поисковых запросов по темам.
+
+Запросы представляются разреженными TF-IDF векторами символьных n-грамм
+(устойчиво к опечаткам, падежам и транслиту) и группируются MiniBatchKMeans.
+Центроиды хранятся усеченными до самых весомых n-грамм в разреженном виде,
+поэтому новые запросы назначаются в существующие темы одним умножением
+разреженных матриц без переобучения. Модель хранится в таблице
+query_cluster_models, назначения - в query_cluster_assignments.
+"""
+import pickle
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_SPACES = re.compile(r'\s+')
+
+
+class QueryClusterer:
+    """Кластеризация запросов на TF-IDF символьных n-грамм."""
+
+    # Кластер для запросов, не похожих ни на одну тему
+    UNASSIGNED = -1
+    MAX_CLUSTERS = 300
+
+    def __init__(
+        self,
+        n_clusters: Optional[int] = None,
+        ngram_range: tuple = (3, 5),
+        min_df: int = 2,
+        centroid_terms: int = 500,
+        min_similarity: float = 0.2,
+        random_state: int = 42
+    ):
+        """
+        Инициализация модели.
+
+        Args:
+            n_clusters: Количество тем (по умолчанию sqrt(n/2) запросов)
+            ngram_range: Длины символьных n-грамм
+            min_df: Минимальное количество запросов с n-граммой
+            centroid_terms: Количество n-грамм, сохраняемых в каждом центроиде
+            min_similarity: Минимальное косинусное сходство для назначения темы
+            random_state: Зерно генератора случайных чисел
+        """
+        self.n_clusters = n_clusters
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.centroid_terms = centroid_terms
+        self.min_similarity = min_similarity
+        self.random_state = random_state
+
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.centroids: Optional[sparse.csr_matrix] = None
+        self.clusters = pd.DataFrame(columns=['cluster_id', 'label', 'size'])
+        self.fitted_at: Optional[datetime] = None
+        self.model_id: Optional[int] = None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Приведение запроса к нижнему регистру с одиночными пробелами."""
+        return _SPACES.sub(' ', str(query).lower()).strip()
+
+    def fit(
+        self,
+        queries: Sequence[str],
+        weights: Optional[Sequence[float]] = None
+    ) -> 'QueryClusterer':
+        """
+        Обучение модели.
+
+        Args:
+            queries: Поисковые запросы
+            weights: Веса запросов (например, показы); популярные запросы
+                     сильнее влияют на центроиды
+
+        Returns:
+            QueryClusterer: Обученная модель
+        """
+        data = pd.DataFrame({
+            'query': [self.normalize_query(query) for query in queries],
+            'weight': 1.0 if weights is None else np.asarray(weights, dtype=float)
+        })
+        data = data[data['query'] != ''].groupby('query', as_index=False)['weight'].sum()
+        if len(data) < 2:
+            raise ValueError("Недостаточно запросов для кластеризации")
+
+        n_clusters = self.n_clusters or int(np.clip(np.sqrt(len(data) / 2), 2, self.MAX_CLUSTERS))
+        n_clusters = min(n_clusters, len(data))
+
+        self.vectorizer = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=self.ngram_range,
+            min_df=min(self.min_df, len(data)),
+            sublinear_tf=True,
+            dtype=np.float32
+        )
+        matrix = self.vectorizer.fit_transform(data['query'])
+
+        model = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            batch_size=4096,
+            n_init=3,
+            random_state=self.random_state
+        )
+        # Логарифм сглаживает разброс показов между запросами
+        model.fit(matrix, sample_weight=np.log1p(data['weight'].to_numpy()) + 1.0)
+        self.centroids = self._truncate(model.cluster_centers_)
+
+        assigned = self._assign_matrix(matrix)
+        data['cluster_id'] = assigned['cluster_id']
+        data['similarity'] = assigned['similarity']
+        self.clusters = self._describe(data, n_clusters)
+        self.fitted_at = datetime.now(timezone.utc)
+        self.model_id = None
+
+        logger.info(f"Кластеризовано {len(data)} запросов в {n_clusters} тем")
+        return self
+
+    def transform(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        """
+        TF-IDF векторы запросов в словаре обученной модели.
+
+        Args:
+            queries: Поисковые запросы
+
+        Returns:
+            sparse.csr_matrix: Нормированные векторы
+        """
+        if self.vectorizer is None:
+            raise ValueError("Модель не обучена")
+        return self.vectorizer.transform([self.normalize_query(query) for query in queries])
+
+    def assign(self, queries: Sequence[str]) -> pd.DataFrame:
+        """
+        Назначение запросов в существующие темы без переобучения.
+
+        Args:
+            queries: Поисковые запросы
+
+        Returns:
+            pd.DataFrame: query, cluster_id, similarity; запросы без похожей
+                          темы получают cluster_id = UNASSIGNED
+        """
+        queries = list(queries)
+        assigned = self._assign_matrix(self.transform(queries))
+        assigned.insert(0, 'query', queries)
+        return assigned
+
+    def topic_labels(self) -> Dict[int, str]:
+        """Соответствие номера темы и ее названия."""
+        return dict(zip(self.clusters['cluster_id'], self.clusters['label']))
+
+    def to_bytes(self) -> bytes:
+        """Сериализация обученной модели."""
+        return pickle.dumps({
+            'params': {
+                'n_clusters': self.n_clusters,
+                'ngram_range': self.ngram_range,
+                'min_df': self.min_df,
+                'centroid_terms': self.centroid_terms,
+                'min_similarity': self.min_similarity,
+                'random_state': self.random_state
+            },
+            'vectorizer': self.vectorizer,
+            'centroids': self.centroids,
+            'clusters': self.clusters,
+            'fitted_at': self.fitted_at
+        })
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'QueryClusterer':
+        """Восстановление модели из результата to_bytes."""
+        state = pickle.loads(data)
+        clusterer = cls(**state['params'])
+        clusterer.vectorizer = state['vectorizer']
+        clusterer.centroids = state['centroids']
+        clusterer.clusters = state['clusters']
+        clusterer.fitted_at = state['fitted_at']
+        return clusterer
+
+    def save(self, db: PostgresClient) -> int:
+        """
+        Сохранение модели и описания тем.
+
+        Args:
+            db: Клиент базы данных
+
+        Returns:
+            int: Идентификатор сохраненной модели
+        """
+        if self.vectorizer is None:
+            raise ValueError("Модель не обучена")
+
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO query_cluster_models (fitted_at, n_clusters, model)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                    """,
+                    (self.fitted_at, len(self.clusters), self.to_bytes())
+                )
+                self.model_id = cur.fetchone()[0]
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO query_clusters (model_id, cluster_id, label, size)
+                    VALUES %s
+                    """,
+                    [
+                        (self.model_id, int(row.cluster_id), row.label, int(row.size))
+                        for row in self.clusters.itertuples(index=False)
+                    ]
+                )
+
+        logger.info(f"Модель кластеризации {self.model_id} сохранена: {len(self.clusters)} тем")
+        return self.model_id
+
+    @classmethod
+    def load(cls, db: PostgresClient) -> Optional['QueryClusterer']:
+        """
+        Загрузка последней сохраненной модели.
+
+        Args:
+            db: Клиент базы данных
+
+        Returns:
+            Optional[QueryClusterer]: Модель или None, если она еще не обучена
+        """
+        row = db.fetch_one("""
+            SELECT id, model
+            FROM query_cluster_models
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        if not row:
+            return None
+        clusterer = cls.from_bytes(bytes(row['model']))
+        clusterer.model_id = row['id']
+        return clusterer
+
+    @classmethod
+    def fit_from_db(cls, db: PostgresClient, days: int = 90, **params) -> 'QueryClusterer':
+        """
+        Обучение модели на запросах search_queries_daily за период.
+
+        Args:
+            db: Клиент базы данных
+            days: Количество дней истории
+            **params: Параметры конструктора
+
+        Returns:
+            QueryClusterer: Обученная модель
+        """
+        start_date = (datetime.now() - timedelta(days=days)).date()
+        rows = db.fetch_all("""
+            SELECT query, SUM(impressions) as impressions
+            FROM search_queries_daily
+            WHERE date >= %s
+            GROUP BY query
+        """, (start_date,))
+
+        return cls(**params).fit(
+            [row['query'] for row in rows],
+            [row['impressions'] for row in rows]
+        )
+
+    def assign_new(self, db: PostgresClient, batch_size: int = 10000) -> int:
+        """
+        Назначение тем запросам, у которых нет назначения от текущей модели.
+
+        Args:
+            db: Клиент базы данных
+            batch_size: Размер пачки запросов
+
+        Returns:
+            int: Количество назначенных запросов
+        """
+        if self.model_id is None:
+            raise ValueError("Модель не сохранена")
+
+        rows = db.fetch_all("""
+            SELECT DISTINCT sq.query
+            FROM search_queries_daily sq
+            LEFT JOIN query_cluster_assignments a ON a.query = sq.query
+            WHERE a.query IS NULL OR a.model_id <> %s
+        """, (self.model_id,))
+        queries = [row['query'] for row in rows]
+
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                for start in range(0, len(queries), batch_size):
+                    assigned = self.assign(queries[start:start + batch_size])
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO query_cluster_assignments (
+                            query, model_id, cluster_id, similarity
+                        )
+                        VALUES %s
+                        ON CONFLICT (query) DO UPDATE SET
+                            model_id = EXCLUDED.model_id,
+                            cluster_id = EXCLUDED.cluster_id,
+                            similarity = EXCLUDED.similarity,
+                            assigned_at = CURRENT_TIMESTAMP
+                        """,
+                        [
+                            (row.query, self.model_id, int(row.cluster_id), float(row.similarity))
+                            for row in assigned.itertuples(index=False)
+                        ]
+                    )
+
+        logger.info(f"Назначены темы для {len(queries)} запросов")
+        return len(queries)
+
+    def _truncate(self, centers: np.ndarray) -> sparse.csr_matrix:
+        """Разреженные нормированные центроиды из centroid_terms самых весомых n-грамм."""
+        centers = np.asarray(centers, dtype=np.float32)
+        keep = min(self.centroid_terms, centers.shape[1])
+        top = np.argpartition(-centers, keep - 1, axis=1)[:, :keep]
+        rows = np.repeat(np.arange(centers.shape[0]), keep)
+        values = np.take_along_axis(centers, top, axis=1).ravel()
+        truncated = sparse.csr_matrix(
+            (values, (rows, top.ravel())),
+            shape=centers.shape
+        )
+        truncated.eliminate_zeros()
+        return normalize(truncated)
+
+    def _assign_matrix(self, matrix: sparse.csr_matrix) -> pd.DataFrame:
+        """Ближайший центроид и косинусное сходство для каждой строки матрицы."""
+        similarity = (matrix @ self.centroids.T).toarray()
+        if similarity.shape[0] == 0:
+            return pd.DataFrame({'cluster_id': [], 'similarity': []})
+        best = similarity.argmax(axis=1)
+        score = similarity[np.arange(len(best)), best]
+        cluster_id = np.where(score >= self.min_similarity, best, self.UNASSIGNED)
+        return pd.DataFrame({'cluster_id': cluster_id, 'similarity': score})
+
+    @staticmethod
+    def _describe(data: pd.DataFrame, n_clusters: int) -> pd.DataFrame:
+        """Размер темы и ее название - самый популярный запрос среди ближайших к центру."""
+        assigned = data[data['cluster_id'] >= 0]
+        sizes = assigned.groupby('cluster_id').size()
+        # Среди запросов со сходством не ниже медианы темы берем самый популярный
+        median = assigned.groupby('cluster_id')['similarity'].transform('median')
+        central = assigned[assigned['similarity'] >= median]
+        labels = central.sort_values('weight', ascending=False).drop_duplicates('cluster_id')
+        labels = labels.set_index('cluster_id')['query']
+
+        clusters = pd.DataFrame({'cluster_id': np.arange(n_clusters)})
+        clusters['label'] = clusters['cluster_id'].map(labels).fillna('')
+        clusters['size'] = clusters['cluster_id'].map(sizes).fillna(0).astype(int)
+        return clusters
+
+
+def get_topic_stats(db: PostgresClient, days: int = 7, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Метрики поиска по темам текущей модели кластеризации.
+
+    Args:
+        db: Клиент базы данных
+        days: Количество дней
+        limit: Количество тем с наибольшим числом показов (None - все)
+
+    Returns:
+        List[Dict]: topic, queries, clicks, impressions, position
+                    в порядке убывания показов; пустой список, пока модель не обучена
+    """
+    model = db.fetch_one("SELECT MAX(id) as model_id FROM query_cluster_models")
+    if not model or model['model_id'] is None:
+        return []
+
+    start_date = (datetime.now() - timedelta(days=days)).date()
+    return db.fetch_all("""
+        SELECT
+            COALESCE(NULLIF(c.label, ''), 'без темы') as topic,
+            COUNT(DISTINCT sq.query) as queries,
+            SUM(sq.clicks) as clicks,
+            SUM(sq.impressions) as impressions,
+            SUM(sq.position * sq.impressions) / NULLIF(SUM(sq.impressions), 0) as position
+        FROM search_queries_daily sq
+        JOIN query_cluster_assignments a ON a.query = sq.query
+        LEFT JOIN query_clusters c
+            ON c.model_id = a.model_id AND c.cluster_id = a.cluster_id
+        WHERE sq.date >= %s
+          AND a.model_id = %s
+        GROUP BY 1
+        ORDER BY impressions DESC
+        LIMIT %s
+    """, (start_date, model['model_id'], limit))
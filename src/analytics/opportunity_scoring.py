@@ -0,0 +1,395 @@
+"""
+Инкрементальная оценка точек роста по запросам и страницам.
+
+Для каждого запроса и каждой страницы хранятся суммы за скользящее окно
+(клики, показы, позиция с весом по показам) и оценка возможности:
+
+- lost_clicks - клики, недополученные из-за CTR ниже ожидаемого по кривой
+  CTR на текущей позиции;
+- upside_clicks - дополнительные клики при подъеме до target_position.
+
+После загрузки данных пересчитываются только сущности, у которых
+изменились факты: появились новые строки, строки вышли из окна или были
+дозагружены задним числом. Рейтинг строится кучей (heapq.nlargest) по
+пересчитанным сущностям и лучшим из неизменившихся; каждый запуск
+сохраняет рейтинг в историю, откуда его читают бот и отчеты.
+"""
+import heapq
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from src.analytics.ctr_curve import CTRCurve
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class OpportunityScorer:
+    """Инкрементальный расчет и рейтинг точек роста."""
+
+    # Тип сущности -> колонка search_queries_daily
+    ENTITIES = {'query': 'query', 'page': 'page_url'}
+    SUM_COLUMNS = ['entity_key', 'clicks', 'impressions', 'weighted_position']
+    SCORE_COLUMNS = SUM_COLUMNS + [
+        'position', 'ctr', 'expected_ctr', 'lost_clicks', 'upside_clicks', 'score'
+    ]
+
+    def __init__(
+        self,
+        db: PostgresClient,
+        window_days: int = 28,
+        top_k: int = 50,
+        min_impressions: int = 50,
+        target_position: int = 3
+    ):
+        """
+        Инициализация.
+
+        Args:
+            db: Клиент базы данных
+            window_days: Длина скользящего окна
+            top_k: Размер сохраняемого рейтинга по каждому типу сущностей
+            min_impressions: Минимум показов за окно для попадания в рейтинг
+            target_position: Позиция, подъем до которой оценивается в upside_clicks
+        """
+        self.db = db
+        self.window_days = window_days
+        self.top_k = top_k
+        self.min_impressions = min_impressions
+        self.target_position = target_position
+
+    def score(self, sums: pd.DataFrame, curve: CTRCurve) -> pd.DataFrame:
+        """
+        Оценка возможностей по суммам за окно.
+
+        Args:
+            sums: DataFrame с колонками SUM_COLUMNS
+            curve: Кривая ожидаемого CTR
+
+        Returns:
+            pd.DataFrame: Колонки SCORE_COLUMNS; у сущностей с показами ниже
+                          min_impressions score равен нулю
+        """
+        scored = sums[self.SUM_COLUMNS].copy()
+        impressions = scored['impressions'].to_numpy(dtype=float)
+        has_impressions = impressions > 0
+        scored['position'] = np.divide(
+            scored['weighted_position'].to_numpy(dtype=float), impressions,
+            out=np.zeros_like(impressions), where=has_impressions
+        )
+        scored['ctr'] = np.divide(
+            scored['clicks'].to_numpy(dtype=float), impressions,
+            out=np.zeros_like(impressions), where=has_impressions
+        )
+        scored['expected_ctr'] = curve.expected_ctr(scored[['position']]).to_numpy(dtype=float)
+        target_ctr = curve.expected_ctr(
+            pd.DataFrame({'position': np.minimum(scored['position'], self.target_position)})
+        ).to_numpy(dtype=float)
+
+        scored['lost_clicks'] = impressions * np.clip(scored['expected_ctr'] - scored['ctr'], 0, None)
+        scored['upside_clicks'] = impressions * np.clip(target_ctr - scored['expected_ctr'], 0, None)
+        scored['score'] = np.where(
+            impressions >= self.min_impressions,
+            scored['lost_clicks'] + scored['upside_clicks'],
+            0.0
+        )
+        return scored
+
+    def rank(self, changed: pd.DataFrame, unchanged_top: pd.DataFrame) -> pd.DataFrame:
+        """
+        Рейтинг top_k по пересчитанным сущностям и лучшим из остальных.
+
+        Новый топ целиком лежит в объединении пересчитанных сущностей и
+        топа неизменившихся, поэтому остальные оценки не загружаются.
+
+        Args:
+            changed: Пересчитанные оценки (колонки SCORE_COLUMNS)
+            unchanged_top: Лучшие top_k оценок неизменившихся сущностей
+
+        Returns:
+            pd.DataFrame: Рейтинг с колонкой rank (с 1)
+        """
+        candidates = [
+            frame[self.SCORE_COLUMNS] for frame in (changed, unchanged_top) if not frame.empty
+        ]
+        if not candidates:
+            return pd.DataFrame(columns=['rank'] + self.SCORE_COLUMNS)
+        candidates = pd.concat(candidates, ignore_index=True)
+        candidates = candidates[candidates['score'] > 0]
+
+        scores = candidates['score'].to_numpy()
+        top = heapq.nlargest(self.top_k, range(len(candidates)), key=lambda i: scores[i])
+        ranked = candidates.iloc[top].reset_index(drop=True)
+        ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+        return ranked
+
+    def run(self, end_date: Optional[date] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Пересчет изменившихся сущностей и сохранение рейтинга.
+
+        Args:
+            end_date: Последний день окна (по умолчанию последний в базе)
+
+        Returns:
+            Dict[str, pd.DataFrame]: Рейтинг по типу сущности
+        """
+        if end_date is None:
+            row = self.db.fetch_one("SELECT MAX(date) as max_date FROM search_queries_daily")
+            end_date = row['max_date'] if row else None
+            if end_date is None:
+                logger.info("Нет данных для оценки точек роста")
+                return {}
+        start_date = end_date - timedelta(days=self.window_days - 1)
+        started_at = datetime.now()
+
+        last_run = self.db.fetch_one("""
+            SELECT run_at, window_start, window_end, curve_fitted_at
+            FROM opportunity_runs
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        curve = CTRCurve.load(self.db) or CTRCurve.fit_from_db(self.db)
+        curve_row = self.db.fetch_one("SELECT MAX(fitted_at) as fitted_at FROM ctr_curve")
+        curve_fitted_at = curve_row['fitted_at'] if curve_row else None
+        # После перестроения кривой оценки всех сущностей устарели
+        rescore_all = last_run is None or last_run['curve_fitted_at'] != curve_fitted_at
+
+        rankings, changed_counts = {}, {}
+        for entity_type, column in self.ENTITIES.items():
+            # Без прошлого запуска или при пересчете за более ранний день - полный расчет
+            if last_run is None or end_date < last_run['window_end']:
+                changed_keys = None
+            else:
+                changed_keys = self._changed_keys(column, last_run, start_date)
+            sums = self._load_sums(column, start_date, end_date, changed_keys)
+
+            if rescore_all and changed_keys is not None:
+                stored = self._load_stored_sums(entity_type, changed_keys)
+                sums = pd.concat([sums, stored], ignore_index=True)
+            scored = self.score(sums, curve)
+
+            keys = None if changed_keys is None else sorted(set(changed_keys) | set(scored['entity_key']))
+            unchanged_top = self._load_unchanged_top(entity_type, keys)
+            rankings[entity_type] = self.rank(scored, unchanged_top)
+            changed_counts[entity_type] = len(scored)
+
+            self._save_scores(entity_type, scored, keys, start_date, end_date)
+
+        self._save_run(started_at, start_date, end_date, curve_fitted_at, changed_counts, rankings)
+        logger.info(
+            f"Точки роста за {start_date} - {end_date}: пересчитано "
+            + ", ".join(f"{entity_type} {count}" for entity_type, count in changed_counts.items())
+        )
+        return rankings
+
+    def _changed_keys(self, column: str, last_run: Dict, start_date: date) -> List[str]:
+        """
+        Сущности, суммы которых изменились с прошлого запуска.
+
+        Это сущности со строками, записанными или перезаписанными после
+        прошлого запуска (updated_at), со строками новых дней и со строками,
+        вышедшими из окна.
+        """
+        rows = self.db.fetch_all(f"""
+            SELECT DISTINCT {column} as entity_key
+            FROM search_queries_daily
+            WHERE {column} IS NOT NULL
+                AND (
+                    updated_at > %s
+                    OR date > %s
+                    OR (date >= %s AND date < %s)
+                )
+        """, (last_run['run_at'], last_run['window_end'], last_run['window_start'], start_date))
+        return [row['entity_key'] for row in rows]
+
+    def _load_sums(
+        self,
+        column: str,
+        start_date: date,
+        end_date: date,
+        keys: Optional[List[str]]
+    ) -> pd.DataFrame:
+        """Суммы за окно для сущностей keys (None - для всех)."""
+        if keys is not None and not keys:
+            return pd.DataFrame(columns=self.SUM_COLUMNS)
+        key_filter = f"AND {column} = ANY(%s)" if keys is not None else ""
+        params = (start_date, end_date) + ((keys,) if keys is not None else ())
+        rows = self.db.fetch_all(f"""
+            SELECT
+                {column} as entity_key,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions,
+                SUM(position * impressions) as weighted_position
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+                AND {column} IS NOT NULL
+                {key_filter}
+            GROUP BY {column}
+        """, params)
+        return pd.DataFrame(rows, columns=self.SUM_COLUMNS)
+
+    def _load_stored_sums(self, entity_type: str, exclude: List[str]) -> pd.DataFrame:
+        """Сохраненные суммы неизменившихся сущностей для переоценки по новой кривой."""
+        rows = self.db.fetch_all("""
+            SELECT entity_key, clicks, impressions, weighted_position
+            FROM opportunity_scores
+            WHERE entity_type = %s
+                AND NOT (entity_key = ANY(%s))
+        """, (entity_type, list(exclude)))
+        return pd.DataFrame(rows, columns=self.SUM_COLUMNS)
+
+    def _load_unchanged_top(self, entity_type: str, exclude: Optional[List[str]]) -> pd.DataFrame:
+        """Лучшие сохраненные оценки сущностей, не входящих в exclude."""
+        if exclude is None:
+            return pd.DataFrame(columns=self.SCORE_COLUMNS)
+        rows = self.db.fetch_all(f"""
+            SELECT {', '.join(self.SCORE_COLUMNS)}
+            FROM opportunity_scores
+            WHERE entity_type = %s
+                AND NOT (entity_key = ANY(%s))
+                AND score > 0
+            ORDER BY score DESC
+            LIMIT %s
+        """, (entity_type, exclude, self.top_k))
+        return pd.DataFrame(rows, columns=self.SCORE_COLUMNS)
+
+    def _save_scores(
+        self,
+        entity_type: str,
+        scored: pd.DataFrame,
+        keys: Optional[List[str]],
+        start_date: date,
+        end_date: date
+    ) -> None:
+        """Запись пересчитанных оценок; сущности без строк в окне удаляются."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                if keys is None:
+                    cur.execute("DELETE FROM opportunity_scores WHERE entity_type = %s", (entity_type,))
+                else:
+                    gone = sorted(set(keys) - set(scored['entity_key']))
+                    if gone:
+                        cur.execute(
+                            """
+                            DELETE FROM opportunity_scores
+                            WHERE entity_type = %s AND entity_key = ANY(%s)
+                            """,
+                            (entity_type, gone)
+                        )
+                if scored.empty:
+                    return
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO opportunity_scores (
+                        entity_type, entity_key, window_start, window_end,
+                        clicks, impressions, weighted_position, position, ctr,
+                        expected_ctr, lost_clicks, upside_clicks, score
+                    )
+                    VALUES %s
+                    ON CONFLICT (entity_type, entity_key) DO UPDATE SET
+                        window_start = EXCLUDED.window_start,
+                        window_end = EXCLUDED.window_end,
+                        clicks = EXCLUDED.clicks,
+                        impressions = EXCLUDED.impressions,
+                        weighted_position = EXCLUDED.weighted_position,
+                        position = EXCLUDED.position,
+                        ctr = EXCLUDED.ctr,
+                        expected_ctr = EXCLUDED.expected_ctr,
+                        lost_clicks = EXCLUDED.lost_clicks,
+                        upside_clicks = EXCLUDED.upside_clicks,
+                        score = EXCLUDED.score,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    [
+                        (
+                            entity_type, row.entity_key, start_date, end_date,
+                            int(row.clicks), int(row.impressions),
+                            float(row.weighted_position), float(row.position),
+                            float(row.ctr), float(row.expected_ctr),
+                            float(row.lost_clicks), float(row.upside_clicks),
+                            float(row.score)
+                        )
+                        for row in scored.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
+
+    def _save_run(
+        self,
+        run_at: datetime,
+        start_date: date,
+        end_date: date,
+        curve_fitted_at: Optional[date],
+        changed_counts: Dict[str, int],
+        rankings: Dict[str, pd.DataFrame]
+    ) -> None:
+        """Запись запуска и рейтинга в историю."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO opportunity_runs (
+                        run_at, window_start, window_end, curve_fitted_at,
+                        changed_queries, changed_pages
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (
+                        run_at, start_date, end_date, curve_fitted_at,
+                        changed_counts.get('query', 0), changed_counts.get('page', 0)
+                    )
+                )
+                run_id = cur.fetchone()[0]
+                rows = [
+                    (
+                        run_id, entity_type, int(row.rank), row.entity_key,
+                        int(row.clicks), int(row.impressions), float(row.position),
+                        float(row.ctr), float(row.expected_ctr), float(row.lost_clicks),
+                        float(row.upside_clicks), float(row.score)
+                    )
+                    for entity_type, ranking in rankings.items()
+                    for row in ranking.itertuples(index=False)
+                ]
+                if rows:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO opportunity_history (
+                            run_id, entity_type, rank, entity_key, clicks,
+                            impressions, position, ctr, expected_ctr,
+                            lost_clicks, upside_clicks, score
+                        )
+                        VALUES %s
+                        """,
+                        rows
+                    )
+
+
+def get_top_opportunities(db: PostgresClient, entity_type: str = 'query', limit: int = 10) -> List[Dict]:
+    """
+    Текущий рейтинг точек роста из последнего запуска.
+
+    Args:
+        db: Клиент базы данных
+        entity_type: query или page
+        limit: Количество позиций рейтинга
+
+    Returns:
+        List[Dict]: Строки opportunity_history по возрастанию rank
+    """
+    return db.fetch_all("""
+        SELECT rank, entity_key, clicks, impressions, position, ctr,
+               expected_ctr, lost_clicks, upside_clicks, score
+        FROM opportunity_history
+        WHERE run_id = (SELECT MAX(id) FROM opportunity_runs)
+            AND entity_type = %s
+        ORDER BY rank
+        LIMIT %s
+    """, (entity_type, limit))
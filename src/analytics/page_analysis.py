@@ -1,20 +1,57 @@
 """
 Модуль для анализа эффективности страниц.
+
+Показатели страниц берутся из таблицы page_facts, которую пакетно
+заполняет PageFactsBuilder (GSC, Яндекс.Метрика и GA4 по посадочным
+страницам). Факты загружаются один раз, поиск страницы - обращение к словарю.
 """
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 import pandas as pd
-import numpy as np
+
+from src.analytics.page_facts import load_page_facts
+from src.database.postgres_client import PostgresClient
+from src.reports.category_router import category_router
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 class PageAnalyzer:
-    def __init__(self, db_client):
+    def __init__(self, db_client, facts: Optional[Dict[str, Dict]] = None):
         """
         Инициализация анализатора страниц.
         
         Args:
             db_client: Клиент для работы с базой данных
+            facts: Уже загруженные факты по страницам {путь: строка page_facts};
+                   если не переданы, читаются из БД при первом обращении
         """
         self.db = db_client
+        self._facts = facts
+        
+    @property
+    def page_facts(self) -> Dict[str, Dict]:
+        """Факты по страницам за последний рассчитанный период."""
+        if self._facts is None:
+            try:
+                # Факты хранятся в Postgres; клиент Supabase запросов не выполняет
+                db = self.db if hasattr(self.db, 'fetch_all') else PostgresClient()
+                self._facts = load_page_facts(db)
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке фактов по страницам: {str(e)}")
+                self._facts = {}
+        return self._facts
+        
+    def get_page_facts(self, url: str) -> Optional[Dict]:
+        """
+        Факты страницы по URL или пути.
+        
+        Args:
+            url: URL страницы
+            
+        Returns:
+            Строка page_facts или None, если страница не найдена
+        """
+        return self.page_facts.get(category_router.normalize(url))
         
     def analyze_page(
         self,
@@ -26,15 +63,52 @@ class PageAnalyzer:
         
         Args:
             url: URL страницы
-            days: Количество дней для анализа
+            days: Не используется, период определяется расчетом page_facts
             
         Returns:
             Словарь с результатами анализа
         """
-        # Получаем данные из тестового датасета
-        df = pd.DataFrame(self.db.execute_query(""))
-        page_data = df[df['url'] == url]
+        return self.analyze_pages([url], days)[url]
+        
+    def analyze_pages(
+        self,
+        urls: List[str],
+        days: int = 30,
+        data: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Dict]:
+        """
+        Анализ набора страниц.
         
+        Args:
+            urls: Список URL страниц
+            days: Не используется, период определяется расчетом page_facts
+            data: Уже загруженные поисковые данные (колонки url, query, clicks,
+                  impressions, position); если не переданы, поисковые метрики
+                  тоже берутся из page_facts
+            
+        Returns:
+            Словарь {url: результат анализа}
+        """
+        if data is None:
+            return {url: self.analyze_page_facts(self.get_page_facts(url)) for url in urls}
+            
+        groups = dict(tuple(data.groupby('url'))) if not data.empty else {}
+        return {
+            url: self.analyze_page_data(groups.get(url, data.iloc[0:0]), self.get_page_facts(url))
+            for url in urls
+        }
+        
+    def analyze_page_data(self, page_data: pd.DataFrame, facts: Optional[Dict] = None) -> Dict:
+        """
+        Анализ страницы по уже загруженным поисковым данным.
+        
+        Args:
+            page_data: Данные одной страницы
+            facts: Строка page_facts страницы для показателей конверсий
+            
+        Returns:
+            Словарь с результатами анализа
+        """
         if page_data.empty:
             return {
                 'status': 'error',
@@ -52,12 +126,55 @@ class PageAnalyzer:
                 'avg_position': float(page_data['position'].mean()),
                 'query_count': len(page_data['query'].unique())
             },
-            'conversions': {
-                'count': np.random.randint(10, 100),  # Тестовые данные
-                'value': np.random.randint(1000, 10000)  # Тестовые данные
+            'conversions': self._conversion_metrics(facts)
+        }
+        return self._analyze_metrics(metrics)
+        
+    def analyze_page_facts(self, facts: Optional[Dict]) -> Dict:
+        """
+        Анализ страницы по строке page_facts.
+        
+        Args:
+            facts: Строка page_facts страницы
+            
+        Returns:
+            Словарь с результатами анализа
+        """
+        if not facts:
+            return {
+                'status': 'error',
+                'message': 'Нет данных для страницы'
             }
+            
+        metrics = {
+            'traffic': {
+                'clicks': int(facts['clicks']),
+                'impressions': int(facts['impressions']),
+                'ctr': float(facts['ctr'])
+            },
+            'visibility': {
+                'avg_position': float(facts['position']),
+                'query_count': int(facts['queries'])
+            },
+            'conversions': self._conversion_metrics(facts)
+        }
+        return self._analyze_metrics(metrics)
+        
+    @staticmethod
+    def _conversion_metrics(facts: Optional[Dict]) -> Dict:
+        """Показатели Метрики и GA4 из строки page_facts (нули без данных)."""
+        facts = facts or {}
+        return {
+            'count': int(facts.get('purchases', 0)),
+            'value': float(facts.get('revenue', 0)),
+            'sessions': int(facts.get('sessions', 0)),
+            'visits': int(facts.get('visits', 0)),
+            'bounce_rate': float(facts.get('bounce_rate', 0)),
+            'goal_reaches': int(facts.get('goal_reaches', 0))
         }
         
+    def _analyze_metrics(self, metrics: Dict) -> Dict:
+        """Потенциал роста, проблемы и рекомендации по метрикам страницы."""
         # Анализируем потенциал роста
         growth_potential = self._analyze_growth_potential(metrics)
         
@@ -0,0 +1,239 @@
+"""
+Сводная таблица фактов по посадочным страницам.
+
+За период по каждой странице объединяются:
+
+- GSC: клики, показы, средняя позиция и количество запросов
+  (search_queries_daily);
+- Яндекс.Метрика: органические визиты, отказы и достижения целей;
+- GA4: органические сессии, покупки и выручка электронной коммерции.
+
+Источники сводятся по пути страницы без хоста и параметров. Все страницы
+считаются одним пакетным проходом и сохраняются в page_facts; анализ
+страниц читает готовые факты вместо обращения к источникам.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from src.database.postgres_client import PostgresClient
+from src.reports.category_router import category_router
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PageFactsBuilder:
+    """Пакетный расчет фактов по страницам из GSC, Метрики и GA4."""
+
+    GSC_COLUMNS = ['page_path', 'clicks', 'impressions', 'weighted_position', 'queries']
+    METRIKA_COLUMNS = ['page_path', 'visits', 'bounces', 'goal_reaches']
+    GA4_COLUMNS = ['page_path', 'sessions', 'purchases', 'revenue']
+    COLUMNS = [
+        'page_path', 'category', 'clicks', 'impressions', 'ctr', 'position', 'queries',
+        'visits', 'bounce_rate', 'goal_reaches', 'sessions', 'purchases', 'revenue',
+        'conversion_rate', 'revenue_per_click'
+    ]
+
+    def __init__(self, db: PostgresClient, metrika=None, ga=None):
+        """
+        Инициализация.
+
+        Args:
+            db: Клиент базы данных
+            metrika: Клиент YandexMetrikaAPI (None - без данных Метрики)
+            ga: Клиент GoogleAnalytics (None - без данных GA4)
+        """
+        self.db = db
+        self.metrika = metrika
+        self.ga = ga
+
+    def load_gsc(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Поисковая статистика по страницам за период."""
+        rows = self.db.fetch_all("""
+            SELECT
+                page_url,
+                SUM(clicks) as clicks,
+                SUM(impressions) as impressions,
+                SUM(position * impressions) as weighted_position,
+                COUNT(DISTINCT query) as queries
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+                AND page_url IS NOT NULL
+            GROUP BY page_url
+        """, (start_date, end_date))
+        data = pd.DataFrame(
+            rows, columns=['page_url', 'clicks', 'impressions', 'weighted_position', 'queries']
+        )
+        return self._by_path(data.rename(columns={'page_url': 'page_path'}), self.GSC_COLUMNS)
+
+    def load_metrika(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Органические визиты Метрики по страницам входа."""
+        if self.metrika is None:
+            return pd.DataFrame(columns=self.METRIKA_COLUMNS)
+        data = self.metrika.get_landing_pages(
+            date1=start_date.strftime('%Y-%m-%d'),
+            date2=end_date.strftime('%Y-%m-%d')
+        )
+        data = data.rename(columns={'url': 'page_path'})
+        # Отказы храним количеством, чтобы доля пересчитывалась после сложения
+        data['bounces'] = data['visits'] * data['bounce_rate'] / 100
+        return self._by_path(data, self.METRIKA_COLUMNS)
+
+    def load_ga4(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """Органические сессии и электронная коммерция GA4 по страницам входа."""
+        if self.ga is None:
+            return pd.DataFrame(columns=self.GA4_COLUMNS)
+        rows = self.ga.get_landing_page_ecommerce(
+            start_date.strftime('%Y-%m-%d'),
+            end_date.strftime('%Y-%m-%d')
+        )
+        data = pd.DataFrame(rows, columns=['landing_page', 'sessions', 'purchases', 'revenue'])
+        return self._by_path(data.rename(columns={'landing_page': 'page_path'}), self.GA4_COLUMNS)
+
+    @staticmethod
+    def _by_path(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Сложение метрик строк, относящихся к одному пути страницы."""
+        if data.empty:
+            return pd.DataFrame(columns=columns)
+        paths, uniques = pd.factorize(data['page_path'].astype(str))
+        normalized = pd.Series(uniques).map(category_router.normalize).to_numpy()
+        return (
+            data[columns[1:]]
+            .apply(pd.to_numeric)
+            .groupby(normalized[paths])
+            .sum()
+            .rename_axis('page_path')
+            .reset_index()
+        )
+
+    def combine(
+        self,
+        gsc: pd.DataFrame,
+        metrika: pd.DataFrame,
+        ga4: pd.DataFrame
+    ) -> pd.DataFrame:
+        """
+        Объединение источников по пути страницы.
+
+        Args:
+            gsc: Колонки GSC_COLUMNS
+            metrika: Колонки METRIKA_COLUMNS
+            ga4: Колонки GA4_COLUMNS
+
+        Returns:
+            pd.DataFrame: Факты по страницам с колонками COLUMNS
+        """
+        facts = (
+            gsc.set_index('page_path')
+            .join(metrika.set_index('page_path'), how='outer')
+            .join(ga4.set_index('page_path'), how='outer')
+            .fillna(0)
+            .rename_axis('page_path')
+            .reset_index()
+        )
+        if facts.empty:
+            return pd.DataFrame(columns=self.COLUMNS)
+
+        def ratio(numerator: str, denominator: str) -> np.ndarray:
+            values = facts[denominator].to_numpy(dtype=float)
+            return np.divide(
+                facts[numerator].to_numpy(dtype=float), values,
+                out=np.zeros_like(values), where=values > 0
+            )
+
+        facts['ctr'] = ratio('clicks', 'impressions')
+        facts['position'] = ratio('weighted_position', 'impressions')
+        facts['bounce_rate'] = ratio('bounces', 'visits')
+        facts['conversion_rate'] = ratio('purchases', 'sessions')
+        facts['revenue_per_click'] = ratio('revenue', 'clicks')
+        facts['category'] = category_router.categorize_series(facts['page_path']).to_numpy()
+        return facts[self.COLUMNS]
+
+    def run(self, days: int = 30, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Расчет фактов за последние days дней и сохранение в page_facts.
+
+        Args:
+            days: Длина периода
+            end_date: Последний день периода (по умолчанию вчера)
+
+        Returns:
+            pd.DataFrame: Факты по страницам
+        """
+        end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+        start_date = end_date - timedelta(days=days - 1)
+
+        sources = {'gsc': self.load_gsc(start_date, end_date)}
+        for name, loader, columns in [
+            ('metrika', self.load_metrika, self.METRIKA_COLUMNS),
+            ('ga4', self.load_ga4, self.GA4_COLUMNS)
+        ]:
+            try:
+                sources[name] = loader(start_date, end_date)
+            except Exception as e:
+                # Недоступный внешний источник не должен останавливать расчет
+                logger.error(f"Ошибка при загрузке данных {name}: {str(e)}")
+                sources[name] = pd.DataFrame(columns=columns)
+
+        facts = self.combine(sources['gsc'], sources['metrika'], sources['ga4'])
+        self.save(facts, start_date, end_date)
+
+        logger.info(f"Факты по страницам за {start_date} - {end_date}: {len(facts)} страниц")
+        return facts
+
+    def save(self, facts: pd.DataFrame, period_start: date, period_end: date) -> None:
+        """Сохранение фактов; повторный расчет за тот же период их заменяет."""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM page_facts WHERE period_start = %s AND period_end = %s",
+                    (period_start, period_end)
+                )
+                if facts.empty:
+                    return
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO page_facts (
+                        period_start, period_end, page_path, category, clicks,
+                        impressions, ctr, position, queries, visits, bounce_rate,
+                        goal_reaches, sessions, purchases, revenue,
+                        conversion_rate, revenue_per_click
+                    )
+                    VALUES %s
+                    """,
+                    [
+                        (
+                            period_start, period_end, row.page_path, row.category,
+                            int(row.clicks), int(row.impressions), float(row.ctr),
+                            float(row.position), int(row.queries), int(row.visits),
+                            float(row.bounce_rate), int(row.goal_reaches),
+                            int(row.sessions), int(row.purchases), float(row.revenue),
+                            float(row.conversion_rate), float(row.revenue_per_click)
+                        )
+                        for row in facts.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
+
+
+def load_page_facts(db: PostgresClient) -> Dict[str, Dict]:
+    """
+    Факты по страницам за последний рассчитанный период.
+
+    Args:
+        db: Клиент базы данных
+
+    Returns:
+        Dict[str, Dict]: Строки page_facts по пути страницы
+    """
+    rows = db.fetch_all("""
+        SELECT *
+        FROM page_facts
+        WHERE period_end = (SELECT MAX(period_end) FROM page_facts)
+    """)
+    return {row['page_path']: row for row in rows}
@@ -3,6 +3,7 @@
 """
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from src.database.supabase_client import SupabaseClient
 
@@ -93,11 +94,14 @@ class PositionAnalyzer:
         """
         df = pd.DataFrame(self.db.execute_query(query))
         
+        # Считаем показатели по всем парам (url, query) за один проход
+        group_stats = self._group_stats(df)
+        
         # Анализируем тренды
-        trends = self._analyze_trends(df)
+        trends = self._analyze_trends(df, group_stats)
         
         # Находим проблемные запросы
-        problems = self._find_problems(df)
+        problems = self._find_problems(df, group_stats)
         
         return {
             'trends': trends,
@@ -109,41 +113,110 @@ class PositionAnalyzer:
             }
         }
         
-    def _analyze_trends(self, df: pd.DataFrame) -> Dict:
+    def _group_stats(
+        self,
+        df: pd.DataFrame,
+        drop_threshold: int = 10,
+        unstable_threshold: float = 5.0
+    ) -> pd.DataFrame:
+        """
+        Векторизованный расчет показателей для каждой пары (url, query).
+        
+        Эквивалентен вызову _calculate_trend, _has_sudden_drop и _is_unstable
+        для списка позиций каждой группы: наклон считается по центрированным
+        суммам, резкое падение - по разнице соседних значений внутри группы.
+        
+        Returns:
+            DataFrame с колонками trend, sudden_drop, unstable,
+            индекс - (url, query)
+        """
+        keys = ['url', 'query']
+        if df.empty:
+            return pd.DataFrame(
+                columns=['trend', 'sudden_drop', 'unstable'],
+                index=pd.MultiIndex.from_arrays([[], []], names=keys)
+            )
+            
+        groups = df.groupby(keys, sort=False)
+        y = df['position'].astype(float)
+        x = groups.cumcount().astype(float)
+        
+        # Центрируем значения внутри группы для устойчивой регрессии
+        xc = x - x.groupby([df['url'], df['query']]).transform('mean')
+        yc = y - groups['position'].transform('mean')
+        
+        frame = pd.DataFrame({
+            'url': df['url'],
+            'query': df['query'],
+            'xy': xc * yc,
+            'xx': xc * xc,
+            'step': groups['position'].diff()
+        })
+        sums = frame.groupby(keys).agg(
+            xy=('xy', 'sum'),
+            xx=('xx', 'sum'),
+            max_step=('step', 'max')
+        )
+        counts = groups.size()
+        std = groups['position'].std(ddof=0)
+        
+        slope = (sums['xy'] / sums['xx']).where(sums['xx'] > 0, 0.0)
+        
+        result = pd.DataFrame(index=sums.index)
+        # Нормализуем наклон до [-1, 1]
+        result['trend'] = (slope / 10).clip(-1, 1).where(counts.reindex(sums.index) >= 2, 0.0)
+        result['sudden_drop'] = sums['max_step'].fillna(-np.inf) >= drop_threshold
+        result['unstable'] = (
+            (counts.reindex(sums.index) >= 3) &
+            (std.reindex(sums.index) > unstable_threshold)
+        )
+        
+        return result
+        
+    def _analyze_trends(
+        self,
+        df: pd.DataFrame,
+        group_stats: Optional[pd.DataFrame] = None
+    ) -> Dict:
         """
         Анализ трендов в позициях.
         """
-        trends = {
-            'improving': [],
-            'declining': [],
-            'stable': []
-        }
+        if group_stats is None:
+            group_stats = self._group_stats(df)
+            
+        trend = group_stats['trend']
         
-        # Группируем по URL и запросу
-        for (url, query), group in df.groupby(['url', 'query']):
-            # Считаем тренд
-            trend = self._calculate_trend(group['position'].tolist())
-            if trend < -0.5:  # Улучшение позиций
-                trends['improving'].append({'url': url, 'query': query})
-            elif trend > 0.5:  # Ухудшение позиций
-                trends['declining'].append({'url': url, 'query': query})
-            else:
-                trends['stable'].append({'url': url, 'query': query})
-                
-        return trends
+        def to_records(mask: pd.Series) -> List[Dict]:
+            return [
+                {'url': url, 'query': query}
+                for url, query in group_stats.index[mask.to_numpy()]
+            ]
+            
+        return {
+            'improving': to_records(trend < -0.5),  # Улучшение позиций
+            'declining': to_records(trend > 0.5),  # Ухудшение позиций
+            'stable': to_records((trend >= -0.5) & (trend <= 0.5))
+        }
         
-    def _find_problems(self, df: pd.DataFrame) -> List[Dict]:
+    def _find_problems(
+        self,
+        df: pd.DataFrame,
+        group_stats: Optional[pd.DataFrame] = None
+    ) -> List[Dict]:
         """
         Поиск проблемных запросов и страниц.
         """
-        problems = []
-        
-        # Группируем по URL и запросу
-        for (url, query), group in df.groupby(['url', 'query']):
-            positions = group['position'].tolist()
+        if group_stats is None:
+            group_stats = self._group_stats(df)
             
+        flagged = group_stats[group_stats['sudden_drop'] | group_stats['unstable']]
+        
+        problems = []
+        for (url, query), sudden_drop, unstable in zip(
+            flagged.index, flagged['sudden_drop'], flagged['unstable']
+        ):
             # Проверяем резкие падения
-            if self._has_sudden_drop(positions):
+            if sudden_drop:
                 problems.append({
                     'url': url,
                     'query': query,
@@ -152,7 +225,7 @@ class PositionAnalyzer:
                 })
             
             # Проверяем нестабильность
-            if self._is_unstable(positions):
+            if unstable:
                 problems.append({
                     'url': url,
                     'query': query,
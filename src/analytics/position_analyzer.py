@@ -7,6 +7,7 @@ from typing import Dict, List, Optional, Tuple, Any
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
+from src.analytics.seasonality import load_seasonality
 from src.database.postgres_client import PostgresClient
 from src.utils.logger import setup_logger
 
@@ -44,6 +45,11 @@ class PeriodStats:
 class EnhancedPositionAnalyzer:
     """Улучшенный анализатор позиций."""
     
+    SNAPSHOT_COLUMNS = [
+        'query', 'page_url', 'city', 'position',
+        'impressions', 'clicks', 'query_type', 'date'
+    ]
+    
     def __init__(self, db_client: PostgresClient):
         """
         Инициализация анализатора.
@@ -52,6 +58,8 @@ class EnhancedPositionAnalyzer:
             db_client: Клиент базы данных PostgreSQL
         """
         self.db = db_client
+        # Кэш оценок сезонности: (запрос, город, неделя) -> (сезонный, оценка)
+        self._seasonality_cache: Dict[Tuple[str, Optional[str], datetime], Tuple[bool, float]] = {}
         
     def get_position_changes(
         self,
@@ -79,155 +87,20 @@ class EnhancedPositionAnalyzer:
             Tuple[List[PositionChange], PeriodStats]: Изменения позиций и статистика
         """
         try:
-            # Базовый SQL запрос
-            query = """
-            WITH position_data AS (
-                SELECT 
-                    sq.query,
-                    COALESCE(sq.page_url, 'https://cvety.kz') as page_url,
-                    CASE 
-                        WHEN sq.city IN ('cvety.kz', 'общий') THEN 'main'
-                        WHEN sq.city IN ('blog.cvety.kz', 'блог') THEN 'blog'
-                        ELSE sq.city
-                    END as normalized_city,
-                    sq.position,
-                    sq.impressions,
-                    sq.clicks,
-                    sq.query_type,
-                    sq.date
-                FROM search_queries_daily sq
-                WHERE sq.date IN (%s, %s)
+            snapshots = self._fetch_snapshots(
+                [start_date, end_date],
+                city=city,
+                query_type=query_type
             )
-            SELECT 
-                pd1.query,
-                pd1.page_url,
-                pd1.normalized_city as city,
-                pd1.position as old_position,
-                pd2.position as new_position,
-                pd1.impressions as old_impressions,
-                pd2.impressions as new_impressions,
-                pd1.clicks as old_clicks,
-                pd2.clicks as new_clicks,
-                pd1.query_type
-            FROM position_data pd1
-            JOIN position_data pd2 
-                ON pd1.query = pd2.query 
-                AND pd1.page_url = pd2.page_url 
-                AND pd1.normalized_city = pd2.normalized_city
-                AND pd1.date < pd2.date
-            ORDER BY ABS(pd2.position - pd1.position) DESC
-            """
-            
-            params = [start_date, end_date]
-            
-            # Добавляем фильтры
-            if city:
-                query += " AND pd1.normalized_city = %s"
-                params.append(city)
-            if query_type:
-                query += " AND pd1.query_type = %s"
-                params.append(query_type)
-                
-            # Получаем данные
-            with self.db.get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Сначала проверяем данные в position_data
-                    cur.execute("""
-                        SELECT date, COUNT(*) 
-                        FROM search_queries_daily 
-                        WHERE date IN (%s, %s)
-                        GROUP BY date
-                        ORDER BY date
-                    """, params)
-                    
-                    print("\nДанные по датам:")
-                    for row in cur.fetchall():
-                        print(f"- {row[0]}: {row[1]} записей")
-                    
-                    # Теперь выполняем основной запрос
-                    print("\nВыполняем запрос:", query)
-                    print("Параметры:", params)
-                    
-                    cur.execute(query, params)
-                    rows = cur.fetchall()
-                    
-                    print(f"\nНайдено строк: {len(rows)}")
-                    if rows:
-                        print("\nПервые 3 строки:")
-                        for row in rows[:3]:
-                            print(row)
-            
-            changes: List[PositionChange] = []
-            stats = PeriodStats(
-                period_days=(end_date - start_date).days,
-                avg_position=0,
-                improved_count=0,
-                declined_count=0,
-                total_queries=len(rows),
-                significant_changes=0
+            return self._compare_snapshots(
+                snapshots,
+                start_date,
+                end_date,
+                min_change=min_change,
+                include_seasonality=include_seasonality,
+                include_competitors=include_competitors
             )
             
-            total_position = 0
-            for row in rows:
-                old_pos = row[3]
-                new_pos = row[4]
-                change = old_pos - new_pos  # Положительное значение = улучшение
-                change_abs = abs(change)
-                
-                if change_abs >= min_change:
-                    pos_change = PositionChange(
-                        query=row[0],
-                        page_url=row[1],
-                        city=row[2],
-                        old_position=old_pos,
-                        new_position=new_pos,
-                        change=change,
-                        change_abs=change_abs,
-                        impressions_change=row[6] - row[5],
-                        clicks_change=row[8] - row[7],
-                        query_type=row[9]
-                    )
-                    
-                    # Анализ сезонности
-                    if include_seasonality:
-                        seasonality = self._analyze_seasonality(
-                            pos_change.query,
-                            pos_change.city,
-                            start_date
-                        )
-                        pos_change.is_seasonal = seasonality[0]
-                        pos_change.seasonality_score = seasonality[1]
-                        if pos_change.is_seasonal:
-                            stats.seasonality_affected += 1
-                    
-                    # Анализ конкурентов
-                    if include_competitors:
-                        competitors = self._analyze_competitors(
-                            pos_change.query,
-                            pos_change.page_url,
-                            pos_change.city,
-                            start_date,
-                            end_date
-                        )
-                        pos_change.competitors = competitors
-                        if competitors:
-                            stats.competitors_affected += 1
-                    
-                    changes.append(pos_change)
-                    stats.significant_changes += 1
-                    
-                    if change > 0:
-                        stats.improved_count += 1
-                    else:
-                        stats.declined_count += 1
-                
-                total_position += new_pos
-            
-            if stats.total_queries > 0:
-                stats.avg_position = total_position / stats.total_queries
-            
-            return changes, stats
-            
         except Exception as e:
             logger.error(f"Error in get_position_changes: {str(e)}")
             raise
@@ -236,30 +109,47 @@ class EnhancedPositionAnalyzer:
         self,
         end_date: datetime,
         weeks_back: int = 4,
-        **kwargs
+        min_change: float = 3.0,
+        city: Optional[str] = None,
+        query_type: Optional[str] = None,
+        include_seasonality: bool = True,
+        include_competitors: bool = True
     ) -> List[Tuple[datetime, List[PositionChange], PeriodStats]]:
         """
         Получение еженедельных изменений позиций.
         
+        Все недельные срезы загружаются одним запросом, сравнения
+        выполняются в памяти.
+        
         Args:
             end_date: Конечная дата
             weeks_back: Количество недель для анализа
-            **kwargs: Дополнительные параметры для get_position_changes
+            min_change: Минимальное изменение позиции для учета
+            city: Город для фильтрации
+            query_type: Тип запроса для фильтрации
+            include_seasonality: Включить анализ сезонности
+            include_competitors: Включить анализ конкурентов
             
         Returns:
             List[Tuple[datetime, List[PositionChange], PeriodStats]]: 
             Список кортежей (дата, изменения, статистика) для каждой недели
         """
         try:
+            week_ends = [end_date - timedelta(days=week * 7) for week in range(weeks_back + 1)]
+            snapshots = self._fetch_snapshots(week_ends, city=city, query_type=query_type)
+            
             weekly_data = []
             for week in range(weeks_back):
-                week_end = end_date - timedelta(days=week*7)
-                week_start = week_end - timedelta(days=7)
+                week_end = week_ends[week]
+                week_start = week_ends[week + 1]
                 
-                changes, stats = self.get_position_changes(
-                    start_date=week_start,
-                    end_date=week_end,
-                    **kwargs
+                changes, stats = self._compare_snapshots(
+                    snapshots,
+                    week_start,
+                    week_end,
+                    min_change=min_change,
+                    include_seasonality=include_seasonality,
+                    include_competitors=include_competitors
                 )
                 weekly_data.append((week_start, changes, stats))
             
@@ -269,6 +159,163 @@ class EnhancedPositionAnalyzer:
             logger.error(f"Error in get_weekly_changes: {str(e)}")
             raise
 
+    def _fetch_snapshots(
+        self,
+        dates: List[datetime],
+        city: Optional[str] = None,
+        query_type: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Загрузка срезов позиций на указанные даты одним запросом.
+        
+        Args:
+            dates: Даты срезов
+            city: Город для фильтрации (нормализованный)
+            query_type: Тип запроса для фильтрации
+            
+        Returns:
+            pd.DataFrame: Строки search_queries_daily с нормализованным городом
+        """
+        days = sorted({self._to_date(value) for value in dates})
+        
+        query = """
+        SELECT 
+            sq.query,
+            COALESCE(sq.page_url, 'https://cvety.kz') as page_url,
+            CASE 
+                WHEN sq.city IN ('cvety.kz', 'общий') THEN 'main'
+                WHEN sq.city IN ('blog.cvety.kz', 'блог') THEN 'blog'
+                ELSE sq.city
+            END as city,
+            sq.position,
+            sq.impressions,
+            sq.clicks,
+            sq.query_type,
+            sq.date
+        FROM search_queries_daily sq
+        WHERE sq.date = ANY(%s)
+        """
+        params = [days]
+        
+        if query_type:
+            query += " AND sq.query_type = %s"
+            params.append(query_type)
+        
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+        
+        snapshots = pd.DataFrame(rows, columns=self.SNAPSHOT_COLUMNS)
+        snapshots['date'] = pd.to_datetime(snapshots['date']).dt.date
+        
+        if city:
+            snapshots = snapshots[snapshots['city'] == city]
+        
+        logger.info(f"Загружено {len(snapshots)} строк за {len(days)} дат")
+        return snapshots
+
+    def _compare_snapshots(
+        self,
+        snapshots: pd.DataFrame,
+        start_date: datetime,
+        end_date: datetime,
+        min_change: float = 3.0,
+        include_seasonality: bool = True,
+        include_competitors: bool = True
+    ) -> Tuple[List[PositionChange], PeriodStats]:
+        """
+        Векторизованное сравнение двух срезов позиций.
+        
+        Args:
+            snapshots: Срезы, загруженные через _fetch_snapshots
+            start_date: Дата старого среза
+            end_date: Дата нового среза
+            min_change: Минимальное изменение позиции для учета
+            include_seasonality: Включить анализ сезонности
+            include_competitors: Включить анализ конкурентов
+            
+        Returns:
+            Tuple[List[PositionChange], PeriodStats]: Изменения позиций и статистика
+        """
+        old = snapshots[snapshots['date'] == self._to_date(start_date)]
+        new = snapshots[snapshots['date'] == self._to_date(end_date)]
+        
+        merged = old.merge(
+            new[['query', 'page_url', 'city', 'position', 'impressions', 'clicks']],
+            on=['query', 'page_url', 'city'],
+            suffixes=('_old', '_new')
+        )
+        
+        # Положительное значение = улучшение
+        change = (merged['position_old'] - merged['position_new']).astype(float)
+        significant = merged.assign(change=change, change_abs=change.abs())
+        significant = significant[significant['change_abs'] >= min_change]
+        significant = significant.sort_values('change_abs', ascending=False)
+        
+        stats = PeriodStats(
+            period_days=(end_date - start_date).days,
+            avg_position=float(merged['position_new'].mean()) if len(merged) else 0,
+            improved_count=int((significant['change'] > 0).sum()),
+            declined_count=int((significant['change'] <= 0).sum()),
+            total_queries=len(merged),
+            significant_changes=len(significant)
+        )
+        
+        changes = [
+            PositionChange(
+                query=row.query,
+                page_url=row.page_url,
+                city=None if pd.isna(row.city) else row.city,
+                old_position=row.position_old,
+                new_position=row.position_new,
+                change=row.change,
+                change_abs=row.change_abs,
+                impressions_change=row.impressions_new - row.impressions_old,
+                clicks_change=row.clicks_new - row.clicks_old,
+                query_type=row.query_type
+            )
+            for row in significant.itertuples(index=False)
+        ]
+        
+        # Анализ сезонности одним запросом для всех изменений
+        if include_seasonality and changes:
+            seasonality = self._analyze_seasonality_batch(
+                [(change.query, change.city) for change in changes],
+                start_date
+            )
+            for pos_change in changes:
+                is_seasonal, score = seasonality.get(
+                    (pos_change.query, pos_change.city),
+                    (False, 0.0)
+                )
+                pos_change.is_seasonal = is_seasonal
+                pos_change.seasonality_score = score
+                if is_seasonal:
+                    stats.seasonality_affected += 1
+        
+        # Анализ конкурентов одним запросом для всех изменений
+        if include_competitors and changes:
+            competitors = self.get_competitors(
+                [(change.query, change.page_url, change.city) for change in changes],
+                start_date,
+                end_date
+            )
+            for pos_change in changes:
+                pos_change.competitors = competitors.get(
+                    (pos_change.query, pos_change.page_url, pos_change.city),
+                    []
+                )
+                if pos_change.competitors:
+                    stats.competitors_affected += 1
+        
+        return changes, stats
+
+    @staticmethod
+    def _to_date(value):
+        """Приведение datetime к date."""
+        return value.date() if isinstance(value, datetime) else value
+
     def get_changes_statistics(self, changes: list) -> dict:
         """Получение статистики по изменениям позиций."""
         stats = {
@@ -316,51 +363,152 @@ class EnhancedPositionAnalyzer:
         Returns:
             Tuple[bool, float]: (является ли сезонным, оценка сезонности)
         """
+        result = self._analyze_seasonality_batch([(query, city)], current_date)
+        return result.get((query, city), (False, 0.0))
+
+    def _analyze_seasonality_batch(
+        self,
+        pairs: List[Tuple[str, Optional[str]]],
+        current_date: datetime
+    ) -> Dict[Tuple[str, Optional[str]], Tuple[bool, float]]:
+        """
+        Анализ сезонности для набора запросов одним SQL запросом.
+        
+        В первую очередь используются оценки пакетного расчета из
+        query_seasonality (общие для всех городов запроса); для запросов
+        без сохраненной оценки считается коэффициент вариации недельных показов.
+        Результаты кэшируются по (запрос, город, неделя), поэтому повторные
+        периоды в analyze_positions и get_weekly_changes не обращаются к базе.
+        
+        Args:
+            pairs: Список пар (запрос, город)
+            current_date: Текущая дата
+            
+        Returns:
+            Dict[Tuple[str, Optional[str]], Tuple[bool, float]]:
+            (является ли сезонным, оценка сезонности) по паре (запрос, город)
+        """
+        week = self._week_start(current_date)
+        results = {}
+        missing = []
+        for pair in dict.fromkeys(pairs):
+            cached = self._seasonality_cache.get((pair[0], pair[1], week))
+            if cached is not None:
+                results[pair] = cached
+            else:
+                missing.append(pair)
+        
+        if not missing:
+            return results
+        
+        try:
+            stored = load_seasonality(self.db, sorted({query for query, _ in missing}))
+        except Exception as e:
+            logger.error(f"Error loading stored seasonality: {str(e)}")
+            stored = {}
+        
+        for pair in [pair for pair in missing if pair[0] in stored]:
+            self._seasonality_cache[(pair[0], pair[1], week)] = stored[pair[0]]
+            results[pair] = stored[pair[0]]
+        missing = [pair for pair in missing if pair[0] not in stored]
+        
+        if not missing:
+            return results
+        
         try:
-            # Получаем данные за прошлый год
-            year_ago = current_date - timedelta(days=365)
-            query = """
+            # Получаем данные за прошлый год для всех запросов сразу
+            year_ago = week - timedelta(days=365)
+            sql = """
             SELECT 
+                query,
+                CASE 
+                    WHEN city IN ('cvety.kz', 'общий') THEN 'main'
+                    WHEN city IN ('blog.cvety.kz', 'блог') THEN 'blog'
+                    ELSE city
+                END as normalized_city,
                 date_trunc('week', date) as week,
                 AVG(impressions) as avg_impressions
             FROM search_queries_daily
-            WHERE query = %s
+            WHERE query = ANY(%s)
                 AND date BETWEEN %s AND %s
+            GROUP BY 1, 2, 3
             """
-            params = [query, year_ago, current_date]
-            
-            if city:
-                query += " AND city = %s"
-                params.append(city)
-                
-            query += """
-            GROUP BY week
-            ORDER BY week
-            """
+            queries = sorted({query for query, _ in missing})
             
             with self.db.get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(query, params)
+                    cur.execute(sql, [queries, year_ago, week])
                     rows = cur.fetchall()
             
-            if not rows:
-                return False, 0.0
-            
-            # Преобразуем в pandas Series для анализа
-            data = pd.Series([row[1] for row in rows])
-            
-            # Вычисляем коэффициент вариации
-            cv = data.std() / data.mean() if data.mean() > 0 else 0
-            
-            # Проверяем наличие сезонного паттерна
-            is_seasonal = cv > 0.3  # Высокая вариативность может указывать на сезонность
-            seasonality_score = min(cv, 1.0)  # Нормализуем оценку от 0 до 1
-            
-            return is_seasonal, seasonality_score
+            scores = self._seasonality_scores(
+                pd.DataFrame(rows, columns=['query', 'city', 'week', 'avg_impressions']),
+                missing
+            )
             
         except Exception as e:
-            logger.error(f"Error in _analyze_seasonality: {str(e)}")
-            return False, 0.0
+            logger.error(f"Error in _analyze_seasonality_batch: {str(e)}")
+            return results
+        
+        for pair in missing:
+            value = scores.get(pair, (False, 0.0))
+            self._seasonality_cache[(pair[0], pair[1], week)] = value
+            results[pair] = value
+        
+        return results
+
+    @staticmethod
+    def _seasonality_scores(
+        weekly: pd.DataFrame,
+        pairs: List[Tuple[str, Optional[str]]]
+    ) -> Dict[Tuple[str, Optional[str]], Tuple[bool, float]]:
+        """
+        Векторизованный расчет оценок сезонности по недельным показам.
+        
+        Для пар без города ряд считается по всем городам запроса.
+        
+        Args:
+            weekly: DataFrame с колонками query, city, week, avg_impressions
+            pairs: Список пар (запрос, город)
+            
+        Returns:
+            Dict[Tuple[str, Optional[str]], Tuple[bool, float]]: Оценки по парам
+        """
+        if weekly.empty:
+            return {}
+        
+        weekly['avg_impressions'] = weekly['avg_impressions'].astype(float)
+        
+        # Коэффициент вариации недельных показов для каждой пары (запрос, город)
+        by_city = weekly.groupby(['query', 'city'])['avg_impressions'].agg(['mean', 'std'])
+        
+        # Ряды без учета города
+        all_cities = (
+            weekly.groupby(['query', 'week'])['avg_impressions'].mean()
+            .groupby(level='query').agg(['mean', 'std'])
+        )
+        
+        def coefficient_of_variation(stats: pd.DataFrame) -> pd.Series:
+            cv = stats['std'] / stats['mean']
+            return cv.where(stats['mean'] > 0, 0.0).fillna(0.0)
+        
+        lookup = dict(coefficient_of_variation(by_city).items())
+        lookup.update(
+            ((query, None), value)
+            for query, value in coefficient_of_variation(all_cities).items()
+        )
+        
+        # Высокая вариативность может указывать на сезонность
+        return {
+            pair: (bool(lookup[pair] > 0.3), float(min(lookup[pair], 1.0)))
+            for pair in pairs if pair in lookup
+        }
+
+    @staticmethod
+    def _week_start(value: datetime) -> datetime:
+        """Начало недели (понедельник) для даты."""
+        day = value.date() if isinstance(value, datetime) else value
+        monday = day - timedelta(days=day.weekday())
+        return datetime(monday.year, monday.month, monday.day)
 
     def _analyze_competitors(
         self,
@@ -383,60 +531,111 @@ class EnhancedPositionAnalyzer:
         Returns:
             List[str]: Список URL конкурентов, которые улучшили позиции
         """
-        try:
-            # Получаем данные о конкурентах
-            query = """
-            WITH our_positions AS (
-                SELECT position
-                FROM search_queries_daily
-                WHERE query = %s
-                    AND page_url = %s
-                    AND date BETWEEN %s AND %s
-            """
-            params = [query, page_url, start_date, end_date]
-            
-            if city:
-                query += " AND city = %s"
-                params.append(city)
-                
-            query += """
-            ),
-            competitor_changes AS (
-                SELECT 
-                    sq.page_url,
-                    AVG(sq.position) as avg_position,
-                    MIN(sq.position) as best_position
-                FROM search_queries_daily sq
-                WHERE sq.query = %s
-                    AND sq.page_url != %s
-                    AND sq.date BETWEEN %s AND %s
-            """
-            params.extend([query, page_url, start_date, end_date])
-            
-            if city:
-                query += " AND sq.city = %s"
-                params.append(city)
-                
-            query += """
-                GROUP BY sq.page_url
-                HAVING MIN(sq.position) < (SELECT AVG(position) FROM our_positions)
-                ORDER BY avg_position ASC
-                LIMIT 5
-            )
-            SELECT page_url
-            FROM competitor_changes
-            """
+        key = (query, page_url, city)
+        return self.get_competitors([key], start_date, end_date).get(key, [])
+
+    def get_competitors(
+        self,
+        changes: List[Tuple[str, str, Optional[str]]],
+        start_date: datetime,
+        end_date: datetime,
+        limit: int = 5
+    ) -> Dict[Tuple[str, str, Optional[str]], List[str]]:
+        """
+        Поиск конкурирующих URL для набора изменений одним запросом.
+        
+        Конкурентами считаются другие URL, которые ранжируются по тому же
+        запросу в том же городе и хотя бы раз были выше средней позиции
+        нашей страницы за период.
+        
+        Args:
+            changes: Список (запрос, URL страницы, город)
+            start_date: Начальная дата
+            end_date: Конечная дата
+            limit: Максимальное количество конкурентов на изменение
             
+        Returns:
+            Dict[Tuple[str, str, Optional[str]], List[str]]: URL конкурентов,
+            отсортированные по средней позиции, по ключу (запрос, URL, город)
+        """
+        if not changes:
+            return {}
+        
+        targets = list(dict.fromkeys(changes))
+        
+        # Пустая строка вместо NULL позволяет соединять по городу через равенство
+        sql = """
+        WITH targets AS (
+            SELECT DISTINCT *
+            FROM unnest(%s::text[], %s::text[], %s::text[]) AS t(query, page_url, city)
+        ),
+        url_stats AS (
+            SELECT 
+                sq.query,
+                COALESCE(sq.page_url, 'https://cvety.kz') as page_url,
+                COALESCE(CASE 
+                    WHEN sq.city IN ('cvety.kz', 'общий') THEN 'main'
+                    WHEN sq.city IN ('blog.cvety.kz', 'блог') THEN 'blog'
+                    ELSE sq.city
+                END, '') as city,
+                AVG(sq.position) as avg_position,
+                MIN(sq.position) as best_position
+            FROM search_queries_daily sq
+            WHERE sq.query IN (SELECT query FROM targets)
+                AND sq.date BETWEEN %s AND %s
+            GROUP BY 1, 2, 3
+        ),
+        ranked AS (
+            SELECT 
+                t.query,
+                t.page_url,
+                t.city,
+                competitor.page_url as competitor_url,
+                ROW_NUMBER() OVER (
+                    PARTITION BY t.query, t.page_url, t.city
+                    ORDER BY competitor.avg_position
+                ) as rank
+            FROM targets t
+            JOIN url_stats own
+                ON own.query = t.query
+                AND own.page_url = t.page_url
+                AND own.city = t.city
+            JOIN url_stats competitor
+                ON competitor.query = t.query
+                AND competitor.city = t.city
+                AND competitor.page_url != t.page_url
+            WHERE competitor.best_position < own.avg_position
+        )
+        SELECT query, page_url, city, competitor_url
+        FROM ranked
+        WHERE rank <= %s
+        ORDER BY query, page_url, city, rank
+        """
+        params = [
+            [query for query, _, _ in targets],
+            [page_url for _, page_url, _ in targets],
+            [city or '' for _, _, city in targets],
+            start_date,
+            end_date,
+            limit
+        ]
+        
+        try:
             with self.db.get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(query, params)
+                    cur.execute(sql, params)
                     rows = cur.fetchall()
             
-            return [row[0] for row in rows]
-            
         except Exception as e:
-            logger.error(f"Error in _analyze_competitors: {str(e)}")
-            return []
+            logger.error(f"Error in get_competitors: {str(e)}")
+            return {}
+        
+        competitors: Dict[Tuple[str, str, Optional[str]], List[str]] = {}
+        for query, page_url, city, competitor_url in rows:
+            key = (query, page_url, city or None)
+            competitors.setdefault(key, []).append(competitor_url)
+        
+        return competitors
 
     def analyze_positions(
         self,
@@ -463,15 +662,21 @@ class EnhancedPositionAnalyzer:
         """
         current_date = datetime.now()
         
-        # Анализируем каждый период
+        # Загружаем срезы для всех периодов одним запросом
+        snapshots = self._fetch_snapshots(
+            [current_date] + [current_date - timedelta(days=days_back) for days_back in days],
+            query_type=query_type
+        )
+        
+        # Анализируем каждый период в памяти
         period_stats = {}
         for days_back in days:
             start_date = current_date - timedelta(days=days_back)
-            changes, stats = self.get_position_changes(
-                start_date=start_date,
-                end_date=current_date,
+            changes, stats = self._compare_snapshots(
+                snapshots,
+                start_date,
+                current_date,
                 min_change=min_change,
-                query_type=query_type,
                 include_seasonality=include_seasonality,
                 include_competitors=include_competitors
             )
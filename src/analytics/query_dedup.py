@@ -0,0 +1,293 @@
+"""
+Поиск почти одинаковых поисковых запросов (MinHash + LSH).
+
+Запрос представляется множеством символьных триграмм отдельных слов,
+поэтому перестановка слов не меняет множество, а опечатка или другая
+словоформа меняет лишь несколько элементов. MinHash-сигнатуры оценивают
+сходство Жаккара, а разбиение сигнатур на полосы (LSH) дает пары-кандидаты
+без сравнения всех запросов со всеми. Кандидаты проверяются по сигнатурам,
+группы - компоненты связности графа подтвержденных пар. Канонический
+запрос группы хранится в search_queries.canonical_id.
+"""
+import re
+import zlib
+from typing import Dict, Sequence, Set
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_WORDS = re.compile(r'\w+')
+
+# Простое число Мерсенна 2^31 - 1: произведения помещаются в int64,
+# а значения хешей - в int32
+_PRIME = (1 << 31) - 1
+
+
+class QueryDeduplicator:
+    """Индекс почти одинаковых запросов на MinHash-сигнатурах."""
+
+    # Количество пар-кандидатов, проверяемых за один раз
+    PAIR_CHUNK = 100000
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 32,
+        threshold: float = 0.6,
+        max_bucket: int = 50,
+        chunk_size: int = 10000,
+        seed: int = 42
+    ):
+        """
+        Инициализация индекса.
+
+        Args:
+            num_perm: Количество хеш-функций в сигнатуре
+            bands: Количество полос LSH (num_perm должно делиться на bands)
+            threshold: Минимальное оценочное сходство Жаккара для дубликатов
+            max_bucket: Размер корзины, больше которого запросы корзины
+                        связываются цепочкой, а не всеми парами
+            chunk_size: Количество запросов в пачке при расчете сигнатур
+            seed: Зерно генератора хеш-функций
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_bucket = max_bucket
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+        self._band_mult = rng.integers(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+    @staticmethod
+    def shingles(query: str) -> Set[str]:
+        """
+        Символьные триграммы слов запроса.
+
+        Args:
+            query: Поисковый запрос
+
+        Returns:
+            Set[str]: Триграммы с маркерами начала и конца слова
+        """
+        grams = set()
+        for word in _WORDS.findall(query.lower()):
+            word = f'^{word}$'
+            grams.update(word[i:i + 3] for i in range(len(word) - 2))
+        return grams
+
+    def signatures(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        MinHash-сигнатуры запросов.
+
+        Args:
+            queries: Поисковые запросы
+
+        Returns:
+            np.ndarray: Матрица len(queries) x num_perm; у запросов без слов
+                        все значения равны _PRIME и они ни с чем не совпадают
+        """
+        shingles = [self.shingles(query) for query in queries]
+        lengths = np.array([len(grams) for grams in shingles], dtype=np.int64)
+        # Триграммы повторяются между запросами: хеш-функции считаем
+        # один раз для каждой уникальной триграммы
+        codes, uniques = pd.factorize(
+            pd.Series([gram for grams in shingles for gram in grams], dtype=object)
+        )
+        # crc32 стабилен между запусками, в отличие от hash()
+        values = np.array(
+            [zlib.crc32(gram.encode('utf-8')) for gram in uniques], dtype=np.int64
+        ) % _PRIME
+        # Хеши хранятся по строкам функций: свертка minimum.reduceat вдоль
+        # непрерывной оси заметно быстрее
+        table = ((self._a[:, None] * values + self._b[:, None]) % _PRIME).astype(np.int32)
+
+        result = np.full((len(queries), self.num_perm), _PRIME, dtype=np.int32)
+        ends = np.cumsum(lengths)
+        for start in range(0, len(queries), self.chunk_size):
+            stop = min(start + self.chunk_size, len(queries))
+            nonempty = np.flatnonzero(lengths[start:stop])
+            if not len(nonempty):
+                continue
+            first = ends[start] - lengths[start]
+            chunk = table[:, codes[first:ends[stop - 1]]]
+            offsets = (ends[start + nonempty] - lengths[start + nonempty]) - first
+            result[start + nonempty] = np.minimum.reduceat(chunk, offsets, axis=1).T
+        return result
+
+    def candidate_pairs(self, signatures: np.ndarray, band: int) -> np.ndarray:
+        """
+        Пары-кандидаты одной полосы: запросы с одинаковой частью сигнатуры.
+
+        Args:
+            signatures: Матрица сигнатур
+            band: Номер полосы
+
+        Returns:
+            np.ndarray: Пары (i, j) размером k x 2
+        """
+        block = signatures[:, band * self.rows:(band + 1) * self.rows]
+        # Ключ корзины - хеш части сигнатуры; редкие коллизии лишь добавляют
+        # кандидатов, которые отсеются при проверке сходства
+        with np.errstate(over='ignore'):
+            bucket = (block.astype(np.uint64) * self._band_mult).sum(axis=1)
+        # Запросы без слов не попадают ни в одну корзину
+        indices = np.flatnonzero(~(block == _PRIME).all(axis=1))
+
+        order = indices[np.argsort(bucket[indices], kind='stable')]
+        sorted_buckets = bucket[order]
+        starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+
+        # Корзины из двух запросов - самый частый случай, их пары собираем сразу
+        two = starts[sizes == 2]
+        pairs = [np.column_stack([order[two], order[two + 1]])]
+        for start, size in zip(starts[sizes > 2], sizes[sizes > 2]):
+            members = order[start:start + size]
+            if size > self.max_bucket:
+                # Большие корзины связываем цепочкой, чтобы не порождать O(size^2) пар
+                pairs.append(np.column_stack([members[:-1], members[1:]]))
+            else:
+                i, j = np.triu_indices(size, k=1)
+                pairs.append(np.column_stack([members[i], members[j]]))
+        return np.concatenate(pairs)
+
+    def similar_pairs(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        Пары запросов с оценкой сходства Жаккара не ниже threshold.
+
+        Args:
+            signatures: Матрица сигнатур
+
+        Returns:
+            np.ndarray: Уникальные пары (i, j), i < j, размером k x 2
+        """
+        confirmed = [np.empty((0, 2), dtype=np.int64)]
+        for band in range(self.bands):
+            candidates = self.candidate_pairs(signatures, band)
+            # Проверяем пачками, чтобы не держать в памяти сигнатуры всех пар
+            for start in range(0, len(candidates), self.PAIR_CHUNK):
+                chunk = candidates[start:start + self.PAIR_CHUNK]
+                # Доля совпавших значений сигнатуры - оценка сходства Жаккара
+                similarity = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+                confirmed.append(chunk[similarity >= self.threshold])
+        pairs = np.sort(np.concatenate(confirmed), axis=1)
+        return np.unique(pairs, axis=0)
+
+    def groups(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Номера групп почти одинаковых запросов.
+
+        Args:
+            queries: Поисковые запросы
+
+        Returns:
+            np.ndarray: Номер группы для каждого запроса
+        """
+        signatures = self.signatures(list(queries))
+        pairs = self.similar_pairs(signatures)
+
+        n = len(signatures)
+        graph = sparse.coo_matrix(
+            (np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+            shape=(n, n)
+        )
+        _, labels = connected_components(graph, directed=False)
+        return labels
+
+    def canonicalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Канонический запрос для каждой строки.
+
+        Варианты объединяются внутри одного города; каноническим становится
+        вариант с наибольшим количеством показов.
+
+        Args:
+            df: DataFrame с колонками id, query, impressions и
+                необязательной city_id
+
+        Returns:
+            pd.DataFrame: id, group, canonical_id
+        """
+        data = df[['id', 'query', 'impressions']].copy()
+        data['city_id'] = df['city_id'].fillna(-1) if 'city_id' in df.columns else -1
+        data['impressions'] = data['impressions'].fillna(0)
+
+        # Одинаковые тексты в разных городах считаем один раз
+        codes, uniques = pd.factorize(data['query'].astype(str))
+        data['group'] = self.groups(list(uniques))[codes]
+
+        canonical = (
+            data.sort_values(['impressions', 'id'], ascending=[False, True])
+            .drop_duplicates(['group', 'city_id'])
+            .set_index(['group', 'city_id'])['id']
+        )
+        keys = pd.MultiIndex.from_frame(data[['group', 'city_id']])
+        data['canonical_id'] = canonical.reindex(keys).to_numpy()
+        return data[['id', 'group', 'canonical_id']].reset_index(drop=True)
+
+    def update_db(self, db: PostgresClient) -> Dict[str, int]:
+        """
+        Пересчет канонических запросов по всей истории search_queries.
+
+        Args:
+            db: Клиент базы данных
+
+        Returns:
+            Dict[str, int]: Количество запросов, групп и запросов-вариантов
+        """
+        rows = db.fetch_all("""
+            SELECT sq.id, sq.query, sq.city_id, COALESCE(SUM(dm.impressions), 0) as impressions
+            FROM search_queries sq
+            LEFT JOIN daily_metrics dm ON dm.query_id = sq.id
+            GROUP BY sq.id, sq.query, sq.city_id
+        """)
+        if not rows:
+            return {'queries': 0, 'groups': 0, 'variants': 0}
+
+        result = self.canonicalize(
+            pd.DataFrame(rows, columns=['id', 'query', 'city_id', 'impressions'])
+        )
+
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE search_queries sq
+                    SET canonical_id = v.canonical_id
+                    FROM (VALUES %s) AS v(id, canonical_id)
+                    WHERE sq.id = v.id
+                        AND sq.canonical_id IS DISTINCT FROM v.canonical_id
+                    """,
+                    [
+                        (int(row.id), int(row.canonical_id))
+                        for row in result.itertuples(index=False)
+                    ],
+                    page_size=10000
+                )
+
+        stats = {
+            'queries': len(result),
+            'groups': int(result['group'].nunique()),
+            'variants': int((result['id'] != result['canonical_id']).sum())
+        }
+        logger.info(
+            f"Канонические запросы обновлены: {stats['queries']} запросов, "
+            f"{stats['groups']} групп, {stats['variants']} вариантов"
+        )
+        return stats
@@ -4,7 +4,9 @@ from typing import Dict, List, Any, Optional
 
 import pandas as pd
 
+from src.analytics.ml_models.query_clustering import get_topic_stats
 from src.database.postgres_client import PostgresClient
+from src.reports.constants import TOP_LIMITS
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -52,20 +54,6 @@ class ReportGenerator:
                         FROM search_queries sq
                         WHERE DATE(sq.date_collected) = %s
                         GROUP BY sq.query_type
-                    ),
-                    position_changes AS (
-                        SELECT 
-                            sq.query,
-                            sq.position as current_pos,
-                            ysq.position as prev_pos,
-                            (ysq.position - sq.position) as position_change
-                        FROM search_queries sq
-                        JOIN search_queries ysq ON sq.query = ysq.query 
-                            AND DATE(ysq.date_collected) = %s
-                        WHERE DATE(sq.date_collected) = %s
-                            AND ABS(ysq.position - sq.position) >= 3
-                        ORDER BY ABS(ysq.position - sq.position) DESC
-                        LIMIT 10
                     )
                     SELECT 
                         json_build_object(
@@ -82,28 +70,36 @@ class ReportGenerator:
                                 )
                                 FROM today_stats t
                                 LEFT JOIN yesterday_stats y USING (query_type)
-                            ),
-                            'significant_changes', (
-                                SELECT json_agg(
-                                    json_build_object(
-                                        'query', query,
-                                        'current_pos', ROUND(current_pos::numeric, 2),
-                                        'prev_pos', ROUND(prev_pos::numeric, 2),
-                                        'change', ROUND(position_change::numeric, 2)
-                                    )
-                                )
-                                FROM position_changes
                             )
                         ) as report_data
-                """, (date.date(), yesterday.date(), yesterday.date(), date.date()))
+                """, (date.date(), yesterday.date()))
                 
                 result = cur.fetchone()
                 report_data = result[0] if result else {}
                 
                 # Добавляем дату в отчет
                 report_data['date'] = date.strftime('%Y-%m-%d')
-                
-                return report_data
+        
+        # Изменения позиций рассчитываются при загрузке данных
+        report_data['significant_changes'] = [
+            {
+                'query': row['query'],
+                'current_pos': round(row['new_position'], 2),
+                'prev_pos': round(row['old_position'], 2),
+                'change': round(row['position_change'], 2)
+            }
+            for row in self.db.get_top_movers(date.date(), period='day', min_change=3, limit=10)
+        ]
+        
+        # Темы запросов по текущей модели кластеризации за последнюю неделю;
+        # раздел необязателен и не должен срывать ежедневный отчет
+        try:
+            report_data['topics'] = get_topic_stats(self.db, days=7, limit=TOP_LIMITS['topics'])
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке тем запросов: {str(e)}")
+            report_data['topics'] = []
+        
+        return report_data
     
     def format_report_message(self, report_data: Dict[str, Any]) -> str:
         """Форматирование отчета для отправки в Telegram.
@@ -142,4 +138,15 @@ class ReportGenerator:
                     f"{change_emoji} ({abs(change_val)})\n"
                 )
         
+        if report_data.get('topics'):
+            message += "\n🗂 <b>Темы запросов за неделю:</b>\n"
+            for topic in report_data['topics']:
+                position = topic.get('position')
+                message += (
+                    f"• {topic.get('topic', '')}: запросов {topic.get('queries', 0)}, "
+                    f"клики {topic.get('clicks', 0)}, показы {topic.get('impressions', 0)}"
+                    + (f", позиция {position:.1f}" if position is not None else "")
+                    + "\n"
+                )
+        
         return message
@@ -0,0 +1,336 @@
+"""
+Пакетная оценка сезонности поисковых запросов.
+
+Показы всех запросов собираются в плотную матрицу запрос x день, после чего
+для всех рядов сразу считаются:
+
+- недельная периодичность - автокорреляция на лаге 7 дней после удаления
+  медленной составляющей (скользящее среднее за 28 дней);
+- годовая периодичность - автокорреляция недельных сумм на лаге 52 недели
+  (нужно не меньше полутора лет истории);
+- выраженность пиков - насколько самая сильная неделя года превышает
+  типичную (8 Марта, 14 февраля) с учетом шума: превышение над медианой
+  сравнивается с MAD недельных сумм (но не меньше пуассоновского корня
+  из медианы), иначе редкие запросы получали бы пики из случайных недель.
+
+Недели до первого дня с показами в расчет не входят: у нового запроса
+медианная неделя нулевая, и любой показ выглядел бы пиком.
+
+Автокорреляции считаются через БПФ для всей матрицы. Оценки сохраняются
+в таблицу query_seasonality и используются анализаторами позиций.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from scipy.ndimage import uniform_filter1d
+
+from src.database.postgres_client import PostgresClient
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def autocorrelation(values: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Автокорреляция строк матрицы через БПФ.
+
+    Ковариация на лаге k нормируется на число пар n - k, иначе годовой лаг
+    при двух годах истории занижался бы вдвое.
+
+    Args:
+        values: Матрица рядов x наблюдений
+        max_lag: Максимальный лаг
+
+    Returns:
+        np.ndarray: Матрица рядов x (max_lag + 1); для постоянных рядов - нули
+    """
+    n = values.shape[1]
+    centered = values - values.mean(axis=1, keepdims=True)
+    # Дополнение нулями до 2n исключает циклическое наложение
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(centered, n=size, axis=1)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=1)[:, :max_lag + 1]
+    acov = acov * (n / (n - np.arange(max_lag + 1)))
+    variance = acov[:, :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(variance > 0, acov / variance, 0.0)
+
+
+class SeasonalityEngine:
+    """Пакетный расчет оценок сезонности по матрице запрос x день."""
+
+    COLUMNS = [
+        'query', 'days', 'impressions', 'weekly_strength', 'yearly_strength',
+        'peak_strength', 'peak_date', 'seasonality_score', 'is_seasonal'
+    ]
+    # Окно сглаживания для выделения недельной составляющей
+    TREND_WINDOW = 28
+    WEEKS_IN_YEAR = 52
+    # Минимум недель истории и недель с показами за год для оценки пиков
+    MIN_PEAK_WEEKS = 26
+    MIN_NONZERO_WEEKS = 13
+    # Превышение пика над медианой в единицах шума, ниже которого пика нет
+    PEAK_Z = 3.0
+    # Перевод MAD в оценку стандартного отклонения нормального шума
+    MAD_SCALE = 1.4826
+
+    def __init__(
+        self,
+        db: Optional[PostgresClient] = None,
+        history_days: int = 730,
+        min_impressions: int = 100,
+        threshold: float = 0.5,
+        chunk_size: int = 5000
+    ):
+        """
+        Инициализация расчета.
+
+        Args:
+            db: Клиент базы данных
+            history_days: Глубина истории
+            min_impressions: Минимум показов запроса за историю
+            threshold: Порог seasonality_score для признака is_seasonal
+            chunk_size: Количество рядов, обрабатываемых за один раз
+        """
+        self.db = db
+        self.history_days = history_days
+        self.min_impressions = min_impressions
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+
+    def score(
+        self,
+        values: np.ndarray,
+        start: date,
+        first_day: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        """
+        Оценки сезонности для строк матрицы.
+
+        Args:
+            values: Матрица рядов x дней (показы, пропуски - нули)
+            start: Дата первого столбца
+            first_day: Номер первого дня истории по строкам (по умолчанию 0)
+
+        Returns:
+            pd.DataFrame: weekly_strength, yearly_strength, peak_strength,
+                          peak_date, seasonality_score по строкам матрицы
+        """
+        n_rows, n_days = values.shape
+        values = values.astype(float)
+        if first_day is None:
+            first_day = np.zeros(n_rows, dtype=int)
+        first_day = np.asarray(first_day)
+
+        weekly = np.zeros(n_rows)
+        if n_days >= 3 * 7:
+            slow = uniform_filter1d(values, self.TREND_WINDOW, axis=1, mode='nearest')
+            resid = np.where(np.arange(n_days) >= first_day[:, None], values - slow, 0.0)
+            weekly = np.clip(autocorrelation(resid, 7)[:, 7], 0.0, 1.0)
+            weekly[n_days - first_day < 3 * 7] = 0.0
+
+        # Недельные суммы, выровненные по последнему дню
+        n_weeks = n_days // 7
+        offset = n_days - n_weeks * 7
+        weeks = values[:, offset:].reshape(n_rows, n_weeks, 7).sum(axis=2)
+        # Неделя относится к истории запроса, если ее последний день не раньше первого
+        week_end = offset + np.arange(n_weeks) * 7 + 6
+        active = week_end >= first_day[:, None]
+        history_weeks = active.sum(axis=1)
+
+        yearly = np.full(n_rows, np.nan)
+        if n_weeks >= self.WEEKS_IN_YEAR * 3 // 2:
+            # Недели до начала истории заменяются средним и не дают вклада в ковариацию
+            log_weeks = np.log1p(weeks)
+            mean = (log_weeks * active).sum(axis=1) / np.maximum(history_weeks, 1)
+            filled = np.where(active, log_weeks, mean[:, None])
+            acf = autocorrelation(filled, self.WEEKS_IN_YEAR)[:, self.WEEKS_IN_YEAR]
+            long_history = history_weeks >= self.WEEKS_IN_YEAR * 3 // 2
+            yearly[long_history] = np.clip(acf[long_history], 0.0, 1.0)
+
+        peak_strength = np.zeros(n_rows)
+        peak_date = None
+        if n_weeks:
+            # Пики считаем по последнему году
+            last_year = weeks[:, -self.WEEKS_IN_YEAR:]
+            last_active = active[:, -self.WEEKS_IN_YEAR:]
+            eligible = (
+                (last_active.sum(axis=1) >= self.MIN_PEAK_WEEKS)
+                & ((last_year > 0).sum(axis=1) >= self.MIN_NONZERO_WEEKS)
+            )
+            if eligible.any():
+                peak_strength[eligible] = self._peak_strength(
+                    np.where(last_active, last_year, np.nan)[eligible]
+                )
+
+            peak_week = np.where(last_active, last_year, -1.0).argmax(axis=1)
+            first_week = offset + (n_weeks - last_year.shape[1]) * 7
+            # Дата пика - последний день самой сильной недели
+            peak_date = [start + timedelta(days=int(first_week + week * 7 + 6)) for week in peak_week]
+
+        seasonality = np.fmax(yearly, peak_strength)
+        return pd.DataFrame({
+            'weekly_strength': weekly,
+            'yearly_strength': yearly,
+            'peak_strength': peak_strength,
+            'peak_date': peak_date,
+            'seasonality_score': seasonality,
+            'is_seasonal': seasonality >= self.threshold
+        })
+
+    def _peak_strength(self, weeks: np.ndarray) -> np.ndarray:
+        """
+        Выраженность пика по недельным суммам (NaN - недели вне истории).
+
+        Оценка - меньшее из относительного превышения 1 - медиана / максимум
+        и значимости пика 1 - PEAK_Z / z, где z - превышение над медианой
+        в единицах шума. Шумовой ряд с малым числом показов получает ноль.
+        """
+        peak = np.nanmax(weeks, axis=1)
+        median = np.nanmedian(weeks, axis=1)
+        mad = np.nanmedian(np.abs(weeks - median[:, None]), axis=1)
+        noise = np.maximum(np.maximum(mad * self.MAD_SCALE, np.sqrt(median)), 1.0)
+        z = (peak - median) / noise
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = np.where(peak > 0, 1.0 - median / peak, 0.0)
+            significance = np.where(z > self.PEAK_Z, 1.0 - self.PEAK_Z / z, 0.0)
+        return np.minimum(relative, significance)
+
+    def run(self, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Расчет оценок для всех запросов и сохранение в query_seasonality.
+
+        Args:
+            end_date: Последний день истории (по умолчанию вчера)
+
+        Returns:
+            pd.DataFrame: Оценки с колонками COLUMNS
+        """
+        end_date = end_date or (datetime.now() - timedelta(days=1)).date()
+        start_date = end_date - timedelta(days=self.history_days - 1)
+
+        rows = self.db.fetch_all("""
+            SELECT query, date, SUM(impressions) as impressions
+            FROM search_queries_daily
+            WHERE date BETWEEN %s AND %s
+            GROUP BY query, date
+        """, (start_date, end_date))
+        facts = pd.DataFrame(rows, columns=['query', 'date', 'impressions'])
+
+        result = self.score_facts(facts, start_date, end_date)
+        self.save(result, end_date)
+
+        logger.info(
+            f"Сезонность рассчитана для {len(result)} запросов, "
+            f"сезонных {int(result['is_seasonal'].sum())}"
+        )
+        return result
+
+    def score_facts(self, facts: pd.DataFrame, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Оценки сезонности по дневным показам запросов.
+
+        Args:
+            facts: DataFrame с колонками query, date, impressions
+            start_date: Первый день матрицы
+            end_date: Последний день матрицы
+
+        Returns:
+            pd.DataFrame: Оценки с колонками COLUMNS
+        """
+        totals = facts.groupby('query')['impressions'].sum()
+        queries = totals[totals >= self.min_impressions].index
+        facts = facts[facts['query'].isin(queries)]
+        if facts.empty:
+            return pd.DataFrame(columns=self.COLUMNS)
+
+        query_codes, query_index = pd.factorize(facts['query'])
+        day_codes = (pd.to_datetime(facts['date']) - pd.Timestamp(start_date)).dt.days.to_numpy()
+        n_days = (end_date - start_date).days + 1
+        impressions = facts['impressions'].to_numpy(dtype=float)
+
+        # Первый день с показами: более ранние дни не относятся к истории запроса
+        first_day = np.full(len(query_index), n_days)
+        np.minimum.at(first_day, query_codes, day_codes)
+
+        frames = []
+        for chunk_start in range(0, len(query_index), self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, len(query_index))
+            selected = (query_codes >= chunk_start) & (query_codes < chunk_end)
+            matrix = np.zeros((chunk_end - chunk_start, n_days))
+            np.add.at(
+                matrix,
+                (query_codes[selected] - chunk_start, day_codes[selected]),
+                impressions[selected]
+            )
+            frames.append(self.score(matrix, start_date, first_day[chunk_start:chunk_end]))
+
+        result = pd.concat(frames, ignore_index=True)
+        result.insert(0, 'query', np.asarray(query_index))
+        result.insert(1, 'days', n_days - first_day)
+        result.insert(2, 'impressions', totals.reindex(query_index).to_numpy())
+        return result[self.COLUMNS]
+
+    def save(self, result: pd.DataFrame, computed_at: date) -> None:
+        """Сохранение оценок; запрос хранит только последний расчет."""
+        if result.empty:
+            return
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO query_seasonality (
+                        query, computed_at, days, impressions, weekly_strength,
+                        yearly_strength, peak_strength, peak_date,
+                        seasonality_score, is_seasonal
+                    )
+                    VALUES %s
+                    ON CONFLICT (query) DO UPDATE SET
+                        computed_at = EXCLUDED.computed_at,
+                        days = EXCLUDED.days,
+                        impressions = EXCLUDED.impressions,
+                        weekly_strength = EXCLUDED.weekly_strength,
+                        yearly_strength = EXCLUDED.yearly_strength,
+                        peak_strength = EXCLUDED.peak_strength,
+                        peak_date = EXCLUDED.peak_date,
+                        seasonality_score = EXCLUDED.seasonality_score,
+                        is_seasonal = EXCLUDED.is_seasonal
+                    """,
+                    [
+                        (
+                            row.query, computed_at, int(row.days), int(row.impressions),
+                            float(row.weekly_strength),
+                            None if np.isnan(row.yearly_strength) else float(row.yearly_strength),
+                            float(row.peak_strength), row.peak_date,
+                            float(row.seasonality_score), bool(row.is_seasonal)
+                        )
+                        for row in result.itertuples(index=False)
+                    ],
+                    page_size=5000
+                )
+
+
+def load_seasonality(db: PostgresClient, queries: List[str]) -> Dict[str, Tuple[bool, float]]:
+    """
+    Сохраненные оценки сезонности для списка запросов.
+
+    Args:
+        db: Клиент базы данных
+        queries: Поисковые запросы
+
+    Returns:
+        Dict[str, Tuple[bool, float]]: (является ли сезонным, оценка) по запросу
+    """
+    rows = db.fetch_all("""
+        SELECT query, is_seasonal, seasonality_score
+        FROM query_seasonality
+        WHERE query = ANY(%s)
+    """, (list(queries),))
+    return {
+        row['query']: (bool(row['is_seasonal']), float(row['seasonality_score']))
+        for row in rows
+    }
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 import pandas as pd
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import List, Dict, Any
 import numpy as np
 from scipy import stats
@@ -218,11 +218,7 @@ class DataAggregator:
                 slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
                 
                 # Определение тренда
-                trend_direction = 'neutral'
-                if p_value < 0.05:  # Статистически значимый тренд
-                    trend_direction = 'positive' if slope < 0 else 'negative' if slope > 0 else 'neutral'
-                    if metric == 'position':  # Инвертируем для позиций (меньше = лучше)
-                        trend_direction = 'positive' if slope > 0 else 'negative' if slope < 0 else 'neutral'
+                trend_direction = self._trend_direction(metric, slope, p_value)
                 
                 trends[metric] = {
                     'direction': trend_direction,
@@ -234,6 +230,233 @@ class DataAggregator:
         
         return trends
 
+    def calculate_average_metrics_bulk(self, days: int = 30) -> pd.DataFrame:
+        """
+        Расчет средних показателей за период для всех запросов одним запросом
+        Args:
+            days: Количество дней для расчета
+        Returns:
+            DataFrame со средними показателями, индекс - query_id
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        query = """
+            SELECT 
+                query_id,
+                AVG(position) as avg_position,
+                AVG(clicks) as avg_clicks,
+                AVG(impressions) as avg_impressions,
+                AVG(ctr) as avg_ctr,
+                STDDEV(position) as position_std,
+                STDDEV(clicks) as clicks_std,
+                STDDEV(impressions) as impressions_std,
+                STDDEV(ctr) as ctr_std
+            FROM daily_metrics
+            WHERE date BETWEEN %s AND %s
+            GROUP BY query_id
+        """
+
+        self.cursor.execute(query, (start_date.date(), end_date.date()))
+        data = pd.DataFrame(self.cursor.fetchall())
+
+        if data.empty:
+            return data
+
+        return data.set_index('query_id').astype(float).fillna(0.0)
+
+    def detect_trends_bulk(self, days: int = 90) -> pd.DataFrame:
+        """
+        Выявление трендов сразу для всех запросов
+        Все ряды загружаются одним запросом, регрессия считается
+        векторизованно по суммам для каждой пары (query_id, метрика)
+        Args:
+            days: Количество дней для анализа
+        Returns:
+            DataFrame с колонками query_id, metric, slope, p_value, r_squared,
+            mean, std, n_points, direction, significance
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        query = """
+            SELECT 
+                query_id,
+                date,
+                position,
+                clicks,
+                impressions,
+                ctr
+            FROM daily_metrics
+            WHERE date BETWEEN %s AND %s
+            ORDER BY query_id, date
+        """
+
+        self.cursor.execute(query, (start_date.date(), end_date.date()))
+        data = pd.DataFrame(self.cursor.fetchall())
+
+        return self._compute_trends(data)
+
+    @classmethod
+    def _compute_trends(
+        cls,
+        data: pd.DataFrame,
+        metrics: List[str] = ('position', 'clicks', 'impressions', 'ctr')
+    ) -> pd.DataFrame:
+        """
+        Векторизованная линейная регрессия для всех рядов
+        Эквивалентна stats.linregress по каждому ряду: x - порядковый номер
+        точки внутри запроса, как в detect_trends
+        Args:
+            data: DataFrame с колонками query_id, date и метриками,
+                  отсортированный по query_id и date
+            metrics: Метрики для анализа
+        Returns:
+            DataFrame с трендами в длинном формате (query_id, metric)
+        """
+        columns = [
+            'query_id', 'metric', 'slope', 'p_value', 'r_squared',
+            'mean', 'std', 'n_points', 'direction', 'significance'
+        ]
+        if data.empty:
+            return pd.DataFrame(columns=columns)
+
+        metrics = [m for m in metrics if m in data.columns]
+        long = data.melt(
+            id_vars=['query_id', 'date'],
+            value_vars=metrics,
+            var_name='metric',
+            value_name='y'
+        ).dropna(subset=['y'])
+        long['y'] = long['y'].astype(float)
+        long = long.sort_values(['query_id', 'metric', 'date'], kind='stable')
+        long['x'] = long.groupby(['query_id', 'metric']).cumcount().astype(float)
+        long['xy'] = long['x'] * long['y']
+        long['xx'] = long['x'] ** 2
+        long['yy'] = long['y'] ** 2
+
+        sums = long.groupby(['query_id', 'metric']).agg(
+            n=('y', 'size'),
+            sx=('x', 'sum'),
+            sy=('y', 'sum'),
+            sxy=('xy', 'sum'),
+            sxx=('xx', 'sum'),
+            syy=('yy', 'sum')
+        )
+
+        n = sums['n'].to_numpy(dtype=float)
+        ssxm = n * sums['sxx'].to_numpy() - sums['sx'].to_numpy() ** 2
+        ssym = n * sums['syy'].to_numpy() - sums['sy'].to_numpy() ** 2
+        ssxym = n * sums['sxy'].to_numpy() - sums['sx'].to_numpy() * sums['sy'].to_numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(ssxm > 0, ssxym / ssxm, 0.0)
+            # Погрешности округления могут дать |r| чуть больше 1
+            r = np.where((ssxm > 0) & (ssym > 0), ssxym / np.sqrt(ssxm * ssym), 0.0)
+            r = np.clip(r, -1.0, 1.0)
+
+            dof = n - 2
+            t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+            p_value = np.where(
+                dof > 0,
+                2 * stats.t.sf(np.abs(t), np.maximum(dof, 1)),
+                np.nan
+            )
+            p_value = np.where((dof > 0) & (np.abs(r) == 1.0), 0.0, p_value)
+
+            mean = sums['sy'].to_numpy() / n
+            variance = np.where(n > 1, ssym / (n * (n - 1)), np.nan)
+            std = np.sqrt(np.maximum(variance, 0.0))
+
+        result = sums.index.to_frame(index=False)
+        result['slope'] = slope
+        result['p_value'] = p_value
+        result['r_squared'] = r ** 2
+        result['mean'] = mean
+        result['std'] = std
+        result['n_points'] = sums['n'].to_numpy()
+
+        significant = result['p_value'] < 0.05
+        result['direction'] = [
+            cls._trend_direction(metric, s, p)
+            for metric, s, p in zip(result['metric'], result['slope'], result['p_value'])
+        ]
+        result['significance'] = np.where(significant, 'significant', 'not significant')
+
+        return result[columns]
+
+    @staticmethod
+    def _trend_direction(metric: str, slope: float, p_value: float) -> str:
+        """
+        Определение направления тренда
+        Args:
+            metric: Название метрики
+            slope: Наклон регрессии
+            p_value: Уровень значимости
+        Returns:
+            'positive', 'negative' или 'neutral'
+        """
+        trend_direction = 'neutral'
+        if p_value < 0.05:  # Статистически значимый тренд
+            trend_direction = 'positive' if slope < 0 else 'negative' if slope > 0 else 'neutral'
+            if metric == 'position':  # Инвертируем для позиций (меньше = лучше)
+                trend_direction = 'positive' if slope > 0 else 'negative' if slope < 0 else 'neutral'
+        return trend_direction
+
+    def save_trends(self, trends: pd.DataFrame, calculated_at: datetime = None) -> None:
+        """
+        Сохранение рассчитанных трендов в таблицу query_trends
+        Args:
+            trends: Результат detect_trends_bulk
+            calculated_at: Дата расчета (по умолчанию сегодня)
+        """
+        if trends.empty:
+            return
+
+        calculated_at = (calculated_at or datetime.now()).date()
+        rows = [
+            (
+                calculated_at,
+                int(row.query_id),
+                row.metric,
+                float(row.slope),
+                None if pd.isna(row.p_value) else float(row.p_value),
+                float(row.r_squared),
+                float(row.mean),
+                None if pd.isna(row.std) else float(row.std),
+                int(row.n_points),
+                row.direction
+            )
+            for row in trends.itertuples(index=False)
+        ]
+
+        try:
+            execute_values(
+                self.cursor,
+                """
+                INSERT INTO query_trends
+                (calculated_at, query_id, metric, slope, p_value, r_squared,
+                 mean, std, n_points, direction)
+                VALUES %s
+                ON CONFLICT (calculated_at, query_id, metric)
+                DO UPDATE SET
+                    slope = EXCLUDED.slope,
+                    p_value = EXCLUDED.p_value,
+                    r_squared = EXCLUDED.r_squared,
+                    mean = EXCLUDED.mean,
+                    std = EXCLUDED.std,
+                    n_points = EXCLUDED.n_points,
+                    direction = EXCLUDED.direction
+                """,
+                rows
+            )
+            self.conn.commit()
+            print(f"Сохранено трендов: {len(rows)}")
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Ошибка при сохранении трендов: {str(e)}")
+            raise
+
     def get_version_info(self) -> Dict[str, Any]:
         """
         Получение информации о версиях данных
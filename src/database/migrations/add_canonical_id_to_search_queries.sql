@@ -0,0 +1,6 @@
+-- Канонический вариант почти одинаковых запросов (QueryDeduplicator).
+-- У канонического запроса canonical_id совпадает с id.
+ALTER TABLE search_queries
+    ADD COLUMN IF NOT EXISTS canonical_id INTEGER REFERENCES search_queries(id);
+
+CREATE INDEX IF NOT EXISTS idx_search_queries_canonical ON search_queries(canonical_id);
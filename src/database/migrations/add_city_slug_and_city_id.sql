@@ -0,0 +1,61 @@
+-- Код города для сопоставления с CityResolver (src/utils/city_resolver.py)
+ALTER TABLE cities ADD COLUMN IF NOT EXISTS slug VARCHAR(50);
+-- Латинское название есть не во всех схемах (src/database/schema.sql)
+ALTER TABLE cities ADD COLUMN IF NOT EXISTS name_en VARCHAR(255);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cities_slug ON cities(slug);
+
+CREATE TEMP TABLE known_cities (name VARCHAR(255), name_en VARCHAR(255), slug VARCHAR(50));
+INSERT INTO known_cities (name, name_en, slug)
+VALUES
+    ('Алматы', 'Almaty', 'almaty'),
+    ('Астана', 'Astana', 'astana'),
+    ('Шымкент', 'Shymkent', 'shymkent'),
+    ('Караганда', 'Karaganda', 'karaganda'),
+    ('Актау', 'Aktau', 'aktau'),
+    ('Актобе', 'Aktobe', 'aktobe'),
+    ('Атырау', 'Atyrau', 'atyrau'),
+    ('Костанай', 'Kostanay', 'kostanay'),
+    ('Павлодар', 'Pavlodar', 'pavlodar'),
+    ('Кокшетау', 'Kokshetau', 'kokshetau'),
+    ('Семей', 'Semey', 'semey'),
+    ('Тараз', 'Taraz', 'taraz'),
+    ('Уральск', 'Uralsk', 'uralsk'),
+    ('Усть-Каменогорск', 'Ust-Kamenogorsk', 'ust-kamenogorsk'),
+    ('Петропавловск', 'Petropavlovsk', 'petropavlovsk'),
+    ('Кызылорда', 'Kyzylorda', 'kyzylorda');
+
+-- Проставляем код уже существующим городам по латинскому или русскому названию;
+-- если под код подходят несколько строк, код получает первая из них
+UPDATE cities c
+SET slug = m.slug,
+    name_en = COALESCE(c.name_en, m.name_en)
+FROM (
+    SELECT DISTINCT ON (k.slug) c2.id, k.slug, k.name_en
+    FROM cities c2
+    JOIN known_cities k
+        ON lower(c2.name_en) = k.slug OR lower(c2.name) = lower(k.name)
+    WHERE c2.slug IS NULL
+        AND NOT EXISTS (SELECT 1 FROM cities other WHERE other.slug = k.slug)
+    ORDER BY k.slug, c2.id
+) m
+WHERE c.id = m.id;
+
+-- Недостающие города; конфликт по имени или коду означает, что город уже есть
+INSERT INTO cities (name, name_en, slug)
+SELECT name, name_en, slug FROM known_cities
+ON CONFLICT DO NOTHING;
+
+DROP TABLE known_cities;
+
+-- Город, определенный при загрузке
+ALTER TABLE search_queries_daily
+    ADD COLUMN IF NOT EXISTS city_id INTEGER REFERENCES cities(id);
+CREATE INDEX IF NOT EXISTS idx_search_queries_daily_city_id ON search_queries_daily(city_id);
+
+-- Заполняем city_id для загруженных ранее строк по городу страницы
+UPDATE search_queries_daily d
+SET city_id = c.id
+FROM cities c
+WHERE d.city_id IS NULL
+    AND c.slug IS NOT NULL
+    AND lower(c.name) = d.city;
@@ -0,0 +1,22 @@
+-- Состояние потокового детектора аномалий (StreamingAnomalyDetector)
+
+CREATE TABLE IF NOT EXISTS anomaly_state (
+    query TEXT NOT NULL,
+    city_id INTEGER NOT NULL, -- 0 - город не определен
+    metric VARCHAR(50) NOT NULL, -- clicks, impressions, position, ctr
+    mean FLOAT NOT NULL, -- экспоненциально взвешенное среднее
+    var FLOAT NOT NULL, -- экспоненциально взвешенная дисперсия
+    n INTEGER NOT NULL, -- количество учтенных наблюдений
+    last_date DATE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (query, city_id, metric)
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomaly_state_last_date ON anomaly_state(last_date);
+
+-- Аномалии ряда (запрос, город) из search_queries_daily
+ALTER TABLE anomalies
+    ADD COLUMN IF NOT EXISTS query TEXT,
+    ADD COLUMN IF NOT EXISTS city_id INTEGER REFERENCES cities(id);
+
+CREATE INDEX IF NOT EXISTS idx_anomalies_query ON anomalies(query, city_id, date);
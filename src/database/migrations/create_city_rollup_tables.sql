@@ -0,0 +1,43 @@
+-- Дневная сводка по городам, обновляется при загрузке search_queries
+-- (PostgresClient.insert_daily_metrics). city_id = 0 - город не определен.
+CREATE TABLE IF NOT EXISTS city_daily_stats (
+    city_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0, -- строк search_queries, знаменатель средних
+    clicks INTEGER NOT NULL DEFAULT 0,
+    impressions INTEGER NOT NULL DEFAULT 0,
+    position_sum FLOAT NOT NULL DEFAULT 0,
+    ctr_sum FLOAT NOT NULL DEFAULT 0, -- сумма CTR строк
+    PRIMARY KEY (date, city_id)
+);
+
+-- Последний день, когда запрос встречался в городе: число уникальных
+-- запросов за последние N дней без просмотра истории
+CREATE TABLE IF NOT EXISTS city_query_activity (
+    city_id INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    last_seen DATE NOT NULL,
+    PRIMARY KEY (city_id, query)
+);
+
+CREATE INDEX IF NOT EXISTS idx_city_query_activity_last_seen ON city_query_activity(last_seen, city_id);
+
+-- Заполняем сводки по уже загруженным данным
+INSERT INTO city_daily_stats (city_id, date, row_count, clicks, impressions, position_sum, ctr_sum)
+SELECT
+    COALESCE(city_id, 0),
+    date_collected,
+    COUNT(*),
+    SUM(clicks),
+    SUM(impressions),
+    SUM(position),
+    SUM(CASE WHEN impressions > 0 THEN clicks::float / impressions ELSE 0 END)
+FROM search_queries
+GROUP BY 1, 2
+ON CONFLICT (date, city_id) DO NOTHING;
+
+INSERT INTO city_query_activity (city_id, query, last_seen)
+SELECT COALESCE(city_id, 0), query, MAX(date_collected)
+FROM search_queries
+GROUP BY 1, 2
+ON CONFLICT (city_id, query) DO NOTHING;
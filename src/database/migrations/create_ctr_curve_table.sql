@@ -0,0 +1,15 @@
+-- Кривая ожидаемого CTR по позициям (результат CTRCurve.fit)
+CREATE TABLE IF NOT EXISTS ctr_curve (
+    id SERIAL PRIMARY KEY,
+    fitted_at DATE NOT NULL,
+    device VARCHAR(20) NOT NULL DEFAULT 'all',
+    query_type VARCHAR(50) NOT NULL DEFAULT 'all',
+    position_bucket SMALLINT NOT NULL, -- округленная позиция 1..20
+    expected_ctr FLOAT NOT NULL,
+    impressions BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT ctr_curve_unique UNIQUE (fitted_at, device, query_type, position_bucket)
+);
+
+-- Индекс для загрузки последней версии кривой
+CREATE INDEX IF NOT EXISTS idx_ctr_curve_fitted_at ON ctr_curve(fitted_at);
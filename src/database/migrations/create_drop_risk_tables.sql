@@ -0,0 +1,26 @@
+-- Инкрементально обучаемые модели риска падения позиций (DropRiskModel)
+CREATE TABLE IF NOT EXISTS drop_risk_models (
+    id SERIAL PRIMARY KEY,
+    trained_through DATE NOT NULL, -- последний размеченный день в обучении
+    n_samples BIGINT NOT NULL,
+    model BYTEA NOT NULL, -- масштабирование признаков и SGD-классификатор
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Вероятность падения позиции пары запрос x страница на следующей неделе
+CREATE TABLE IF NOT EXISTS drop_risk_scores (
+    scored_at DATE NOT NULL, -- последний день признаков
+    query TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    probability FLOAT NOT NULL,
+    position FLOAT NOT NULL, -- средняя позиция за неделю
+    position_delta FLOAT NOT NULL, -- изменение к прошлой неделе (> 0 - ухудшение)
+    volatility FLOAT NOT NULL, -- стандартное отклонение дневных позиций за 14 дней
+    ctr_gap FLOAT NOT NULL, -- отклонение CTR от ожидаемого по ctr_curve
+    impression_trend FLOAT NOT NULL, -- log-изменение показов к прошлой неделе
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scored_at, query, page_url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_drop_risk_scores_probability
+    ON drop_risk_scores(scored_at, probability DESC);
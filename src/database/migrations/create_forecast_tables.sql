@@ -0,0 +1,39 @@
+-- Параметры и состояние модели Хольта-Уинтерса по рядам (ClickForecaster)
+CREATE TABLE IF NOT EXISTS forecast_state (
+    series_type VARCHAR(20) NOT NULL, -- query, category, total
+    series_key TEXT NOT NULL,
+    metric VARCHAR(20) NOT NULL, -- clicks, impressions
+    alpha FLOAT NOT NULL,
+    beta FLOAT NOT NULL,
+    gamma FLOAT NOT NULL,
+    level FLOAT NOT NULL,
+    trend FLOAT NOT NULL,
+    season FLOAT[] NOT NULL, -- коэффициенты по дням недели, 0 - понедельник
+    sse FLOAT NOT NULL, -- сумма квадратов ошибок прогноза на один шаг
+    n INTEGER NOT NULL,
+    last_date DATE NOT NULL, -- последний учтенный день
+    fitted_at DATE NOT NULL, -- дата подбора параметров
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (series_type, series_key, metric)
+);
+
+-- Прогнозы на следующую неделю
+CREATE TABLE IF NOT EXISTS forecasts (
+    id SERIAL PRIMARY KEY,
+    forecast_date DATE NOT NULL, -- последний день данных на момент прогноза
+    series_type VARCHAR(20) NOT NULL,
+    series_key TEXT NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    forecast FLOAT NOT NULL,
+    lower FLOAT NOT NULL,
+    upper FLOAT NOT NULL,
+    last_week_actual FLOAT NOT NULL,
+    expected_change FLOAT, -- forecast / last_week_actual - 1
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT forecasts_unique UNIQUE (forecast_date, series_type, series_key, metric)
+);
+
+CREATE INDEX IF NOT EXISTS idx_forecasts_shortfall
+    ON forecasts(forecast_date, metric, expected_change);
@@ -0,0 +1,22 @@
+-- Каннибализация ключевых слов (CannibalizationDetector)
+CREATE TABLE IF NOT EXISTS keyword_cannibalization (
+    id SERIAL PRIMARY KEY,
+    detected_at DATE NOT NULL,
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    query TEXT NOT NULL,
+    primary_url TEXT NOT NULL, -- страница с наибольшим количеством показов
+    competing_urls TEXT[] NOT NULL, -- остальные страницы с заметной долей показов
+    pages_count INTEGER NOT NULL,
+    impressions BIGINT NOT NULL,
+    clicks BIGINT NOT NULL,
+    impression_split FLOAT NOT NULL, -- 1 - индекс Херфиндаля по долям показов страниц
+    position_swaps INTEGER NOT NULL, -- смены лучшей страницы по дням
+    score FLOAT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT keyword_cannibalization_unique UNIQUE (detected_at, query)
+);
+
+-- Выборка последнего результата для отчета
+CREATE INDEX IF NOT EXISTS idx_keyword_cannibalization_detected
+    ON keyword_cannibalization(detected_at, score DESC);
@@ -0,0 +1,61 @@
+-- Текущие суммы за окно и оценки точек роста (OpportunityScorer)
+CREATE TABLE IF NOT EXISTS opportunity_scores (
+    entity_type VARCHAR(10) NOT NULL, -- query, page
+    entity_key TEXT NOT NULL,
+    window_start DATE NOT NULL,
+    window_end DATE NOT NULL,
+    clicks BIGINT NOT NULL,
+    impressions BIGINT NOT NULL,
+    weighted_position FLOAT NOT NULL, -- сумма position * impressions
+    position FLOAT NOT NULL,
+    ctr FLOAT NOT NULL,
+    expected_ctr FLOAT NOT NULL, -- по ctr_curve на текущей позиции
+    lost_clicks FLOAT NOT NULL, -- недобор кликов из-за CTR ниже ожидаемого
+    upside_clicks FLOAT NOT NULL, -- прирост кликов при подъеме до целевой позиции
+    score FLOAT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity_type, entity_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_opportunity_scores_score
+    ON opportunity_scores(entity_type, score DESC);
+
+-- Запуски расчета: окно и версия кривой CTR, по которым считались оценки
+CREATE TABLE IF NOT EXISTS opportunity_runs (
+    id SERIAL PRIMARY KEY,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL, -- начало запуска, граница для updated_at
+    window_start DATE NOT NULL,
+    window_end DATE NOT NULL,
+    curve_fitted_at DATE,
+    changed_queries INTEGER NOT NULL DEFAULT 0,
+    changed_pages INTEGER NOT NULL DEFAULT 0
+);
+
+-- Рейтинг точек роста каждого запуска
+CREATE TABLE IF NOT EXISTS opportunity_history (
+    run_id INTEGER NOT NULL REFERENCES opportunity_runs(id) ON DELETE CASCADE,
+    entity_type VARCHAR(10) NOT NULL,
+    rank INTEGER NOT NULL,
+    entity_key TEXT NOT NULL,
+    clicks BIGINT NOT NULL,
+    impressions BIGINT NOT NULL,
+    position FLOAT NOT NULL,
+    ctr FLOAT NOT NULL,
+    expected_ctr FLOAT NOT NULL,
+    lost_clicks FLOAT NOT NULL,
+    upside_clicks FLOAT NOT NULL,
+    score FLOAT NOT NULL,
+    PRIMARY KEY (run_id, entity_type, rank)
+);
+
+CREATE INDEX IF NOT EXISTS idx_opportunity_history_entity
+    ON opportunity_history(entity_type, entity_key);
+
+-- Время последней записи строки: сбор обновляет его при повторной загрузке дня,
+-- по нему OpportunityScorer находит сущности с данными, измененными задним числом
+ALTER TABLE search_queries_daily ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+UPDATE search_queries_daily SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE search_queries_daily ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_search_queries_daily_updated_at
+    ON search_queries_daily(updated_at);
@@ -0,0 +1,27 @@
+-- Факты по посадочным страницам из GSC, Яндекс.Метрики и GA4 (PageFactsBuilder)
+CREATE TABLE IF NOT EXISTS page_facts (
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    page_path TEXT NOT NULL, -- путь без хоста и параметров
+    category VARCHAR(50) NOT NULL,
+    -- GSC
+    clicks INTEGER NOT NULL DEFAULT 0,
+    impressions INTEGER NOT NULL DEFAULT 0,
+    ctr FLOAT NOT NULL DEFAULT 0,
+    position FLOAT NOT NULL DEFAULT 0,
+    queries INTEGER NOT NULL DEFAULT 0,
+    -- Яндекс.Метрика, органические визиты
+    visits INTEGER NOT NULL DEFAULT 0,
+    bounce_rate FLOAT NOT NULL DEFAULT 0,
+    goal_reaches INTEGER NOT NULL DEFAULT 0,
+    -- GA4, органические сессии
+    sessions INTEGER NOT NULL DEFAULT 0,
+    purchases INTEGER NOT NULL DEFAULT 0,
+    revenue FLOAT NOT NULL DEFAULT 0,
+    conversion_rate FLOAT NOT NULL DEFAULT 0, -- purchases / sessions
+    revenue_per_click FLOAT NOT NULL DEFAULT 0, -- revenue / clicks
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (period_end, period_start, page_path)
+);
+
+CREATE INDEX IF NOT EXISTS idx_page_facts_path ON page_facts(page_path, period_end DESC);
@@ -0,0 +1,29 @@
+-- Модели кластеризации запросов по темам (QueryClusterer)
+CREATE TABLE IF NOT EXISTS query_cluster_models (
+    id SERIAL PRIMARY KEY,
+    fitted_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    n_clusters INTEGER NOT NULL,
+    model BYTEA NOT NULL, -- словарь n-грамм и разреженные центроиды
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Темы модели: название и количество запросов при обучении
+CREATE TABLE IF NOT EXISTS query_clusters (
+    model_id INTEGER NOT NULL REFERENCES query_cluster_models(id) ON DELETE CASCADE,
+    cluster_id INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model_id, cluster_id)
+);
+
+-- Тема каждого запроса search_queries_daily (-1 - запрос без похожей темы)
+CREATE TABLE IF NOT EXISTS query_cluster_assignments (
+    query TEXT PRIMARY KEY,
+    model_id INTEGER NOT NULL REFERENCES query_cluster_models(id) ON DELETE CASCADE,
+    cluster_id INTEGER NOT NULL,
+    similarity FLOAT NOT NULL,
+    assigned_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_query_cluster_assignments_cluster
+    ON query_cluster_assignments(model_id, cluster_id);
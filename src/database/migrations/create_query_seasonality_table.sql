@@ -0,0 +1,17 @@
+-- Оценки сезонности запросов (SeasonalityEngine), последний расчет по запросу
+CREATE TABLE IF NOT EXISTS query_seasonality (
+    query TEXT PRIMARY KEY,
+    computed_at DATE NOT NULL, -- последний день истории расчета
+    days INTEGER NOT NULL, -- дней истории с первого показа
+    impressions BIGINT NOT NULL,
+    weekly_strength FLOAT NOT NULL, -- автокорреляция на лаге 7 дней
+    yearly_strength FLOAT, -- автокорреляция на лаге 52 недели, NULL при короткой истории
+    peak_strength FLOAT NOT NULL, -- 1 - медиана / максимум недельных показов за год
+    peak_date DATE, -- последний день самой сильной недели
+    seasonality_score FLOAT NOT NULL,
+    is_seasonal BOOLEAN NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_query_seasonality_seasonal
+    ON query_seasonality(is_seasonal, seasonality_score DESC);
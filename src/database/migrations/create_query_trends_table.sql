@@ -0,0 +1,20 @@
+-- Таблица трендов по запросам (результат DataAggregator.detect_trends_bulk)
+CREATE TABLE IF NOT EXISTS query_trends (
+    id SERIAL PRIMARY KEY,
+    calculated_at DATE NOT NULL,
+    query_id INTEGER REFERENCES search_queries(id),
+    metric VARCHAR(50) NOT NULL, -- position, clicks, impressions, ctr
+    slope FLOAT NOT NULL,
+    p_value FLOAT,
+    r_squared FLOAT NOT NULL,
+    mean FLOAT NOT NULL,
+    std FLOAT,
+    n_points INTEGER NOT NULL,
+    direction VARCHAR(20) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT query_trends_unique UNIQUE (calculated_at, query_id, metric)
+);
+
+-- Индексы для выборки значимых трендов за дату
+CREATE INDEX IF NOT EXISTS idx_query_trends_date_metric ON query_trends(calculated_at, metric);
+CREATE INDEX IF NOT EXISTS idx_query_trends_query ON query_trends(query_id);
@@ -0,0 +1,17 @@
+-- Изменения позиций, рассчитываемые при загрузке daily_metrics
+ALTER TABLE position_changes
+    ADD COLUMN IF NOT EXISTS period VARCHAR(10) NOT NULL DEFAULT 'day', -- day, week
+    ADD COLUMN IF NOT EXISTS position_change FLOAT; -- old_position - new_position
+
+UPDATE position_changes
+SET position_change = old_position - new_position
+WHERE position_change IS NULL;
+
+ALTER TABLE position_changes ALTER COLUMN position_change SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_position_changes_unique
+    ON position_changes(query_id, date, period);
+
+-- Индекс для выборки самых больших изменений за дату
+CREATE INDEX IF NOT EXISTS idx_position_changes_date_magnitude
+    ON position_changes(date, period, ABS(position_change) DESC);
@@ -1,4 +1,8 @@
--- Обновляем существующие записи, используя данные из GSC
+-- Старые строки без страницы раньше получали заглушку основного домена.
+-- Заглушка не является страницей: анализ по страницам (каннибализация,
+-- риск просадки, факты страниц) принимал бы ее за отдельный URL, поэтому
+-- такие строки остаются без page_url. Сбор статистики сохраняет страницу
+-- из GSC и обновляет строки по ограничению unique_query_date_city_url.
 UPDATE search_queries_daily
-SET page_url = 'https://cvety.kz'  -- Временно устанавливаем основной URL
-WHERE page_url IS NULL;
+SET page_url = NULL
+WHERE page_url = 'https://cvety.kz';
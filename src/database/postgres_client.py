@@ -1,7 +1,7 @@
 """PostgreSQL client for database operations."""
 
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional, Union
 import psycopg2
 from psycopg2.extras import execute_values, DictCursor
@@ -12,6 +12,11 @@ logger = logging.getLogger(__name__)
 class PostgresClient:
     """Client for interacting with PostgreSQL database."""
     
+    # Minimum absolute position change recorded in position_changes
+    MIN_POSITION_CHANGE = 1.0
+    # Comparison periods for position_changes: name -> offset in days
+    POSITION_CHANGE_PERIODS = {'day': 1, 'week': 7}
+    
     def __init__(
         self,
         host: str = "aws-0-eu-central-1.pooler.supabase.com",
@@ -192,7 +197,11 @@ class PostgresClient:
                 for result in results:
                     query_id, query, city_id = result
                     query_ids[(query, city_id)] = query_id
-                
+
+                written = [(row[0], row[1], row[7]) for row in query_data]
+                self.refresh_city_rollup(cur, written)
+                self.record_position_changes(cur, written)
+
                 # Finally, insert daily metrics
                 metrics_data = []
                 for metric in metrics:
@@ -232,11 +241,204 @@ class PostgresClient:
                         )"""
                     )
     
+    def refresh_city_rollup(self, cur, written: List[tuple]) -> None:
+        """Rebuild city rollups for freshly written search queries.
+
+        city_daily_stats is recomputed for every affected (city_id, date)
+        pair, so re-loading a day stays idempotent. city_query_activity
+        keeps the latest date each query was seen in a city. Rows without
+        a city are stored under city_id 0.
+
+        Args:
+            cur: Open cursor of the ingestion transaction
+            written: List of (query, city_id, date) written to search_queries
+        """
+        if not written:
+            return
+
+        last_seen = {}
+        for query, city_id, metric_date in written:
+            key = (city_id or 0, query)
+            last_seen[key] = max(last_seen.get(key, metric_date), metric_date)
+        pairs = sorted({(city_id or 0, metric_date) for _, city_id, metric_date in written})
+        params = {
+            'city_ids': [city_id for city_id, _ in pairs],
+            'dates': [metric_date for _, metric_date in pairs]
+        }
+        affected = """
+            WITH affected AS (
+                SELECT * FROM unnest(%(city_ids)s::int[], %(dates)s::date[])
+                    AS a(city_id, date)
+            )
+        """
+
+        cur.execute(affected + """
+            DELETE FROM city_daily_stats r
+            USING affected a
+            WHERE r.city_id = a.city_id
+                AND r.date = a.date
+        """, params)
+
+        cur.execute(affected + """
+            INSERT INTO city_daily_stats (
+                city_id, date, row_count, clicks, impressions,
+                position_sum, ctr_sum
+            )
+            SELECT
+                a.city_id,
+                a.date,
+                COUNT(*),
+                SUM(sq.clicks),
+                SUM(sq.impressions),
+                SUM(sq.position),
+                SUM(CASE WHEN sq.impressions > 0 THEN sq.clicks::float / sq.impressions ELSE 0 END)
+            FROM affected a
+            JOIN search_queries sq ON sq.date_collected = a.date
+                AND COALESCE(sq.city_id, 0) = a.city_id
+            GROUP BY a.city_id, a.date
+        """, params)
+
+        execute_values(
+            cur,
+            """
+            INSERT INTO city_query_activity (city_id, query, last_seen)
+            VALUES %s
+            ON CONFLICT (city_id, query)
+            DO UPDATE SET last_seen = GREATEST(city_query_activity.last_seen, EXCLUDED.last_seen)
+            """,
+            [(city_id, query, seen) for (city_id, query), seen in last_seen.items()]
+        )
+
+    def record_position_changes(self, cur, written: List[tuple]) -> None:
+        """Record significant position deltas for freshly written search queries.
+        
+        Deltas are computed both for the written rows against earlier days
+        and for later days against the written rows, so late-arriving data
+        is handled too. Existing rows for affected days are replaced.
+        
+        Positions are read from search_queries, which every ingestion path
+        writes. It holds one row per query, city and day, so the rows being
+        compared are matched on (query, city_id), not on query_id.
+        
+        Args:
+            cur: Open cursor of the ingestion transaction
+            written: List of (query, city_id, date) written to search_queries
+        """
+        written = sorted(set(written), key=lambda row: (row[0], row[1] or 0, row[2]))
+        if not written:
+            return
+        
+        dates = [metric_date for _, _, metric_date in written]
+        series = list(dict.fromkeys((query, city_id) for query, city_id, _ in written))
+        max_days = max(self.POSITION_CHANGE_PERIODS.values())
+        cur.execute("""
+            SELECT sq.id, sq.query, sq.city_id, sq.date_collected, sq.position
+            FROM unnest(%(queries)s::text[], %(city_ids)s::int[]) AS s(query, city_id)
+            JOIN search_queries sq ON sq.query = s.query
+                AND sq.city_id IS NOT DISTINCT FROM s.city_id
+            WHERE sq.date_collected BETWEEN %(start)s AND %(end)s
+                AND sq.position IS NOT NULL
+        """, {
+            'queries': [query for query, _ in series],
+            'city_ids': [city_id for _, city_id in series],
+            'start': min(dates) - timedelta(days=max_days),
+            'end': max(dates) + timedelta(days=max_days)
+        })
+        
+        positions = {}
+        for query_id, query, city_id, metric_date, position in cur.fetchall():
+            positions[(query, city_id, metric_date)] = (query_id, position)
+        
+        affected = set()
+        changes = []
+        for query, city_id, metric_date in written:
+            for period, days in self.POSITION_CHANGE_PERIODS.items():
+                for day in (metric_date, metric_date + timedelta(days=days)):
+                    current = positions.get((query, city_id, day))
+                    if current is None or (current[0], day, period) in affected:
+                        continue
+                    affected.add((current[0], day, period))
+                    previous = positions.get((query, city_id, day - timedelta(days=days)))
+                    if previous is None:
+                        continue
+                    old_position, new_position = previous[1], current[1]
+                    change = old_position - new_position
+                    if abs(change) >= self.MIN_POSITION_CHANGE:
+                        changes.append((
+                            current[0],
+                            day,
+                            period,
+                            old_position,
+                            new_position,
+                            change,
+                            change / old_position * 100 if old_position else 0
+                        ))
+        
+        if not affected:
+            return
+        
+        affected = sorted(affected)
+        cur.execute("""
+            DELETE FROM position_changes pc
+            USING unnest(%s::int[], %s::date[], %s::varchar[]) AS a(query_id, date, period)
+            WHERE pc.query_id = a.query_id
+                AND pc.date = a.date
+                AND pc.period = a.period
+        """, tuple(list(column) for column in zip(*affected)))
+        
+        if changes:
+            execute_values(
+                cur,
+                """
+                INSERT INTO position_changes (
+                    query_id, date, period, old_position, new_position,
+                    position_change, change_percent
+                )
+                VALUES %s
+                """,
+                changes
+            )
+    
+    def get_top_movers(
+        self,
+        metric_date: date,
+        period: str = 'day',
+        min_change: float = 3.0,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Get largest recorded position changes for a date.
+        
+        Args:
+            metric_date: Date of the new position
+            period: Comparison period ('day' or 'week')
+            min_change: Minimum absolute position change
+            limit: Maximum number of rows
+            
+        Returns:
+            List of dictionaries with query, old/new position and change
+        """
+        return self.fetch_all("""
+            SELECT
+                sq.query,
+                pc.old_position,
+                pc.new_position,
+                pc.position_change,
+                pc.change_percent
+            FROM position_changes pc
+            JOIN search_queries sq ON sq.id = pc.query_id
+            WHERE pc.date = %s
+                AND pc.period = %s
+                AND ABS(pc.position_change) >= %s
+            ORDER BY ABS(pc.position_change) DESC
+            LIMIT %s
+        """, (metric_date, period, min_change, limit))
+    
     def get_metrics_by_date_range(
         self,
         start_date: date,
         end_date: date,
-        city_name: Optional[str] = None
+        city_name: Optional[str] = None,
+        collapse_variants: bool = False
     ) -> List[Dict[str, Any]]:
         """Get metrics for specified date range.
         
@@ -244,33 +446,59 @@ class PostgresClient:
             start_date: Start date
             end_date: End date
             city_name: Optional city name to filter by
+            collapse_variants: Merge near-duplicate queries into their
+                canonical query (search_queries.canonical_id)
             
         Returns:
             List of metric dictionaries
         """
         with self.get_connection() as conn:
             with conn.cursor() as cur:
-                query = """
-                    SELECT 
-                        dm.date,
-                        sq.query,
-                        c.name as city,
-                        dm.clicks,
-                        dm.impressions,
-                        dm.position,
-                        dm.ctr,
-                        dm.url
-                    FROM daily_metrics dm
-                    JOIN search_queries sq ON dm.query_id = sq.id
-                    LEFT JOIN cities c ON sq.city_id = c.id
-                    WHERE dm.date BETWEEN %s AND %s
-                """
+                if collapse_variants:
+                    query = """
+                        SELECT 
+                            dm.date,
+                            cq.query,
+                            c.name as city,
+                            SUM(dm.clicks) as clicks,
+                            SUM(dm.impressions) as impressions,
+                            COALESCE(
+                                SUM(dm.position * dm.impressions) / NULLIF(SUM(dm.impressions), 0),
+                                AVG(dm.position)
+                            ) as position,
+                            COALESCE(SUM(dm.clicks)::float / NULLIF(SUM(dm.impressions), 0), 0) as ctr,
+                            (ARRAY_AGG(dm.url ORDER BY dm.impressions DESC))[1] as url
+                        FROM daily_metrics dm
+                        JOIN search_queries sq ON dm.query_id = sq.id
+                        JOIN search_queries cq ON cq.id = COALESCE(sq.canonical_id, sq.id)
+                        LEFT JOIN cities c ON sq.city_id = c.id
+                        WHERE dm.date BETWEEN %s AND %s
+                    """
+                else:
+                    query = """
+                        SELECT 
+                            dm.date,
+                            sq.query,
+                            c.name as city,
+                            dm.clicks,
+                            dm.impressions,
+                            dm.position,
+                            dm.ctr,
+                            dm.url
+                        FROM daily_metrics dm
+                        JOIN search_queries sq ON dm.query_id = sq.id
+                        LEFT JOIN cities c ON sq.city_id = c.id
+                        WHERE dm.date BETWEEN %s AND %s
+                    """
                 params = [start_date, end_date]
                 
                 if city_name:
                     query += " AND c.name = %s"
                     params.append(city_name)
                 
+                if collapse_variants:
+                    query += " GROUP BY dm.date, cq.query, c.name"
+                
                 cur.execute(query, params)
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
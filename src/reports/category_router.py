@@ -0,0 +1,97 @@
+"""
+Определение категории страницы по URL.
+
+Шаблоны PAGE_CATEGORIES компилируются один раз в одно регулярное
+выражение с именованными группами в порядке объявления: первая подходящая
+категория побеждает, как при последовательной проверке шаблонов.
+Результаты для уже встречавшихся путей кэшируются.
+"""
+import re
+from functools import lru_cache
+from typing import Dict
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.reports.constants import PAGE_CATEGORIES
+
+# Категория для путей, не подошедших ни под один шаблон
+OTHER = 'other'
+
+
+class PageCategoryRouter:
+    """Маршрутизатор путей страниц по категориям."""
+
+    def __init__(self, categories: Dict[str, Dict] = PAGE_CATEGORIES, cache_size: int = 65536):
+        """
+        Инициализация маршрутизатора.
+
+        Args:
+            categories: Категории {id: {'name': ..., 'pattern': ...}} в порядке приоритета
+            cache_size: Размер кэша путей
+        """
+        self.categories = categories
+        self._names = [data['name'] for data in categories.values()]
+        self.default = categories[OTHER]['name'] if OTHER in categories else self._names[-1]
+        self.pattern = re.compile('|'.join(
+            f'(?P<c{index}>{data["pattern"]})'
+            for index, data in enumerate(categories.values())
+        ))
+        self.categorize = lru_cache(maxsize=cache_size)(self._categorize)
+
+    @staticmethod
+    def normalize(page: str) -> str:
+        """
+        Путь страницы без схемы, хоста и параметров.
+
+        Args:
+            page: URL или путь страницы
+
+        Returns:
+            str: Путь, начинающийся с '/'
+        """
+        if '://' in page:
+            page = urlsplit(page).path
+        else:
+            page = page.split('?', 1)[0].split('#', 1)[0]
+        return page if page.startswith('/') else '/' + page
+
+    def _categorize(self, page: str) -> str:
+        """
+        Название категории страницы.
+
+        Args:
+            page: URL или путь страницы
+
+        Returns:
+            str: Название категории
+        """
+        match = self.pattern.match(self.normalize(page))
+        if match is None:
+            return self.default
+        # Именованная группа совпавшей альтернативы - c<номер категории>
+        return self._names[int(match.lastgroup[1:])]
+
+    def categorize_series(self, pages: pd.Series) -> pd.Series:
+        """
+        Векторизованное определение категорий для столбца URL.
+
+        Args:
+            pages: Серия URL страниц
+
+        Returns:
+            pd.Series: Названия категорий с индексом исходной серии
+        """
+        # Одна страница встречается во многих строках (по запросам и дням)
+        codes, uniques = pd.factorize(pages)
+        names = np.array(
+            [self.categorize(str(page)) for page in uniques] + [self.default],
+            dtype=object
+        )
+        # Пропуски получают код -1, то есть категорию по умолчанию
+        return pd.Series(names[codes], index=pages.index, dtype=object)
+
+
+# Общий экземпляр: выражение компилируется один раз при импорте
+category_router = PageCategoryRouter()
@@ -44,9 +44,20 @@ REPORT_FORMATS = {
     'position': '{:.1f}'
 }
 
+# Ожидаемое падение кликов на следующей неделе, при котором ряд попадает в отчет
+FORECAST_SHORTFALL_THRESHOLD = 0.2
+
+# Вероятность падения позиции на следующей неделе, при которой пара попадает в отчет
+DROP_RISK_THRESHOLD = 0.5
+
 # Максимальное количество элементов в топах
 TOP_LIMITS = {
     'queries': 5,
     'pages': 5,
-    'categories': 10
+    'categories': 10,
+    'cannibalization': 5,
+    'forecast_shortfalls': 5,
+    'drop_risks': 5,
+    'opportunities': 5,
+    'topics': 5
 }
@@ -11,12 +11,18 @@ from src.utils.credentials_manager import CredentialsManager
 from src.database.supabase_client import SupabaseClient
 from src.services.gsc_service import GSCService
 from src.services.telegram_service import TelegramService
-from src.reports.constants import TOP_LIMITS
+from src.reports.constants import DROP_RISK_THRESHOLD, FORECAST_SHORTFALL_THRESHOLD, TOP_LIMITS
 from src.reports.visualizer import ReportVisualizer
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 class WeeklyReport:
     """Класс для генерации и отправки еженедельных отчетов."""
     
+    # Размер страницы при выборке из Supabase
+    PAGE_SIZE = 1000
+    
     def __init__(self):
         """Инициализация объекта WeeklyReport."""
         self.credentials = CredentialsManager()
@@ -48,20 +54,18 @@ class WeeklyReport:
         """
         start_date, end_date, prev_start, prev_end = self.get_date_range()
         
-        # Выполняем запрос через Supabase
-        result = self.db.client.table('search_queries_daily').select('*').execute()
-        data = result.data
+        # Загружаем только строки за две сравниваемые недели
+        data = self._fetch_daily_rows(prev_start, end_date)
         
-        # Фильтруем данные по датам
-        current_week_data = [
-            row for row in data 
-            if start_date <= datetime.fromisoformat(row['date']) <= end_date
-        ]
+        current_from, current_to = start_date.date().isoformat(), end_date.date().isoformat()
+        prev_from, prev_to = prev_start.date().isoformat(), prev_end.date().isoformat()
         
-        previous_week_data = [
-            row for row in data 
-            if prev_start <= datetime.fromisoformat(row['date']) <= prev_end
-        ]
+        current_week = self._aggregate_week(
+            row for row in data if current_from <= row['date'][:10] <= current_to
+        )
+        previous_week = self._aggregate_week(
+            row for row in data if prev_from <= row['date'][:10] <= prev_to
+        )
         
         # Группируем данные
         categories = {}
@@ -69,19 +73,9 @@ class WeeklyReport:
         queries = []
         
         # Обрабатываем текущую неделю
-        for row in current_week_data:
-            query = row['query']
-            query_type = row['query_type']
-            city = row['city']
-            
-            # Находим соответствующие данные за предыдущую неделю
-            prev_data = next(
-                (r for r in previous_week_data 
-                 if r['query'] == query 
-                 and r['query_type'] == query_type 
-                 and r['city'] == city),
-                None
-            )
+        for (query, query_type, city), row in current_week.items():
+            # Данные за предыдущую неделю по тому же ключу
+            prev_data = previous_week.get((query, query_type, city))
             
             # Добавляем в список запросов
             query_data = {
@@ -146,6 +140,208 @@ class WeeklyReport:
             'cities': cities
         }
         
+    def _fetch_daily_rows(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """
+        Загружает строки search_queries_daily за период постранично.
+        
+        Args:
+            start_date: Начальная дата
+            end_date: Конечная дата
+            
+        Returns:
+            List[Dict]: Строки с датой, запросом, типом, городом и метриками
+        """
+        rows = []
+        offset = 0
+        
+        while True:
+            result = (
+                self.db.client.table('search_queries_daily')
+                .select('date,query,query_type,city,clicks,impressions,position')
+                .gte('date', start_date.date().isoformat())
+                .lte('date', end_date.date().isoformat())
+                # Постраничная выборка по смещению требует однозначного порядка,
+                # иначе строки могут пропускаться или повторяться между страницами
+                .order('date')
+                .order('id')
+                .range(offset, offset + self.PAGE_SIZE - 1)
+                .execute()
+            )
+            rows.extend(result.data)
+            
+            if len(result.data) < self.PAGE_SIZE:
+                break
+            offset += self.PAGE_SIZE
+            
+        return rows
+        
+    def get_cannibalization(self, limit: int = TOP_LIMITS['cannibalization']) -> List[Dict]:
+        """
+        Загружает последний результат поиска каннибализации ключевых слов.
+        
+        Args:
+            limit: Количество запросов с наибольшей оценкой
+            
+        Returns:
+            List[Dict]: Строки keyword_cannibalization за последнюю дату расчета
+        """
+        latest = (
+            self.db.client.table('keyword_cannibalization')
+            .select('detected_at')
+            .order('detected_at', desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not latest.data:
+            return []
+        
+        result = (
+            self.db.client.table('keyword_cannibalization')
+            .select('query,primary_url,competing_urls,impressions,impression_split,position_swaps,score')
+            .eq('detected_at', latest.data[0]['detected_at'])
+            .order('score', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+        
+    def get_forecast_shortfalls(
+        self,
+        threshold: float = FORECAST_SHORTFALL_THRESHOLD,
+        limit: int = TOP_LIMITS['forecast_shortfalls']
+    ) -> List[Dict]:
+        """
+        Загружает ряды с ожидаемым падением кликов на следующей неделе.
+        
+        Args:
+            threshold: Минимальное относительное падение прогноза к прошлой неделе
+            limit: Количество рядов с наибольшим падением
+            
+        Returns:
+            List[Dict]: Строки forecasts за последнюю дату прогноза
+        """
+        latest = (
+            self.db.client.table('forecasts')
+            .select('forecast_date')
+            .order('forecast_date', desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not latest.data:
+            return []
+        
+        result = (
+            self.db.client.table('forecasts')
+            .select('series_type,series_key,forecast,last_week_actual,expected_change')
+            .eq('forecast_date', latest.data[0]['forecast_date'])
+            .eq('metric', 'clicks')
+            .lte('expected_change', -threshold)
+            .order('expected_change')
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+        
+    def get_drop_risks(
+        self,
+        threshold: float = DROP_RISK_THRESHOLD,
+        limit: int = TOP_LIMITS['drop_risks']
+    ) -> List[Dict]:
+        """
+        Загружает пары запрос x страница с наибольшим риском падения позиций.
+        
+        Args:
+            threshold: Минимальная вероятность падения на следующей неделе
+            limit: Количество пар
+            
+        Returns:
+            List[Dict]: Строки drop_risk_scores за последнюю дату расчета
+        """
+        latest = (
+            self.db.client.table('drop_risk_scores')
+            .select('scored_at')
+            .order('scored_at', desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not latest.data:
+            return []
+        
+        result = (
+            self.db.client.table('drop_risk_scores')
+            .select('query,page_url,probability,position,position_delta')
+            .eq('scored_at', latest.data[0]['scored_at'])
+            .gte('probability', threshold)
+            .order('probability', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+        
+    def get_opportunities(self, limit: int = TOP_LIMITS['opportunities']) -> List[Dict]:
+        """
+        Загружает текущий рейтинг точек роста по запросам.
+        
+        Args:
+            limit: Количество запросов
+            
+        Returns:
+            List[Dict]: Строки opportunity_history последнего запуска
+        """
+        latest = (
+            self.db.client.table('opportunity_runs')
+            .select('id')
+            .order('id', desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not latest.data:
+            return []
+        
+        result = (
+            self.db.client.table('opportunity_history')
+            .select('entity_key,impressions,position,ctr,lost_clicks,upside_clicks,score')
+            .eq('run_id', latest.data[0]['id'])
+            .eq('entity_type', 'query')
+            .order('rank')
+            .limit(limit)
+            .execute()
+        )
+        return result.data
+        
+    @staticmethod
+    def _aggregate_week(rows) -> Dict[tuple, Dict]:
+        """
+        Суммирует дневные строки недели по ключу (запрос, тип запроса, город).
+        
+        Args:
+            rows: Дневные строки search_queries_daily
+            
+        Returns:
+            Dict[tuple, Dict]: Клики, показы и средняя позиция по ключу
+        """
+        weekly = {}
+        
+        for row in rows:
+            key = (row['query'], row['query_type'], row['city'])
+            item = weekly.get(key)
+            if item is None:
+                item = weekly[key] = {
+                    'clicks': 0,
+                    'impressions': 0,
+                    'position_sum': 0.0,
+                    'days': 0
+                }
+            item['clicks'] += row['clicks']
+            item['impressions'] += row['impressions']
+            item['position_sum'] += row['position']
+            item['days'] += 1
+            
+        for item in weekly.values():
+            item['position'] = item.pop('position_sum') / item.pop('days')
+            
+        return weekly
+        
     def format_comparison_report(self, data: Dict) -> tuple[str, List[bytes]]:
         """
         Форматирует отчет со сравнением метрик.
@@ -221,6 +417,49 @@ class WeeklyReport:
                 f"  Клики: {cat_data['current_clicks']} ({'+' if clicks_change > 0 else ''}{clicks_change:.1f}%)"
             ])
             
+        # Добавляем запросы, по которым конкурируют несколько наших страниц
+        if data.get('cannibalization'):
+            report.append("\n🔀 КАННИБАЛИЗАЦИЯ:")
+            for item in data['cannibalization']:
+                report.extend([
+                    f"• {item['query']}",
+                    f"  Основная: {item['primary_url']}",
+                    f"  Конкурируют: {', '.join(item['competing_urls'])}",
+                    f"  Показы: {item['impressions']}, разделение {item['impression_split']:.0%}, "
+                    f"смен лидера: {item['position_swaps']}"
+                ])
+            
+        # Добавляем ряды, по которым прогноз ниже прошлой недели
+        if data.get('forecast_shortfalls'):
+            series_names = {'total': 'Весь сайт', 'category': 'Категория', 'query': 'Запрос'}
+            report.append("\n⚠️ ПРОГНОЗ ПАДЕНИЯ КЛИКОВ:")
+            for item in data['forecast_shortfalls']:
+                name = series_names.get(item['series_type'], item['series_type'])
+                report.append(
+                    f"• {name} «{item['series_key']}»: {item['forecast']:.0f} "
+                    f"(неделя назад {item['last_week_actual']:.0f}, {item['expected_change']:.0%})"
+                )
+            
+        # Добавляем пары с высоким риском падения позиций на следующей неделе
+        if data.get('drop_risks'):
+            report.append("\n📉 РИСК ПАДЕНИЯ ПОЗИЦИЙ:")
+            for item in data['drop_risks']:
+                report.extend([
+                    f"• {item['query']} ({item['probability']:.0%})",
+                    f"  {item['page_url']}: позиция {item['position']:.1f} "
+                    f"({'+' if item['position_delta'] > 0 else ''}{item['position_delta']:.1f} за неделю)"
+                ])
+            
+        # Добавляем запросы с наибольшим потенциалом прироста кликов
+        if data.get('opportunities'):
+            report.append("\n💡 ТОЧКИ РОСТА:")
+            for item in data['opportunities']:
+                report.extend([
+                    f"• {item['entity_key']}: +{item['score']:.0f} кликов",
+                    f"  Позиция {item['position']:.1f}, CTR {item['ctr']:.1%}, "
+                    f"показы: {item['impressions']}"
+                ])
+            
         # Добавляем рекомендации
         report.extend(self._generate_recommendations(data))
         
@@ -295,6 +534,20 @@ class WeeklyReport:
             # Получаем данные для отчета
             data = self.get_comparison_data()
             
+            # Разделы аналитики необязательны: ошибка в одном из них
+            # (например, еще не созданная таблица) не отменяет отчет
+            for key, loader in [
+                ('cannibalization', self.get_cannibalization),
+                ('forecast_shortfalls', self.get_forecast_shortfalls),
+                ('drop_risks', self.get_drop_risks),
+                ('opportunities', self.get_opportunities)
+            ]:
+                try:
+                    data[key] = loader()
+                except Exception as e:
+                    logger.error(f"Ошибка при загрузке раздела {key}: {str(e)}")
+                    data[key] = []
+            
             # Форматируем отчет и получаем графики
             report_text, images = self.format_comparison_report(data)
             
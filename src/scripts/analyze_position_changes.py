@@ -1,8 +1,8 @@
 """Скрипт для анализа изменений позиций в поисковой выдаче."""
 import os
 import sys
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
+from datetime import date
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 
 # Добавляем корневую директорию в PYTHONPATH
@@ -30,104 +30,79 @@ class PositionChange:
     new_impressions: int
     impressions_change: int
 
-def get_position_data(
+def get_position_changes(
     db: PostgresClient,
-    start_date: datetime,
-    end_date: datetime
-) -> List[Dict[str, Any]]:
-    """Получение данных о позициях из базы за указанный период.
-    
-    Args:
-        db: Клиент базы данных
-        start_date: Начальная дата
-        end_date: Конечная дата
-        
-    Returns:
-        List[Dict]: Список данных по позициям
-    """
-    with db.get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    query,
-                    url,
-                    position,
-                    clicks,
-                    impressions,
-                    date_collected
-                FROM search_queries 
-                WHERE date_collected BETWEEN %s AND %s
-                ORDER BY clicks DESC
-            """, (start_date.date(), end_date.date()))
-            
-            rows = []
-            for row in cur.fetchall():
-                rows.append({
-                    'query': row[0],
-                    'url': row[1],
-                    'position': float(row[2]),
-                    'clicks': int(row[3]),
-                    'impressions': int(row[4]),
-                    'date_collected': row[5]
-                })
-            
-            return rows
-
-def analyze_position_changes(
-    current_data: List[Dict[str, Any]],
-    previous_data: List[Dict[str, Any]],
+    metric_date: Optional[date] = None,
+    period: str = 'week',
     min_position_change: float = 2.0,
     min_clicks: int = 5
 ) -> List[PositionChange]:
-    """Анализ изменений позиций.
+    """Получение значимых изменений позиций из position_changes.
+    
+    Изменения рассчитываются при загрузке данных, поэтому сравнение периодов
+    здесь не выполняется. Клики и показы берутся из search_queries, которую
+    пишут все пути загрузки; прошлый период - строка того же запроса и города
+    на дату сравнения.
     
     Args:
-        current_data: Текущие данные
-        previous_data: Данные за предыдущий период
+        db: Клиент базы данных
+        metric_date: Дата новой позиции (по умолчанию последняя рассчитанная)
+        period: Период сравнения ('day' или 'week')
         min_position_change: Минимальное изменение позиции для учета
         min_clicks: Минимальное количество кликов для учета
         
     Returns:
-        List[PositionChange]: Список значимых изменений
+        List[PositionChange]: Изменения, отсортированные по величине
     """
-    # Создаем словари для быстрого поиска
-    previous_dict = {
-        (row['query'], row['url']): row
-        for row in previous_data
-    }
-    
-    changes = []
-    
-    for current_row in current_data:
-        query = current_row['query']
-        url = current_row['url']
-        key = (query, url)
-        
-        if key in previous_dict:
-            prev_row = previous_dict[key]
-            position_change = prev_row['position'] - current_row['position']
-            
-            # Проверяем, является ли изменение значимым
-            if (abs(position_change) >= min_position_change and
-                (current_row['clicks'] >= min_clicks or prev_row['clicks'] >= min_clicks)):
-                
-                change = PositionChange(
-                    query=query,
-                    url=url,
-                    old_position=prev_row['position'],
-                    new_position=current_row['position'],
-                    position_change=position_change,
-                    old_clicks=prev_row['clicks'],
-                    new_clicks=current_row['clicks'],
-                    clicks_change=current_row['clicks'] - prev_row['clicks'],
-                    old_impressions=prev_row['impressions'],
-                    new_impressions=current_row['impressions'],
-                    impressions_change=current_row['impressions'] - prev_row['impressions']
-                )
-                changes.append(change)
+    rows = db.fetch_all("""
+        SELECT
+            sq.query,
+            COALESCE(dm.url, sq.url) as url,
+            pc.old_position,
+            pc.new_position,
+            pc.position_change,
+            COALESCE(prev_sq.clicks, 0) as old_clicks,
+            sq.clicks as new_clicks,
+            COALESCE(prev_sq.impressions, 0) as old_impressions,
+            sq.impressions as new_impressions
+        FROM position_changes pc
+        JOIN search_queries sq ON sq.id = pc.query_id
+        LEFT JOIN daily_metrics dm ON dm.query_id = pc.query_id AND dm.date = pc.date
+        LEFT JOIN search_queries prev_sq ON prev_sq.query = sq.query
+            AND prev_sq.city_id IS NOT DISTINCT FROM sq.city_id
+            AND prev_sq.date_collected = pc.date - %(days)s
+        WHERE pc.period = %(period)s
+            AND pc.date = COALESCE(
+                %(date)s::date,
+                (SELECT MAX(date) FROM position_changes WHERE period = %(period)s)
+            )
+            AND ABS(pc.position_change) >= %(min_change)s
+            AND (sq.clicks >= %(min_clicks)s OR COALESCE(prev_sq.clicks, 0) >= %(min_clicks)s)
+        ORDER BY ABS(pc.position_change) DESC
+    """, {
+        'days': PostgresClient.POSITION_CHANGE_PERIODS[period],
+        'period': period,
+        'date': metric_date,
+        'min_change': min_position_change,
+        'min_clicks': min_clicks
+    })
     
-    # Сортируем по абсолютному значению изменения позиции
-    return sorted(changes, key=lambda x: abs(x.position_change), reverse=True)
+    return [
+        PositionChange(
+            query=row['query'],
+            url=row['url'],
+            old_position=float(row['old_position']),
+            new_position=float(row['new_position']),
+            position_change=float(row['position_change']),
+            old_clicks=int(row['old_clicks']),
+            new_clicks=int(row['new_clicks']),
+            clicks_change=int(row['new_clicks']) - int(row['old_clicks']),
+            old_impressions=int(row['old_impressions']),
+            new_impressions=int(row['new_impressions']),
+            impressions_change=int(row['new_impressions']) - int(row['old_impressions'])
+        )
+        for row in rows
+    ]
 
 def format_change(value: float, is_position: bool = False) -> str:
     """Форматирование изменения для вывода."""
@@ -144,21 +119,11 @@ def main():
     """Основная функция."""
     db = PostgresClient()
     
-    # Получаем данные за текущий и предыдущий периоды (30 дней)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    prev_start_date = start_date - timedelta(days=30)
-    
-    logger.info(f"Загружаем данные за текущий период ({start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')})...")
-    current_data = get_position_data(db, start_date, end_date)
-    
-    logger.info(f"Загружаем данные за предыдущий период ({prev_start_date.strftime('%Y-%m-%d')} - {start_date.strftime('%Y-%m-%d')})...")
-    previous_data = get_position_data(db, prev_start_date, start_date)
-    
-    # Анализируем изменения
-    changes = analyze_position_changes(
-        current_data,
-        previous_data,
+    # Изменения неделя-к-неделе на последнюю рассчитанную дату
+    logger.info("Загружаем изменения позиций за неделю...")
+    changes = get_position_changes(
+        db,
+        period='week',
         min_position_change=2.0,  # Изменение позиции на 2 и более
         min_clicks=5  # Минимум 5 кликов
     )
@@ -175,7 +140,7 @@ def main():
         url_changes[change.url].append(change)
     
     # Выводим результаты
-    logger.info(f"\nАнализ изменений позиций за период {start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')}:")
+    logger.info("\nАнализ изменений позиций за неделю:")
     logger.info("=" * 80)
     
     for url, url_changes_list in url_changes.items():
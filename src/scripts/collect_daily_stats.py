@@ -14,60 +14,12 @@ from src.config.supabase_config import DATABASE_URL
 from src.services.gsc_service import GSCService
 from src.services.telegram_service import TelegramService
 from src.utils.credentials_manager import CredentialsManager
+from src.utils.city_resolver import city_resolver, get_city_ids
 from src.utils.logger import setup_logger
+from src.utils.query_classifier import get_query_type
 
 logger = setup_logger(__name__)
 
-def get_city_from_page(page: str) -> str:
-    """Получаем город из URL страницы."""
-    # Убираем протокол и домен
-    page = page.replace('https://cvety.kz/', '').replace('https://blog.cvety.kz/', 'blog/')
-    
-    # Маппинг городов
-    city_mapping = {
-        'almaty': 'алматы',
-        'astana': 'астана',
-        'shymkent': 'шымкент'
-    }
-    
-    # Проверяем блог
-    if page.startswith('blog/'):
-        return 'блог'
-        
-    # Проверяем города
-    for eng, rus in city_mapping.items():
-        if page.startswith(f"{eng}/"):
-            return rus
-            
-    return 'общий'
-
-def get_query_type(query: str) -> str:
-    """Определяем тип запроса."""
-    query = query.lower()
-    
-    # Брендовые запросы
-    if any(brand in query for brand in ['cvety.kz', 'цветы.кз', 'цветы кз']):
-        return 'брендовый'
-        
-    # Коммерческие запросы
-    if any(word in query for word in ['купить', 'заказать', 'цена', 'стоимость', 'сколько стоит']):
-        return 'коммерческий'
-        
-    # Запросы по доставке
-    if 'доставка' in query:
-        return 'доставка'
-        
-    # Информационные запросы
-    if any(word in query for word in ['как', 'что', 'когда', 'где', 'почему']):
-        return 'информационный'
-        
-    # Запросы по типам цветов
-    if any(flower in query for flower in ['розы', 'тюльпаны', 'пионы', 'хризантемы']):
-        return 'типы_цветов'
-        
-    # По умолчанию - прочие
-    return 'прочее'
-
 def filter_and_sort_rows(rows: List[Dict]) -> List[Dict]:
     """Фильтруем и сортируем строки."""
     # Сортируем по кликам
@@ -95,13 +47,18 @@ def save_daily_stats(stats, date):
     # Фильтруем и сортируем строки
     rows = filter_and_sort_rows(stats.get('rows', []))
     
+    # Город определяем один раз при загрузке и сохраняем в city_id
+    city_ids = get_city_ids(cur)
+    
     for row in rows:
         # Получаем данные из строки
         dimensions = row['keys']
         page, query = dimensions[0], dimensions[1]
         
         # Получаем город и тип запроса
-        city = get_city_from_page(page)
+        city = city_resolver.page_city_label(page)
+        resolved_city = city_resolver.resolve(query, page)
+        city_id = city_ids.get(resolved_city.slug) if resolved_city else None
         query_type = get_query_type(query)
         
         # Получаем метрики
@@ -137,18 +94,21 @@ def save_daily_stats(stats, date):
         query_type_stats[query_type]['impressions'] += impressions
         query_type_stats[query_type]['queries'] += 1
         
+        # Строка на каждую пару страница x запрос: страница входит в ключ
         try:
             cur.execute("""
                 INSERT INTO search_queries_daily 
-                    (date, query, query_type, clicks, impressions, position, ctr, city)
+                    (date, query, query_type, clicks, impressions, position, ctr, city, city_id, page_url)
                 VALUES 
-                    (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (date, query, city) DO UPDATE SET
+                    (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (date, query, city, page_url) DO UPDATE SET
                     query_type = EXCLUDED.query_type,
+                    city_id = EXCLUDED.city_id,
                     clicks = EXCLUDED.clicks,
                     impressions = EXCLUDED.impressions,
                     position = EXCLUDED.position,
-                    ctr = EXCLUDED.ctr
+                    ctr = EXCLUDED.ctr,
+                    updated_at = CURRENT_TIMESTAMP
             """, (
                 date,
                 query,
@@ -157,7 +117,9 @@ def save_daily_stats(stats, date):
                 impressions,
                 position,
                 ctr,
-                city
+                city,
+                city_id,
+                page
             ))
         except Exception as e:
             logger.error(f"Ошибка при сохранении данных для запроса {query}: {e}")
@@ -248,6 +210,8 @@ def main():
             error_msg = "❌ Нет данных в ответе от GSC API"
             logger.error(error_msg)
             telegram.send_message(chat_id=chat_id, text=error_msg)
+            # GSC еще не отдал данные за день: планировщик повторит сбор
+            return False
             
     except Exception as e:
         error_msg = f"❌ Ошибка: {str(e)}"
@@ -258,6 +222,9 @@ def main():
             telegram.send_message(chat_id=chat_id, text=error_msg)
         except:
             logger.error("Не удалось отправить уведомление об ошибке в Telegram")
+        # Ошибка пробрасывается, чтобы планировщик повторил сбор и не запускал
+        # зависящие задачи на устаревших данных
+        raise
 
 if __name__ == "__main__":
     main()
@@ -14,7 +14,9 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 sys.path.append(project_root)
 
 from src.database.postgres_client import PostgresClient
+from src.utils.city_resolver import city_resolver, get_city_ids
 from src.utils.logger import setup_logger
+from src.utils.query_classifier import get_query_category
 from src.utils.token_manager import TokenManager
 
 logger = setup_logger(__name__)
@@ -66,74 +68,6 @@ def fetch_search_data(service, site_url: str, start_date: datetime, end_date: da
     # Возвращаем только топ-50 запросов
     return sorted_rows[:50]
 
-def categorize_query(query: str) -> str:
-    """Категоризация поискового запроса.
-    
-    Args:
-        query: Поисковый запрос
-        
-    Returns:
-        str: Категория запроса
-    """
-    query = query.lower().strip()
-    
-    # Список основных городов Казахстана
-    major_cities = {
-        'алматы': 'almaty',
-        'астана': 'astana',
-        'шымкент': 'shymkent',
-        'караганда': 'karaganda',
-        'актау': 'aktau',
-        'атырау': 'atyrau',
-        'актобе': 'aktobe',
-        'костанай': 'kostanay',
-        'павлодар': 'pavlodar',
-        'усть-каменогорск': 'ust-kamenogorsk',
-        'семей': 'semey',
-        'кызылорда': 'kyzylorda'
-    }
-    
-    # Определяем город
-    city = None
-    for city_name in major_cities:
-        if city_name in query:
-            city = major_cities[city_name]
-            break
-    
-    # Определяем тип запроса
-    query_types = []
-    
-    # Доставка цветов
-    if 'доставка' in query or 'заказать' in query:
-        query_types.append('delivery')
-        
-    # Покупка цветов
-    if 'купить' in query or 'цена' in query or 'стоимость' in query:
-        query_types.append('purchase')
-        
-    # Типы цветов
-    flowers = ['розы', 'тюльпаны', 'пионы', 'хризантемы', 'букет']
-    for flower in flowers:
-        if flower in query:
-            query_types.append('flowers')
-            break
-            
-    # Если город определен
-    if city:
-        if query_types:
-            # Объединяем типы запроса с городом
-            return f"{'+'.join(query_types)}_{city}"
-        else:
-            # Если тип не определен, но есть город
-            return f"general_{city}"
-    
-    # Если город не определен
-    if query_types:
-        return '+'.join(query_types)
-        
-    # Если ничего не определено
-    return 'other'
-
 def save_to_database(db: PostgresClient, data: List[Dict[str, Any]], date_collected: datetime):
     """Сохранение данных в базу.
     
@@ -149,6 +83,7 @@ def save_to_database(db: PostgresClient, data: List[Dict[str, Any]], date_collec
                 CREATE TEMP TABLE temp_queries (
                     query TEXT,
                     query_type TEXT,
+                    city_id INTEGER,
                     url TEXT,
                     position FLOAT,
                     clicks INTEGER,
@@ -158,36 +93,46 @@ def save_to_database(db: PostgresClient, data: List[Dict[str, Any]], date_collec
                 ) ON COMMIT DROP
             """)
             
+            # Город определяем при загрузке, чтобы не разбирать запросы в SQL
+            city_ids = get_city_ids(cur)
+            
             # Подготавливаем данные для вставки
-            rows = [
-                (
+            rows = []
+            for row in data:
+                city = city_resolver.resolve(row['keys'][0], row['keys'][1])
+                rows.append((
                     row['keys'][0],  # query
-                    categorize_query(row['keys'][0]),  # query_type
+                    get_query_category(row['keys'][0]),  # query_type
+                    city_ids.get(city.slug) if city else None,  # city_id
                     row['keys'][1],  # url
                     row['position'],
                     row['clicks'],
                     row['impressions'],
                     row['ctr'],
                     date_collected.date()
-                )
-                for row in data
-            ]
+                ))
             
             # Пакетная вставка во временную таблицу
             cur.executemany("""
                 INSERT INTO temp_queries 
-                (query, query_type, url, position, clicks, impressions, ctr, date_collected)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                (query, query_type, city_id, url, position, clicks, impressions, ctr, date_collected)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, rows)
             
             # Вставка из временной таблицы в основную
             cur.execute("""
                 INSERT INTO search_queries 
-                (query, query_type, url, position, clicks, impressions, ctr, date_collected)
-                SELECT query, query_type, url, position, clicks, impressions, ctr, date_collected
+                (query, query_type, city_id, url, position, clicks, impressions, ctr, date_collected)
+                SELECT query, query_type, city_id, url, position, clicks, impressions, ctr, date_collected
                 FROM temp_queries
             """)
             
+            # Сводки по городам и изменения позиций обновляются в той же
+            # транзакции, что и запросы
+            written = [(row[0], row[2], row[8]) for row in rows]
+            db.refresh_city_rollup(cur, written)
+            db.record_position_changes(cur, written)
+            
             conn.commit()
 
 def main():
@@ -13,6 +13,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from src.utils.query_classifier import is_branded_query
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,20 +44,6 @@ def create_services(credentials):
     
     return sheets_service, webmasters_service
 
-def is_branded_query(query):
-    """
-    Проверяет, является ли запрос брендовым
-    
-    Args:
-        query: Поисковый запрос
-        
-    Returns:
-        bool: True если запрос брендовый
-    """
-    brand_terms = ['cvety.kz', 'цветы.кз', 'цветыкз', 'cvetykz', 'цветы кз']
-    query = query.lower()
-    return any(term in query for term in brand_terms)
-
 def get_search_analytics_data(webmasters_service, site_url, start_date, end_date):
     """
     Получение данных о позициях из Search Console
@@ -1,8 +1,8 @@
-"""Скрипт для запуска отправки отчетов по расписанию."""
+"""Скрипт для запуска сбора данных и отправки отчетов по расписанию."""
 import asyncio
 import os
 import sys
-from datetime import datetime, time
+from datetime import datetime, timedelta, timezone
 import aioschedule as schedule
 from dotenv import load_dotenv
 
@@ -11,18 +11,175 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
 sys.path.append(project_root)
 
+from src.scripts.collect_daily_stats import main as collect_daily_stats
 from src.scripts.send_daily_report import send_daily_report
+from src.scripts.send_weekly_report import main as send_weekly_report
 from src.utils.logger import setup_logger
+from src.utils.scheduler import DAGScheduler
 
 logger = setup_logger(__name__)
 
+def aggregate_metrics():
+    """Агрегация ежедневных метрик в недельные и месячные."""
+    from src.data_aggregator import DataAggregator
+
+    end_date = datetime.now()
+    aggregator = DataAggregator()
+    aggregator.aggregate_daily_to_weekly(end_date - timedelta(days=7), end_date)
+    aggregator.aggregate_weekly_to_monthly(end_date - timedelta(days=31), end_date)
+
+def analyze_trends():
+    """Расчет и сохранение трендов по всем запросам."""
+    from src.data_aggregator import DataAggregator
+
+    aggregator = DataAggregator()
+    aggregator.save_trends(aggregator.detect_trends_bulk(days=90))
+
+def fit_ctr_curve():
+    """Перестроение кривой ожидаемого CTR по последним 90 дням."""
+    from src.analytics.ctr_curve import CTRCurve
+    from src.database.postgres_client import PostgresClient
+
+    db = PostgresClient()
+    CTRCurve.fit_from_db(db, days=90).save(db)
+
+def detect_anomalies():
+    """Обновление состояния детектора аномалий по новым дням."""
+    from src.analytics.anomaly_detector import StreamingAnomalyDetector
+    from src.database.postgres_client import PostgresClient
+
+    StreamingAnomalyDetector(PostgresClient()).process_pending()
+
+def cluster_queries(refit_days: int = 30):
+    """Назначение тем новым запросам; модель переобучается раз в refit_days дней."""
+    from src.analytics.ml_models.query_clustering import QueryClusterer
+    from src.database.postgres_client import PostgresClient
+
+    db = PostgresClient()
+    clusterer = QueryClusterer.load(db)
+    if clusterer is None or clusterer.fitted_at < datetime.now(timezone.utc) - timedelta(days=refit_days):
+        clusterer = QueryClusterer.fit_from_db(db, days=90)
+        clusterer.save(db)
+    clusterer.assign_new(db)
+
+def deduplicate_queries():
+    """Пересчет канонических вариантов почти одинаковых запросов."""
+    from src.analytics.query_dedup import QueryDeduplicator
+    from src.database.postgres_client import PostgresClient
+
+    QueryDeduplicator().update_db(PostgresClient())
+
+def detect_cannibalization():
+    """Поиск каннибализации ключевых слов за последние 4 недели."""
+    from src.analytics.cannibalization import CannibalizationDetector
+    from src.database.postgres_client import PostgresClient
+
+    CannibalizationDetector(PostgresClient()).run(days=28)
+
+def forecast_clicks():
+    """Обновление прогноза кликов и показов на следующую неделю."""
+    from src.analytics.ml_models.forecasting import ClickForecaster
+    from src.database.postgres_client import PostgresClient
+
+    ClickForecaster(PostgresClient()).run()
+
+def score_seasonality():
+    """Пакетный пересчет оценок сезонности запросов."""
+    from src.analytics.seasonality import SeasonalityEngine
+    from src.database.postgres_client import PostgresClient
+
+    SeasonalityEngine(PostgresClient()).run()
+
+def score_drop_risk():
+    """Дообучение модели риска падения позиций и оценка всех пар."""
+    from src.analytics.ml_models.drop_risk import DropRiskPredictor
+    from src.database.postgres_client import PostgresClient
+
+    DropRiskPredictor(PostgresClient()).run()
+
+def score_opportunities():
+    """Пересчет точек роста по изменившимся запросам и страницам."""
+    from src.analytics.opportunity_scoring import OpportunityScorer
+    from src.database.postgres_client import PostgresClient
+
+    OpportunityScorer(PostgresClient()).run()
+
+def build_page_facts():
+    """Пересчет фактов по страницам из GSC, Яндекс.Метрики и GA4 за 30 дней."""
+    from src.analytics.page_facts import PageFactsBuilder
+    from src.database.postgres_client import PostgresClient
+    from src.services.google_analytics import GoogleAnalytics
+    from src.services.yandex_metrika import YandexMetrikaAPI
+    from src.utils.credentials_manager import CredentialsManager
+
+    credentials = CredentialsManager()
+    token = credentials.get_credential('yandex_metrika', 'token')
+    counter_id = credentials.get_credential('yandex_metrika', 'counter_id')
+    metrika = YandexMetrikaAPI(token, counter_id) if token and counter_id else None
+    try:
+        ga = GoogleAnalytics()
+    except Exception as e:
+        logger.error(f"GA4 недоступен, факты по страницам без электронной коммерции: {e}")
+        ga = None
+
+    PageFactsBuilder(PostgresClient(), metrika=metrika, ga=ga).run(days=30)
+
+def build_pipeline(include_weekly: bool = False) -> DAGScheduler:
+    """Построение графа задач ежедневного пайплайна.
+
+    Args:
+        include_weekly: Добавить отправку еженедельного отчета
+
+    Returns:
+        DAGScheduler: Планировщик с зарегистрированными задачами
+    """
+    pipeline = DAGScheduler()
+    pipeline.add_job('collect', collect_daily_stats)
+    pipeline.add_job('aggregate', aggregate_metrics, depends_on=['collect'])
+    pipeline.add_job('trends', analyze_trends, depends_on=['collect'])
+    pipeline.add_job('ctr_curve', fit_ctr_curve, depends_on=['collect'])
+    pipeline.add_job('anomalies', detect_anomalies, depends_on=['collect'])
+    pipeline.add_job('query_clusters', cluster_queries, depends_on=['collect'])
+    pipeline.add_job('query_dedup', deduplicate_queries, depends_on=['collect'])
+    pipeline.add_job('cannibalization', detect_cannibalization, depends_on=['collect'])
+    pipeline.add_job('forecast', forecast_clicks, depends_on=['collect'])
+    pipeline.add_job('seasonality', score_seasonality, depends_on=['collect'])
+    pipeline.add_job('drop_risk', score_drop_risk, depends_on=['ctr_curve'])
+    pipeline.add_job('opportunities', score_opportunities, depends_on=['ctr_curve'])
+    pipeline.add_job('page_facts', build_page_facts, depends_on=['collect'])
+    # Раздел тем необязателен: отчет ждет кластеризацию, но ее ошибка его не отменяет
+    pipeline.add_job(
+        'daily_report',
+        send_daily_report,
+        depends_on=['aggregate'],
+        after=['query_clusters']
+    )
+
+    if include_weekly:
+        # Разделы еженедельного отчета читают последние сохраненные результаты
+        # аналитических задач: отчет ждет их завершения, но их ошибка его не отменяет
+        pipeline.add_job(
+            'weekly_report',
+            send_weekly_report,
+            depends_on=['aggregate'],
+            after=['cannibalization', 'forecast', 'drop_risk', 'opportunities']
+        )
+
+    return pipeline
+
+async def run_pipeline():
+    """Запуск ежедневного пайплайна."""
+    # Еженедельный отчет отправляем по понедельникам
+    pipeline = build_pipeline(include_weekly=datetime.now().weekday() == 0)
+    return await pipeline.run()
+
 async def run_scheduler():
     """Запуск планировщика задач."""
-    # Отправляем отчет каждый день в 10:00
-    schedule.every().day.at("10:00").do(send_daily_report)
-    
-    logger.info("Scheduler started. Reports will be sent daily at 10:00")
-    
+    # Запускаем пайплайн каждый день в 09:00
+    schedule.every().day.at("09:00").do(run_pipeline)
+
+    logger.info("Scheduler started. Pipeline will run daily at 09:00")
+
     while True:
         await schedule.run_pending()
         await asyncio.sleep(60)  # Проверяем каждую минуту
@@ -31,7 +188,12 @@ def main():
     """Main function."""
     # Загружаем переменные окружения
     load_dotenv()
-    
+
+    if '--once' in sys.argv:
+        # Однократный запуск пайплайна без ожидания расписания
+        asyncio.run(run_pipeline())
+        return
+
     # Запускаем планировщик
     asyncio.run(run_scheduler())
 
@@ -31,6 +31,10 @@ def main():
         # Получаем данные для отчета
         logger.debug("Получаем данные для сравнения")
         data = report.get_comparison_data()
+        data['cannibalization'] = report.get_cannibalization()
+        data['forecast_shortfalls'] = report.get_forecast_shortfalls()
+        data['drop_risks'] = report.get_drop_risks()
+        data['opportunities'] = report.get_opportunities()
         logger.debug(f"Получены данные: {len(data['queries'])} запросов, {len(data['categories'])} категорий")
         
         # Форматируем отчет
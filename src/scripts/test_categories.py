@@ -56,13 +56,13 @@ def analyze_cities():
         logger.info(f"Средний CTR: {stats['ctr_percentage']}%")
         logger.info("-" * 50)
     
-    # Детальный анализ Алматы и Астаны
-    for city in ['almaty', 'astana']:
+    # Детальный анализ Алматы и Астаны, города детализируются одновременно
+    report = analyzer.analyze_city_report(days=30, cities=['almaty', 'astana'], limit=10)
+    for city, drilldown in report['drilldowns'].items():
         logger.info(f"\nДетальный анализ города {city.upper()}:")
         logger.info("=" * 50)
         
-        # Получаем топ запросов для города
-        top_queries = analyzer.get_top_queries_by_city(city, limit=10)
+        top_queries = drilldown['top_queries']
         
         logger.info("\nТоп запросы:")
         logger.info("-" * 30)
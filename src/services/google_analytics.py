@@ -8,6 +8,8 @@ from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
     DateRange,
     Dimension,
+    Filter,
+    FilterExpression,
     Metric,
     OrderBy,
     RunReportRequest,
@@ -286,6 +288,61 @@ class GoogleAnalytics:
             
         return result
 
+    def get_landing_page_ecommerce(
+        self,
+        start_date: str,
+        end_date: str,
+        limit: int = 10000
+    ) -> List[Dict]:
+        """
+        Получение электронной коммерции органических сессий по страницам входа.
+        
+        Args:
+            start_date: Начальная дата в формате YYYY-MM-DD
+            end_date: Конечная дата в формате YYYY-MM-DD
+            limit: Количество строк в одном запросе
+            
+        Returns:
+            List[Dict]: landing_page, sessions, purchases, revenue
+        """
+        result = []
+        offset = 0
+        while True:
+            request = RunReportRequest(
+                property=f"properties/{self.property_id}",
+                dimensions=[Dimension(name="landingPage")],
+                metrics=[
+                    Metric(name="sessions"),
+                    Metric(name="ecommercePurchases"),
+                    Metric(name="purchaseRevenue")
+                ],
+                date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+                dimension_filter=FilterExpression(
+                    filter=Filter(
+                        field_name="sessionDefaultChannelGroup",
+                        string_filter=Filter.StringFilter(value="Organic Search")
+                    )
+                ),
+                limit=limit,
+                offset=offset
+            )
+            
+            response = self.client.run_report(request)
+            
+            for row in response.rows:
+                result.append({
+                    'landing_page': row.dimension_values[0].value,
+                    'sessions': int(row.metric_values[0].value),
+                    'purchases': int(row.metric_values[1].value),
+                    'revenue': float(row.metric_values[2].value)
+                })
+                
+            offset += limit
+            if offset >= response.row_count:
+                break
+                
+        return result
+
     def get_purchase_funnel(self, start_date: str, end_date: str) -> dict:
         """
         Получение статистики по воронке покупок.
@@ -5,9 +5,13 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from pathlib import Path
 
+import pandas as pd
+
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from src.reports.category_router import category_router
+from src.reports.constants import PAGE_CATEGORIES
 from src.utils.credentials_manager import CredentialsManager
 from src.utils.logger import setup_logger
 
@@ -101,16 +105,12 @@ class GSCService:
         Определяет категорию страницы по её URL.
         
         Args:
-            page_path: Путь страницы
+            page_path: Путь или полный URL страницы
             
         Returns:
             str: Название категории
         """
-        from src.reports.constants import PAGE_CATEGORIES
-        for category_id, category_data in PAGE_CATEGORIES.items():
-            if category_data['pattern'].match(page_path):
-                return category_data['name']
-        return PAGE_CATEGORIES['other']['name']
+        return category_router.categorize(page_path)
         
     def group_by_category(self, analytics_data: Dict) -> Dict[str, Dict]:
         """
@@ -122,34 +122,39 @@ class GSCService:
         Returns:
             Dict[str, Dict]: Данные, сгруппированные по категориям
         """
-        from src.reports.constants import PAGE_CATEGORIES
-        categories = {}
+        rows = analytics_data.get('rows', [])
+        df = pd.DataFrame({
+            'page': [row['keys'][0] for row in rows],  # Первый ключ - URL страницы
+            'impressions': [row['impressions'] for row in rows],
+            'clicks': [row['clicks'] for row in rows],
+            'position': [row['position'] for row in rows],
+        })
+        df['category'] = category_router.categorize_series(df['page'])
+        df['weighted_position'] = df['position'] * df['impressions']
+        
+        grouped = df.groupby('category').agg(
+            impressions=('impressions', 'sum'),
+            clicks=('clicks', 'sum'),
+            weighted_position=('weighted_position', 'sum'),
+            pages_count=('page', 'size')
+        )
         
-        # Инициализируем категории
-        for category in PAGE_CATEGORIES.values():
-            categories[category['name']] = {
-                'impressions': 0,
-                'clicks': 0,
-                'ctr': 0,
-                'position': 0,
-                'pages_count': 0
+        # Категории без строк остаются в отчете с нулевыми метриками
+        names = [category['name'] for category in PAGE_CATEGORIES.values()]
+        grouped = grouped.reindex(names, fill_value=0)
+        
+        categories = {}
+        for name, stats in zip(names, grouped.itertuples(index=False)):
+            impressions = int(stats.impressions)
+            clicks = int(stats.clicks)
+            categories[name] = {
+                'impressions': impressions,
+                'clicks': clicks,
+                'ctr': clicks / impressions if impressions > 0 else 0,
+                # Средняя позиция, взвешенная по показам
+                'position': float(stats.weighted_position) / impressions if impressions > 0 else 0,
+                'pages_count': int(stats.pages_count)
             }
-            
-        # Группируем данные
-        for row in analytics_data.get('rows', []):
-            page_path = row['keys'][0]  # Первый ключ - URL страницы
-            category = self.get_page_category(page_path)
-            
-            categories[category]['impressions'] += row['impressions']
-            categories[category]['clicks'] += row['clicks']
-            categories[category]['position'] += row['position'] * row['impressions']  # Взвешенная позиция
-            categories[category]['pages_count'] += 1
-            
-        # Вычисляем средние значения
-        for category_data in categories.values():
-            if category_data['impressions'] > 0:
-                category_data['position'] /= category_data['impressions']  # Средняя взвешенная позиция
-                category_data['ctr'] = category_data['clicks'] / category_data['impressions']
                 
         return categories
         
@@ -108,6 +108,47 @@ class YandexMetrikaAPI:
             
         return pd.DataFrame(rows)
 
+    def get_landing_pages(self, date1='7daysAgo', date2='today', limit=10000):
+        """
+        Получение статистики поисковых визитов по страницам входа
+        
+        Args:
+            date1 (str): Начальная дата
+            date2 (str): Конечная дата
+            limit (int): Количество строк в одном запросе
+        
+        Returns:
+            pd.DataFrame: url, visits, bounce_rate, goal_reaches
+        """
+        rows = []
+        offset = 1
+        while True:
+            params = {
+                'date1': date1,
+                'date2': date2,
+                'metrics': 'ym:s:visits,ym:s:bounceRate,ym:s:sumGoalReachesAny',
+                'dimensions': 'ym:s:startURL',
+                'filters': "ym:s:lastTrafficSource=='organic'",
+                'limit': limit,
+                'offset': offset
+            }
+            
+            data = self._make_request(params)
+            
+            for item in data['data']:
+                rows.append({
+                    'url': item['dimensions'][0]['name'],
+                    'visits': item['metrics'][0],
+                    'bounce_rate': item['metrics'][1],
+                    'goal_reaches': item['metrics'][2]
+                })
+                
+            offset += limit
+            if offset > data.get('total_rows', 0):
+                break
+                
+        return pd.DataFrame(rows, columns=['url', 'visits', 'bounce_rate', 'goal_reaches'])
+
     def get_conversion_goals(self, date1='7daysAgo', date2='today', goal_id=None):
         """
         Получение данных по целям
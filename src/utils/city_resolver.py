@@ -0,0 +1,228 @@
+"""
+Определение города по URL страницы и по тексту запроса.
+
+Для URL используется префиксное дерево по строке «хост/путь»: город
+определяется самым длинным известным префиксом за один проход по символам.
+Для запросов названия городов и их варианты (латиница, старые названия)
+компилируются в одно регулярное выражение: название должно быть отдельным
+словом, для кириллических названий допускаются падежные окончания
+(«в астане», «из караганды»), но не другие слова с той же основой
+(«семейный» не означает Семей).
+Город определяется один раз при загрузке данных и сохраняется в city_id.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class City:
+    """Город с вариантами написания."""
+    slug: str
+    name: str
+    name_en: str
+    aliases: List[str] = field(default_factory=list, compare=False, hash=False)
+
+    @property
+    def variants(self) -> List[str]:
+        """Все написания для поиска в запросах."""
+        return [self.name.lower(), self.slug] + self.aliases
+
+
+CITIES = [
+    City('almaty', 'Алматы', 'Almaty', ['алма-ата']),
+    City('astana', 'Астана', 'Astana', ['нур-султан', 'нурсултан', 'nur-sultan']),
+    City('shymkent', 'Шымкент', 'Shymkent'),
+    City('karaganda', 'Караганда', 'Karaganda'),
+    City('aktau', 'Актау', 'Aktau'),
+    City('aktobe', 'Актобе', 'Aktobe'),
+    City('atyrau', 'Атырау', 'Atyrau'),
+    City('kostanay', 'Костанай', 'Kostanay'),
+    City('pavlodar', 'Павлодар', 'Pavlodar'),
+    City('kokshetau', 'Кокшетау', 'Kokshetau'),
+    City('semey', 'Семей', 'Semey', ['семипалатинск']),
+    City('taraz', 'Тараз', 'Taraz'),
+    City('uralsk', 'Уральск', 'Uralsk'),
+    City('ust-kamenogorsk', 'Усть-Каменогорск', 'Ust-Kamenogorsk', ['оскемен']),
+    City('petropavlovsk', 'Петропавловск', 'Petropavlovsk'),
+    City('kyzylorda', 'Кызылорда', 'Kyzylorda'),
+]
+
+# Падежные окончания по последней букве названия; несклоняемые названия
+# (Алматы, Актау, Актобе) ищутся без изменений
+ENDINGS = {
+    'а': ['а', 'ы', 'е', 'у', 'ой'],
+    'й': ['й', 'я', 'е', 'ю', 'ем'],
+}
+CONSONANT_ENDINGS = ['', 'а', 'е', 'у', 'ом']
+CONSONANTS = set('бвгджзклмнпрстфхцчшщ')
+
+# Значения колонки city в search_queries_daily для страниц без города
+BLOG = 'блог'
+GENERAL = 'общий'
+
+SITE_HOST = 'cvety.kz'
+BLOG_HOST = 'blog.cvety.kz'
+
+
+class PrefixTrie:
+    """Префиксное дерево для поиска самого длинного известного префикса."""
+
+    _VALUE = object()
+
+    def __init__(self):
+        """Инициализация пустого дерева."""
+        self.root: Dict = {}
+
+    def insert(self, key: str, value) -> None:
+        """Добавление префикса со значением."""
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[self._VALUE] = value
+
+    def longest_prefix(self, text: str, default=None):
+        """
+        Значение самого длинного префикса строки, присутствующего в дереве.
+
+        Args:
+            text: Строка для поиска
+            default: Значение, если ни один префикс не найден
+
+        Returns:
+            Значение найденного префикса или default
+        """
+        node = self.root
+        result = node.get(self._VALUE, default)
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            result = node.get(self._VALUE, result)
+        return result
+
+
+class CityResolver:
+    """Определение города по URL и запросу."""
+
+    def __init__(self, cities: List[City] = CITIES):
+        """
+        Инициализация индексов.
+
+        Args:
+            cities: Справочник городов
+        """
+        self.cities = {city.slug: city for city in cities}
+
+        self._paths = PrefixTrie()
+        self._paths.insert(BLOG_HOST + '/', BLOG)
+        self._paths.insert(SITE_HOST + '/blog/', BLOG)
+        for city in cities:
+            self._paths.insert(f'{SITE_HOST}/{city.slug}/', city.slug)
+
+        # Группа i соответствует i-му городу справочника
+        self._slugs = [city.slug for city in cities]
+        self._queries = re.compile(
+            r'(?<![\w-])(?:'
+            + '|'.join(
+                '(' + '|'.join(_variant_pattern(variant) for variant in city.variants) + ')'
+                for city in cities
+            )
+            + r')(?![\w-])'
+        )
+
+    def resolve_page(self, page: str) -> Optional[str]:
+        """
+        Город страницы.
+
+        Args:
+            page: URL страницы
+
+        Returns:
+            Optional[str]: slug города, BLOG для блога или None
+        """
+        page = page.lower().split('://', 1)[-1]
+        if page.startswith('www.'):
+            page = page[4:]
+        return self._paths.longest_prefix(page)
+
+    def resolve_query(self, query: str) -> Optional[City]:
+        """
+        Город, упомянутый в запросе.
+
+        Args:
+            query: Поисковый запрос
+
+        Returns:
+            Optional[City]: Город или None
+        """
+        groups = [match.lastindex for match in self._queries.finditer(query.lower())]
+        if not groups:
+            return None
+        # При упоминании нескольких городов побеждает первый в справочнике
+        return self.cities[self._slugs[min(groups) - 1]]
+
+    def resolve(self, query: str, page: Optional[str] = None) -> Optional[City]:
+        """
+        Город строки поисковой статистики: по странице, а если на странице
+        город не указан - по тексту запроса.
+
+        Args:
+            query: Поисковый запрос
+            page: URL страницы
+
+        Returns:
+            Optional[City]: Город или None
+        """
+        slug = self.resolve_page(page) if page else None
+        if slug in self.cities:
+            return self.cities[slug]
+        return self.resolve_query(query)
+
+    def page_city_label(self, page: str) -> str:
+        """
+        Значение колонки city в search_queries_daily для страницы.
+
+        Args:
+            page: URL страницы
+
+        Returns:
+            str: Название города в нижнем регистре, BLOG или GENERAL
+        """
+        slug = self.resolve_page(page)
+        if slug == BLOG:
+            return BLOG
+        if slug in self.cities:
+            return self.cities[slug].name.lower()
+        return GENERAL
+
+
+def _variant_pattern(variant: str) -> str:
+    """Регулярное выражение для написания города с падежными окончаниями."""
+    variant = variant.lower()
+    last = variant[-1]
+    if last in ENDINGS:
+        stem, endings = variant[:-1], ENDINGS[last]
+    elif last in CONSONANTS:
+        stem, endings = variant, CONSONANT_ENDINGS
+    else:
+        return re.escape(variant)
+    return re.escape(stem) + '(?:' + '|'.join(endings) + ')'
+
+
+# Общий экземпляр: индексы строятся один раз при импорте
+city_resolver = CityResolver()
+
+
+def get_city_ids(cur) -> Dict[str, int]:
+    """
+    Соответствие slug города и cities.id.
+
+    Args:
+        cur: Курсор базы данных
+
+    Returns:
+        Dict[str, int]: {slug: id}
+    """
+    cur.execute("SELECT slug, id FROM cities WHERE slug IS NOT NULL")
+    return {slug: city_id for slug, city_id in cur.fetchall()}
@@ -0,0 +1,144 @@
+"""
+Классификация поисковых запросов по ключевым словам.
+
+Все словари ключевых слов собраны в одном месте. Каждый классификатор
+компилирует свои правила в одно регулярное выражение и находит все
+вхождения за один проход по строке. Правила проверяются в порядке
+приоритета: побеждает первое правило, у которого есть хотя бы одно
+совпадение (как при последовательных проверках any(word in query ...)).
+"""
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Брендовые написания cvety.kz
+BRAND_TERMS = ['cvety.kz', 'цветы.кз', 'цветыкз', 'cvetykz', 'цветы кз']
+
+
+class KeywordClassifier:
+    """Классификатор запросов по упорядоченным правилам с ключевыми словами."""
+
+    def __init__(self, rules: Sequence[Tuple[str, Sequence[str]]], default: str):
+        """
+        Инициализация классификатора.
+
+        Args:
+            rules: Список (метка, ключевые слова) в порядке приоритета
+            default: Метка для запросов без совпадений
+        """
+        self.rules = [(label, list(keywords)) for label, keywords in rules]
+        self.default = default
+
+        # Для каждого ключевого слова запоминаем приоритет его правила
+        self._priority: Dict[str, int] = {}
+        for priority, (_, keywords) in enumerate(self.rules):
+            for keyword in keywords:
+                self._priority.setdefault(keyword.lower(), priority)
+
+        # Просмотр вперед находит совпадения, начинающиеся в каждой позиции,
+        # включая перекрывающиеся; в одной позиции выигрывает правило
+        # с более высоким приоритетом
+        keywords = sorted(self._priority, key=lambda k: (self._priority[k], -len(k)))
+        self.pattern = re.compile(
+            '(?=(' + '|'.join(re.escape(keyword) for keyword in keywords) + '))'
+        )
+        # Ключевые слова, которые могут совпасть в той же позиции: в одной
+        # позиции совпадающие слова всегда являются префиксами друг друга
+        self._overlaps: Dict[str, List[str]] = {
+            keyword: [
+                other for other in keywords
+                if other != keyword and (other.startswith(keyword) or keyword.startswith(other))
+            ]
+            for keyword in keywords
+        }
+
+    def labels(self, query: str) -> List[str]:
+        """
+        Все метки, ключевые слова которых встречаются в запросе.
+
+        Args:
+            query: Поисковый запрос
+
+        Returns:
+            List[str]: Метки в порядке приоритета правил
+        """
+        query = query.lower()
+        priorities = set()
+        for match in self.pattern.finditer(query):
+            keyword = match.group(1)
+            priorities.add(self._priority[keyword])
+            for other in self._overlaps[keyword]:
+                if query.startswith(other, match.start()):
+                    priorities.add(self._priority[other])
+        return [self.rules[priority][0] for priority in sorted(priorities)]
+
+    def classify(self, query: str) -> str:
+        """
+        Метка запроса.
+
+        Args:
+            query: Поисковый запрос
+
+        Returns:
+            str: Метка первого подходящего правила или метка по умолчанию
+        """
+        matches = self.pattern.findall(query.lower())
+        if not matches:
+            return self.default
+        return self.rules[min(self._priority[match] for match in matches)][0]
+
+    def classify_series(self, queries: pd.Series) -> pd.Series:
+        """
+        Векторизованная классификация столбца запросов.
+
+        Args:
+            queries: Серия поисковых запросов
+
+        Returns:
+            pd.Series: Метки с индексом исходной серии
+        """
+        # Запросы повторяются по дням и городам: классифицируем только уникальные
+        codes, uniques = pd.factorize(queries)
+        labels = np.array(
+            [self.classify(str(query)) for query in uniques] + [self.default],
+            dtype=object
+        )
+        # Пропуски получают код -1, то есть метку по умолчанию
+        return pd.Series(labels[codes], index=queries.index, dtype=object)
+
+
+# Типы запросов для search_queries_daily
+QUERY_TYPE_CLASSIFIER = KeywordClassifier([
+    ('брендовый', BRAND_TERMS),
+    ('коммерческий', ['купить', 'заказать', 'цена', 'стоимость', 'сколько стоит']),
+    ('доставка', ['доставка']),
+    ('информационный', ['как', 'что', 'когда', 'где', 'почему']),
+    ('типы_цветов', ['розы', 'тюльпаны', 'пионы', 'хризантемы']),
+], default='прочее')
+
+# Категории запросов для search_queries (enum query_type в схеме)
+QUERY_CATEGORY_CLASSIFIER = KeywordClassifier([
+    ('delivery', ['доставка', 'delivery', 'заказать']),
+    ('bouquets', ['букет', 'bouquet']),
+    ('gifts', ['подарок', 'подарить', 'gift']),
+    ('flowers', ['цветы', 'розы', 'пионы', 'flowers', 'roses']),
+], default='other')
+
+BRAND_CLASSIFIER = KeywordClassifier([('brand', BRAND_TERMS)], default='')
+
+
+def get_query_type(query: str) -> str:
+    """Тип запроса для search_queries_daily."""
+    return QUERY_TYPE_CLASSIFIER.classify(query)
+
+
+def get_query_category(query: str) -> str:
+    """Категория запроса для search_queries."""
+    return QUERY_CATEGORY_CLASSIFIER.classify(query)
+
+
+def is_branded_query(query: str) -> bool:
+    """Проверка, является ли запрос брендовым."""
+    return BRAND_CLASSIFIER.classify(query) == 'brand'
@@ -0,0 +1,228 @@
+"""
+Планировщик задач с учетом зависимостей (DAG).
+
+Задачи объявляются вместе со списком зависимостей, например
+collect → aggregate → analyze → report. Кроме жестких зависимостей задача
+может ждать задачи, результат которых ей желателен, но не обязателен (after):
+она запускается после их завершения независимо от исхода. Независимые ветки
+выполняются параллельно, упавшие задачи перезапускаются с экспоненциальной задержкой,
+для каждой задачи сохраняется длительность выполнения.
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class Job:
+    """Задача планировщика."""
+    name: str
+    func: Callable[[], Any]
+    depends_on: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+    retries: int = 2
+    backoff: float = 30.0
+
+
+@dataclass
+class JobResult:
+    """Результат выполнения задачи."""
+    name: str
+    status: str  # success | failed | skipped
+    duration: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class DAGScheduler:
+    """Планировщик, запускающий задачи в порядке зависимостей."""
+
+    def __init__(self):
+        """Инициализация планировщика."""
+        self.jobs: Dict[str, Job] = {}
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        depends_on: Optional[List[str]] = None,
+        retries: int = 2,
+        backoff: float = 30.0,
+        after: Optional[List[str]] = None
+    ) -> Job:
+        """
+        Регистрация задачи.
+
+        Args:
+            name: Уникальное имя задачи
+            func: Функция или корутина без аргументов
+            depends_on: Имена задач, которые должны завершиться успешно
+            retries: Количество повторных попыток при ошибке
+            backoff: Базовая задержка между попытками в секундах
+            after: Имена задач, завершения которых нужно дождаться; их ошибка
+                   не отменяет запуск
+
+        Returns:
+            Job: Зарегистрированная задача
+        """
+        if name in self.jobs:
+            raise ValueError(f"Задача {name} уже зарегистрирована")
+
+        job = Job(
+            name=name,
+            func=func,
+            depends_on=list(depends_on or []),
+            after=list(after or []),
+            retries=retries,
+            backoff=backoff
+        )
+        self.jobs[name] = job
+        return job
+
+    def get_execution_order(self) -> List[str]:
+        """
+        Топологическая сортировка задач.
+
+        Returns:
+            List[str]: Имена задач в порядке, совместимом с зависимостями
+
+        Raises:
+            ValueError: Неизвестная зависимость или цикл в графе
+        """
+        in_degree = {name: 0 for name in self.jobs}
+        dependents: Dict[str, List[str]] = {name: [] for name in self.jobs}
+
+        for job in self.jobs.values():
+            for dep in job.depends_on + job.after:
+                if dep not in self.jobs:
+                    raise ValueError(
+                        f"Задача {job.name} зависит от неизвестной задачи {dep}"
+                    )
+                in_degree[job.name] += 1
+                dependents[dep].append(job.name)
+
+        ready = [name for name, degree in in_degree.items() if degree == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in dependents[name]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.jobs):
+            cyclic = sorted(set(self.jobs) - set(order))
+            raise ValueError(f"Обнаружен цикл в зависимостях: {', '.join(cyclic)}")
+
+        return order
+
+    async def run(self) -> Dict[str, JobResult]:
+        """
+        Запуск всех задач.
+
+        Задача стартует, как только успешно завершены все ее зависимости
+        и завершены (с любым исходом) задачи из after. Если хотя бы одна
+        зависимость упала, задача пропускается.
+
+        Returns:
+            Dict[str, JobResult]: Результаты по именам задач
+        """
+        order = self.get_execution_order()
+        results: Dict[str, JobResult] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_node(job: Job) -> None:
+            waits_for = job.depends_on + job.after
+            if waits_for:
+                await asyncio.gather(*(tasks[dep] for dep in waits_for))
+
+            failed = [
+                dep for dep in job.depends_on
+                if results[dep].status != 'success'
+            ]
+            if failed:
+                logger.warning(
+                    f"Задача {job.name} пропущена: не выполнены зависимости {', '.join(failed)}"
+                )
+                results[job.name] = JobResult(
+                    name=job.name,
+                    status='skipped',
+                    error=f"Не выполнены зависимости: {', '.join(failed)}"
+                )
+                return
+
+            results[job.name] = await self._execute(job)
+
+        # Задачи создаются в топологическом порядке, поэтому задачи-зависимости
+        # всегда уже присутствуют в tasks
+        for name in order:
+            tasks[name] = asyncio.create_task(run_node(self.jobs[name]))
+
+        await asyncio.gather(*tasks.values())
+
+        self._log_summary(order, results)
+        return results
+
+    async def _execute(self, job: Job) -> JobResult:
+        """
+        Выполнение задачи с повторными попытками.
+
+        Args:
+            job: Задача
+
+        Returns:
+            JobResult: Результат выполнения
+        """
+        started = time.monotonic()
+        error = None
+
+        for attempt in range(1, job.retries + 2):
+            try:
+                logger.info(f"Запуск задачи {job.name} (попытка {attempt})")
+                if inspect.iscoroutinefunction(job.func):
+                    result = await job.func()
+                else:
+                    result = await asyncio.to_thread(job.func)
+
+                if result is False:
+                    raise RuntimeError("Задача вернула False")
+
+                return JobResult(
+                    name=job.name,
+                    status='success',
+                    duration=time.monotonic() - started,
+                    attempts=attempt
+                )
+
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Ошибка в задаче {job.name} (попытка {attempt}): {error}")
+                if attempt <= job.retries:
+                    delay = job.backoff * 2 ** (attempt - 1)
+                    logger.info(f"Повтор задачи {job.name} через {delay:.0f} сек")
+                    await asyncio.sleep(delay)
+
+        return JobResult(
+            name=job.name,
+            status='failed',
+            duration=time.monotonic() - started,
+            attempts=job.retries + 1,
+            error=error
+        )
+
+    def _log_summary(self, order: List[str], results: Dict[str, JobResult]) -> None:
+        """Вывод длительности и статуса каждой задачи."""
+        logger.info("Итоги выполнения задач:")
+        for name in order:
+            result = results[name]
+            logger.info(
+                f"- {name}: {result.status}, {result.duration:.1f} сек, "
+                f"попыток: {result.attempts}"
+            )
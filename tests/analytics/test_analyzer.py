@@ -0,0 +1,59 @@
+"""
+Тесты для основного аналитического интерфейса.
+"""
+import pytest
+from datetime import datetime, timedelta
+from src.analytics.analyzer import SEOAnalyzer
+
+class TestSEOAnalyzer:
+    @pytest.fixture
+    def db(self, mocker):
+        urls = [f'/catalog/{i}' for i in range(6)]
+        positions = [
+            {
+                'query': f'запрос {i}',
+                'url': url,
+                'position': 3 + day,
+                'date': datetime.now() - timedelta(days=day),
+                'category': 'цветы'
+            }
+            for i, url in enumerate(urls)
+            for day in range(3)
+        ]
+        search_data = [
+            {
+                'query': f'запрос {i}',
+                'url': url,
+                'position': 1.2,
+                'clicks': 5,
+                'impressions': 100,
+                'date': datetime.now() - timedelta(days=day)
+            }
+            for i, url in enumerate(urls[:-1])
+            for day in range(3)
+        ]
+        
+        mock_db = mocker.Mock()
+        mock_db.execute_query.side_effect = [positions, search_data]
+        return mock_db
+        
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_analyze_category_loads_data_once(self, db, workers, monkeypatch):
+        monkeypatch.setattr(SEOAnalyzer, 'PARALLEL_MIN_URLS', 0)
+        analyzer = SEOAnalyzer(db)
+        
+        result = analyzer.analyze_category('цветы', days=30, workers=workers)
+        
+        # Один запрос позиций и один запрос данных по всем URL
+        assert db.execute_query.call_count == 2
+        assert len(result['ctr_analysis']) == 6
+        assert len(result['page_analysis']) == 6
+        
+        ctr = result['ctr_analysis']['/catalog/0']
+        assert ctr['status'] == 'success'
+        assert any(a['type'] == 'low_ctr' for a in ctr['anomalies'])
+        assert result['page_analysis']['/catalog/0']['metrics']['traffic']['clicks'] == 15
+        
+        # URL без данных получает ошибку, а не падение анализа
+        assert result['ctr_analysis']['/catalog/5']['status'] == 'error'
+        assert result['page_analysis']['/catalog/5']['status'] == 'error'
@@ -0,0 +1,71 @@
+"""
+Тесты для детектора каннибализации ключевых слов.
+"""
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from src.analytics.cannibalization import CannibalizationDetector, QueryPageIndex
+
+
+class TestCannibalizationDetector:
+    @pytest.fixture
+    def facts(self):
+        start = date(2024, 9, 1)
+        rows = []
+        for i in range(6):
+            day = start + timedelta(days=i)
+            # Две страницы делят показы и меняются местами каждый день
+            rows.append((day, 'розы', '/roses', 5, 50, 3.0 if i % 2 else 5.0))
+            rows.append((day, 'розы', '/catalog', 4, 50, 4.0))
+            # Одна страница
+            rows.append((day, 'пионы', '/peonies', 5, 100, 2.0))
+            # Вторая страница получает единичные показы
+            rows.append((day, 'тюльпаны', '/tulips', 5, 100, 2.0))
+            rows.append((day, 'тюльпаны', '/blog/tulips', 0, 2, 1.0))
+            # Доли равны, но лучшая страница стабильна
+            rows.append((day, 'букеты', '/bouquets', 3, 40, 2.0))
+            rows.append((day, 'букеты', '/gifts', 1, 40, 6.0))
+        return pd.DataFrame(
+            rows, columns=['date', 'query', 'page_url', 'clicks', 'impressions', 'position']
+        )
+
+    def test_index_lists_pages_by_impressions(self, facts):
+        index = QueryPageIndex.build(facts)
+
+        assert index.pages_of('тюльпаны') == ['/tulips', '/blog/tulips']
+        assert index.pages_of('пионы') == ['/peonies']
+        assert index.pages_of('лилии') == []
+
+    def test_detect_flags_split_queries(self, facts):
+        result = CannibalizationDetector().detect(facts).set_index('query')
+
+        assert set(result.index) == {'розы', 'букеты'}
+        roses = result.loc['розы']
+        assert roses['competing_urls'] == ['/catalog']
+        assert roses['pages_count'] == 2
+        assert roses['impressions'] == 600
+        assert roses['clicks'] == 54
+        assert roses['impression_split'] == pytest.approx(0.5)
+        assert roses['position_swaps'] == 5
+
+        assert result.loc['букеты', 'position_swaps'] == 0
+        # Смена лидера повышает оценку при равном разделении показов
+        assert result.index[0] == 'розы'
+
+    def test_swaps_alone_flag_query(self, facts):
+        detector = CannibalizationDetector(min_split=0.9, min_swaps=3)
+
+        result = detector.detect(facts)
+
+        assert result['query'].tolist() == ['розы']
+
+    def test_empty_facts(self):
+        facts = pd.DataFrame(
+            columns=['date', 'query', 'page_url', 'clicks', 'impressions', 'position']
+        )
+
+        result = CannibalizationDetector().detect(facts)
+
+        assert result.empty
+        assert list(result.columns) == CannibalizationDetector.COLUMNS
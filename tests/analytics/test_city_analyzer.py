@@ -0,0 +1,78 @@
+"""
+Тесты для анализа по городам.
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from src.analytics.city_analyzer import CityAnalyzer
+from src.analytics.ctr_curve import CTRCurve
+
+
+def mock_cursor(db, rows):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cursor
+    db.get_connection.return_value.__enter__.return_value = conn
+    return cursor
+
+
+def test_analyze_cities_reads_rollup():
+    db = MagicMock()
+    cursor = mock_cursor(db, [
+        ('almaty', 120, 300, 10000, 4.5, 3.0),
+        ('other', 5, 0, 40, 0, 0),
+    ])
+
+    stats = CityAnalyzer(db).analyze_cities(days=30)
+
+    sql, params = cursor.execute.call_args[0]
+    assert 'city_daily_stats' in sql and 'city_query_activity' in sql
+    assert 'search_queries ' not in sql and 'INTERVAL' not in sql
+    assert params == {'days': 30}
+    assert stats['almaty'] == {
+        'query_count': 120, 'total_clicks': 300, 'total_impressions': 10000,
+        'avg_position': 4.5, 'ctr_percentage': 3.0
+    }
+
+
+def test_get_ctr_gaps_by_city():
+    db = MagicMock()
+    db.fetch_all.return_value = [
+        {'query': 'розы', 'query_type': 'commercial', 'clicks': 10,
+         'impressions': 1000, 'position': 2.0},
+        {'query': 'пионы', 'query_type': 'commercial', 'clicks': 300,
+         'impressions': 1000, 'position': 1.0},
+    ]
+    curve = CTRCurve.from_baseline({1: 0.3, 2: 0.2, 3: 0.1}, default=0.01)
+
+    gaps = CityAnalyzer(db).get_ctr_gaps_by_city('almaty', curve, days=30)
+
+    assert [gap['query'] for gap in gaps] == ['розы']
+    assert gaps[0]['expected_ctr_percentage'] == pytest.approx(20.0)
+    assert gaps[0]['lost_clicks'] == pytest.approx(190.0)
+
+
+def test_analyze_city_report_runs_drilldowns_concurrently():
+    analyzer = CityAnalyzer(MagicMock())
+    cities = ['almaty', 'astana', 'shymkent']
+    barrier = threading.Barrier(len(cities), timeout=5)
+
+    def drilldown(city, days, limit, curve):
+        # Барьер пропускает потоки только если все детализации идут одновременно
+        barrier.wait()
+        if city == 'shymkent':
+            raise RuntimeError('connection lost')
+        return {'top_queries': [city], 'movers': [], 'ctr_gaps': []}
+
+    stats = {city: {} for city in cities + ['other']}
+    with patch.object(analyzer, 'analyze_cities', return_value=stats), \
+            patch.object(CTRCurve, 'load', return_value=None), \
+            patch.object(analyzer, '_drilldown', side_effect=drilldown):
+        report = analyzer.analyze_city_report(days=30)
+
+    assert report['cities'] is stats
+    # 'other' не детализируется, ошибка по одному городу не срывает отчет
+    assert sorted(report['drilldowns']) == ['almaty', 'astana']
+    assert report['drilldowns']['almaty']['top_queries'] == ['almaty']
@@ -11,8 +11,28 @@ class TestCTRAnalyzer:
     def analyzer(self, mocker):
         # Мокаем клиент базы данных
         mock_db = mocker.Mock()
+        # Кривая CTR еще не построена - используется базовая
+        mock_db.fetch_all.return_value = []
         return CTRAnalyzer(mock_db)
         
+    def test_uses_fitted_curve(self, mocker):
+        mock_db = mocker.Mock()
+        mock_db.fetch_all.return_value = [
+            {'device': 'all', 'query_type': 'all', 'position_bucket': bucket,
+             'expected_ctr': 0.5 / bucket, 'impressions': 1000}
+            for bucket in range(1, 21)
+        ]
+        
+        analyzer = CTRAnalyzer(mock_db)
+        
+        assert 'ctr_curve' in mock_db.fetch_all.call_args[0][0]
+        expected = analyzer.curve.expected_ctr(pd.DataFrame({'position': [1.0, 2.0]}))
+        assert expected.tolist() == pytest.approx([0.5, 0.25])
+        
+    def test_falls_back_to_baseline(self, analyzer):
+        expected = analyzer.curve.expected_ctr(pd.DataFrame({'position': [1.0]}))
+        assert expected.tolist() == pytest.approx([analyzer.baseline_ctr[1]])
+        
     def test_is_unstable_ctr(self, analyzer):
         # Тест на нестабильный CTR
         unstable = pd.Series([0.01, 0.1, 0.02, 0.15, 0.01])
@@ -67,3 +87,30 @@ class TestCTRAnalyzer:
         assert any(r['priority'] == 'high' for r in recommendations)
         # Проверяем типы рекомендаций
         assert any(r['type'] == 'title_optimization' for r in recommendations)
+
+    def test_find_ctr_anomalies_fractional_positions(self, analyzer):
+        # Позиции из GSC дробные и не должны теряться при сравнении
+        df = pd.DataFrame({
+            'position': [1.2, 0.9, 1.4],
+            'clicks': [5, 4, 6],
+            'impressions': [100, 100, 100]
+        })
+        df['ctr'] = df['clicks'] / df['impressions']
+
+        anomalies = analyzer._find_ctr_anomalies(df)
+
+        assert any(a['type'] == 'low_ctr' and a['position'] == 1 for a in anomalies)
+
+    def test_analyze_pages(self, analyzer):
+        df = pd.DataFrame({
+            'url': ['/a', '/a', '/b'],
+            'position': [1.0, 2.0, 1.0],
+            'clicks': [5, 15, 30],
+            'impressions': [100, 100, 100]
+        })
+
+        pages = analyzer.analyze_pages(df)
+
+        assert pages['url'].tolist() == ['/a', '/b']
+        assert pages.loc[0, 'lost_clicks'] == pytest.approx(20.0)
+        assert pages.loc[1, 'lost_clicks'] == pytest.approx(0.0)
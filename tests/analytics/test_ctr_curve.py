@@ -0,0 +1,59 @@
+"""
+Тесты для модели ожидаемого CTR.
+"""
+import pandas as pd
+import pytest
+from src.analytics.ctr_curve import CTRCurve
+
+
+class TestCTRCurve:
+    @pytest.fixture
+    def data(self):
+        # Коммерческие запросы кликаются хуже информационных
+        return pd.DataFrame({
+            'query_type': ['commercial'] * 4 + ['info'] * 4,
+            'position': [1.2, 2.0, 3.4, 5.0, 1.0, 2.1, 2.9, 5.2],
+            'clicks': [200, 120, 90, 20, 300, 150, 80, 30],
+            'impressions': [1000] * 8
+        })
+
+    def test_position_bucket(self):
+        buckets = CTRCurve.position_bucket(pd.Series([0.4, 1.4, 1.5, 7.8, 55.0]))
+        assert buckets.tolist() == [1, 1, 2, 8, 20]
+
+    def test_fit_is_monotonic(self, data):
+        # Неравномерные данные: на 3-й позиции CTR выше, чем на 2-й
+        noisy = data.copy()
+        noisy.loc[2, 'clicks'] = 150
+
+        curve = CTRCurve.fit(noisy)
+
+        for _, segment in curve.curve.groupby(['device', 'query_type']):
+            values = segment.sort_values('position_bucket')['expected_ctr']
+            assert values.is_monotonic_decreasing
+
+    def test_expected_ctr_by_segment_and_fallback(self, data):
+        curve = CTRCurve.fit(data)
+
+        lookup = pd.DataFrame({
+            'query_type': ['commercial', 'info', 'unknown'],
+            'position': [1.0, 1.0, 1.0]
+        })
+        expected = curve.expected_ctr(lookup)
+
+        assert expected[0] == pytest.approx(0.2)
+        assert expected[1] == pytest.approx(0.3)
+        # Неизвестный тип запроса получает общую кривую
+        assert expected[2] == pytest.approx(0.25)
+
+    def test_score_lost_clicks(self):
+        curve = CTRCurve.from_baseline({1: 0.25, 2: 0.15})
+        scored = curve.score(pd.DataFrame({
+            'position': [1.1, 2.0],
+            'clicks': [10, 50],
+            'impressions': [100, 100]
+        }))
+
+        assert scored['expected_clicks'].tolist() == pytest.approx([25.0, 15.0])
+        # Клики выше ожидаемых не дают отрицательных потерь
+        assert scored['lost_clicks'].tolist() == pytest.approx([15.0, 0.0])
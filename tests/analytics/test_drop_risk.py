@@ -0,0 +1,152 @@
+"""
+Тесты для модели риска падения позиций.
+"""
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics.ctr_curve import CTRCurve
+from src.analytics.ml_models.drop_risk import DropRiskModel, DropRiskPredictor, PairPanel
+
+START = date(2024, 1, 1)
+DAYS = 70
+
+
+@pytest.fixture
+def curve():
+    return CTRCurve.from_baseline({1: 0.25, 2: 0.15, 3: 0.1, 5: 0.07, 10: 0.02})
+
+
+@pytest.fixture
+def facts():
+    """Половина пар стабильна, у другой половины позиция ухудшается с середины истории."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for pair in range(40):
+        falling = pair % 2 == 1
+        for day in range(DAYS):
+            position = 5 + rng.normal(0, 0.3)
+            if falling and day >= 30:
+                position += 0.6 * (day - 30)
+            rows.append({
+                'date': START + timedelta(days=day),
+                'query': f'запрос {pair}',
+                'page_url': f'https://cvety.kz/page/{pair % 3}',
+                'clicks': 2,
+                'impressions': 20,
+                'position': position
+            })
+    return pd.DataFrame(rows)
+
+
+def test_panel_is_dense(facts):
+    panel = PairPanel.build(facts, START, START + timedelta(days=DAYS - 1))
+
+    assert len(panel) == 40
+    assert panel.impressions.shape == (40, DAYS)
+    assert (panel.impressions == 20).all()
+    np.testing.assert_allclose(
+        panel.weighted_position[0] / panel.impressions[0],
+        facts[facts['query'] == 'запрос 0']['position'].to_numpy()
+    )
+
+
+def test_features_and_labels(facts, curve):
+    panel = PairPanel.build(facts, START, START + timedelta(days=DAYS - 1))
+    model = DropRiskModel()
+    day = START + timedelta(days=45)
+
+    rows, features = model.features(panel, day, curve)
+    valid, labels = model.labels(panel, day, rows)
+
+    assert list(features.columns) == DropRiskModel.FEATURES
+    assert len(rows) == 40 and valid.all()
+    falling = np.array([int(query.split()[-1]) % 2 == 1 for query in panel.queries[rows]])
+    assert (labels == falling).all()
+    assert (features.loc[falling, 'position_delta'] > 3).all()
+    assert (features.loc[~falling, 'position_delta'].abs() < 1).all()
+    assert (features['presence'] == 1).all()
+
+    with pytest.raises(ValueError):
+        model.labels(panel, START + timedelta(days=DAYS - 3), rows)
+
+
+def test_partial_fit_ranks_falling_pairs(facts, curve):
+    panel = PairPanel.build(facts, START, START + timedelta(days=DAYS - 1))
+    model = DropRiskModel()
+    for offset in range(20, DAYS - 7):
+        day = START + timedelta(days=offset)
+        rows, features = model.features(panel, day, curve)
+        valid, labels = model.labels(panel, day, rows)
+        model.partial_fit(features[valid], labels)
+
+    assert model.n_samples == 40 * (DAYS - 27)
+    scores = DropRiskPredictor.score(model, panel, START + timedelta(days=DAYS - 1), curve)
+    falling = scores['query'].str.split().str[-1].astype(int) % 2 == 1
+    assert scores.loc[falling, 'probability'].min() > scores.loc[~falling, 'probability'].max()
+
+    restored = DropRiskModel.from_bytes(model.to_bytes())
+    _, features = model.features(panel, START + timedelta(days=DAYS - 1), curve)
+    np.testing.assert_allclose(restored.predict_proba(features), model.predict_proba(features))
+
+
+def test_predict_requires_training():
+    with pytest.raises(ValueError):
+        DropRiskModel().predict_proba(pd.DataFrame(columns=DropRiskModel.FEATURES))
+
+
+def test_run_trains_incrementally(facts, curve):
+    db = MagicMock()
+    end_date = START + timedelta(days=DAYS - 1)
+    db.fetch_one.side_effect = [{'max_date': end_date}, None]
+    db.fetch_all.side_effect = lambda sql, params: facts[
+        (facts['date'] >= params[0]) & (facts['date'] <= params[1])
+    ].to_dict('records')
+    predictor = DropRiskPredictor(db, bootstrap_days=30)
+
+    with patch.object(CTRCurve, 'load', return_value=curve), \
+            patch.object(DropRiskPredictor, 'save') as save, \
+            patch.object(DropRiskPredictor, '_save_scores') as save_scores:
+        scores = predictor.run()
+
+    model = save.call_args[0][0]
+    assert model.trained_through == end_date - timedelta(days=7)
+    assert model.n_samples == 40 * 30
+    assert len(scores) == 40
+    save_scores.assert_called_once()
+
+    # На следующий день добавляется ровно один размеченный день
+    db.fetch_one.side_effect = None
+    db.fetch_one.return_value = {'model': model.to_bytes()}
+    with patch.object(CTRCurve, 'load', return_value=curve), \
+            patch.object(DropRiskPredictor, 'save') as save, \
+            patch.object(DropRiskPredictor, '_save_scores'):
+        predictor.run(end_date=end_date + timedelta(days=1))
+
+    updated = save.call_args[0][0]
+    assert updated.trained_through == end_date - timedelta(days=6)
+    assert updated.n_samples == model.n_samples + 40
+    start_date = db.fetch_all.call_args[0][1][0]
+    assert start_date == end_date - timedelta(days=6 + 21)
+
+
+def test_pages_of_one_query_are_separate_pairs(facts, curve):
+    # Сбор пишет строку на каждую страницу запроса: пары не склеиваются
+    second = facts[facts['query'] == 'запрос 1'].assign(page_url='https://cvety.kz/roses/')
+    panel = PairPanel.build(
+        pd.concat([facts, second], ignore_index=True), START, START + timedelta(days=DAYS - 1)
+    )
+    model = DropRiskModel()
+    for offset in range(30, 50):
+        day = START + timedelta(days=offset)
+        rows, features = model.features(panel, day, curve)
+        valid, labels = model.labels(panel, day, rows)
+        model.partial_fit(features[valid], labels)
+
+    scores = DropRiskPredictor.score(model, panel, START + timedelta(days=DAYS - 1), curve)
+
+    pages = scores.loc[scores['query'] == 'запрос 1', 'page_url']
+    assert sorted(pages) == ['https://cvety.kz/page/1', 'https://cvety.kz/roses/']
+    assert len(scores) == 41
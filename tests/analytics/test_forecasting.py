@@ -0,0 +1,130 @@
+"""
+Тесты для пакетного прогноза кликов.
+"""
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from src.analytics.ml_models.forecasting import ClickForecaster, HoltWinters
+
+
+class SingleParamsHoltWinters(HoltWinters):
+    ALPHAS = (0.3,)
+    BETAS = (0.05,)
+    GAMMAS = (0.2,)
+
+
+class TestHoltWinters:
+    @pytest.fixture
+    def values(self):
+        rng = np.random.default_rng(0)
+        weekly = np.array([10, 12, 11, 9, 8, 3, 2], dtype=float)
+        scale = rng.uniform(0.5, 3, size=(50, 1))
+        return weekly[np.arange(70) % 7][None, :] * scale + rng.normal(0, 0.3, size=(50, 70))
+
+    def test_forecast_follows_weekly_pattern(self, values):
+        start = date(2024, 6, 3)  # понедельник
+        model = HoltWinters()
+        state = model.fit(values, start)
+
+        forecast = model.forecast(state, start + timedelta(days=69))
+
+        # Следующая неделя тоже начинается с понедельника
+        np.testing.assert_allclose(forecast, values[:, -7:], rtol=0.25, atol=1)
+        assert forecast.shape == (50, 7)
+        assert (forecast >= 0).all()
+
+    def test_update_continues_fit(self, values):
+        start = date(2024, 6, 3)
+        model = SingleParamsHoltWinters()
+        full = model.fit(values, start)
+
+        state = model.fit(values[:, :60], start)
+        model.update(state, values[:, 60:], start + timedelta(days=60))
+
+        np.testing.assert_allclose(state.level, full.level)
+        np.testing.assert_allclose(state.season, full.season)
+        np.testing.assert_allclose(state.sse, full.sse)
+
+    def test_mask_skips_seen_days(self, values):
+        start = date(2024, 6, 3)
+        model = SingleParamsHoltWinters()
+        state = model.fit(values[:, :60], start)
+        level = state.level.copy()
+
+        mask = np.zeros((50, 10), dtype=bool)
+        model.update(state, values[:, 60:], start + timedelta(days=60), mask)
+
+        np.testing.assert_array_equal(state.level, level)
+
+    def test_fit_requires_two_weeks(self, values):
+        with pytest.raises(ValueError):
+            HoltWinters().fit(values[:, :10], date(2024, 6, 3))
+
+
+class TestClickForecaster:
+    @pytest.fixture
+    def rows(self):
+        end = date(2024, 9, 1)
+        rows = []
+        for i in range(90):
+            day = end - timedelta(days=89 - i)
+            weekday_factor = 1.5 if day.weekday() < 5 else 0.7
+            for query, query_type, base in [('розы', 'типы_цветов', 50),
+                                            ('доставка цветов', 'доставка', 100),
+                                            ('редкий', 'прочее', 1)]:
+                impressions = int(base * weekday_factor)
+                if impressions:
+                    rows.append({'date': day, 'query': query, 'query_type': query_type,
+                                 'clicks': impressions // 10, 'impressions': impressions})
+        return rows
+
+    def run(self, forecaster, end_date):
+        saved = {}
+        with patch.object(ClickForecaster, '_save',
+                          lambda self, states, forecasts: saved.update(states=states)):
+            forecasts = forecaster.run(end_date=end_date)
+        return forecasts, saved['states']
+
+    def test_series_and_incremental_update(self, rows):
+        db = MagicMock()
+        forecaster = ClickForecaster(db, min_impressions=100)
+        end = date(2024, 9, 1)
+
+        db.fetch_all.side_effect = [rows, []]
+        forecasts, states = self.run(forecaster, end)
+
+        series = set(zip(forecasts['series_type'], forecasts['series_key']))
+        # Запрос с малым числом показов прогнозируется только в составе категории
+        assert series == {
+            ('query', 'розы'), ('query', 'доставка цветов'),
+            ('category', 'типы_цветов'), ('category', 'доставка'), ('category', 'прочее'),
+            ('total', 'all'),
+        }
+        total = forecasts[(forecasts['series_type'] == 'total')
+                          & (forecasts['metric'] == 'impressions')].iloc[0]
+        assert total['forecast'] == pytest.approx(total['last_week_actual'], rel=0.05)
+        assert (states['fitted_at'] == end).all()
+
+        # На следующий день параметры не подбираются заново
+        saved_rows = [
+            {column: row[column] for column in ClickForecaster.STATE_COLUMNS}
+            for _, row in states.iterrows()
+        ]
+        db.fetch_all.side_effect = [rows, saved_rows]
+        _, updated = self.run(forecaster, end + timedelta(days=1))
+
+        assert (updated['fitted_at'] == end).all()
+        assert (updated['last_date'] == end + timedelta(days=1)).all()
+        assert (updated['n'] == states['n'] + 1).all()
+
+    def test_shortfalls(self, rows):
+        db = MagicMock()
+        db.fetch_all.side_effect = [rows, []]
+        forecasts, _ = self.run(ClickForecaster(db), date(2024, 9, 1))
+        forecasts.loc[0, 'expected_change'] = -0.5
+
+        result = ClickForecaster.shortfalls(forecasts, threshold=0.2)
+
+        assert result.index.tolist() == [0]
@@ -0,0 +1,85 @@
+"""
+Тесты для анализатора данных Google Search Console.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from src.analytics.gsc_analyzer import GSCAnalyzer, Dimension, Period
+from src.models.metrics import GSCMetric
+
+
+def make_metrics():
+    return [
+        GSCMetric(
+            date=datetime(2024, 1, 1) + timedelta(days=day),
+            source='gsc',
+            metric_type='search_analytics',
+            value=0.0,
+            clicks=clicks,
+            impressions=impressions,
+            ctr=clicks / impressions,
+            position=position,
+            url=url,
+            query=query
+        )
+        for day, (clicks, impressions, position, url, query) in enumerate([
+            (10, 200, 2.5, 'https://cvety.kz/catalog/roses/', 'розы'),
+            (5, 150, 4.0, 'https://cvety.kz/catalog/roses/', 'купить розы'),
+            (1, 50, 12.0, 'https://cvety.kz/delivery/', 'доставка'),
+        ])
+    ]
+
+
+class TestGSCAnalyzer:
+    def test_prepare_dataframe_dtypes(self):
+        df = GSCAnalyzer(make_metrics()).df
+        
+        for column in ['query', 'url', 'url_path']:
+            assert isinstance(df[column].dtype, pd.CategoricalDtype)
+        assert df['clicks'].dtype == np.int32
+        assert df['position'].dtype == np.float32
+        assert df['url_path'].tolist()[0] == '/catalog/roses/'
+        assert df['url_depth'].tolist() == [3, 3, 2]
+        
+    def test_from_columns_matches_metrics(self):
+        metrics = make_metrics()
+        columns = {
+            field: [getattr(metric, field) for metric in metrics]
+            for field in [
+                'date', 'source', 'metric_type', 'value',
+                'clicks', 'impressions', 'ctr', 'position', 'url', 'query'
+            ]
+        }
+        
+        pd.testing.assert_frame_equal(
+            GSCAnalyzer.from_columns(columns).df,
+            GSCAnalyzer(metrics).df
+        )
+        
+    def test_top_items_skip_filtered_categories(self):
+        analyzer = GSCAnalyzer(make_metrics())
+        
+        top = analyzer.get_top_items(Dimension.URL, min_impressions=100)
+        
+        # URL, отфильтрованный по показам, не должен появляться с нулями
+        assert list(top.index) == ['https://cvety.kz/catalog/roses/']
+        assert top.loc['https://cvety.kz/catalog/roses/', 'clicks'] == 15
+        
+    def test_rollups_are_memoised(self):
+        analyzer = GSCAnalyzer(make_metrics())
+        analyzer.build_cube()
+        cached = len(analyzer._cube)
+        
+        weekly = analyzer.aggregate_by_period(Period.WEEK, [Dimension.URL])
+        analyzer.get_seasonal_trends(Dimension.URL, period=Period.WEEK)
+        
+        # Повторные вызовы не добавляют новых агрегатов
+        assert len(analyzer._cube) == cached
+        assert weekly['clicks'].sum() == 16
+        # Колонки роста не попадают в общий кэш
+        assert 'clicks_growth' not in analyzer._rollup(Period.WEEK, ('url',)).columns
+        
+        # Новая версия данных сбрасывает кэш
+        analyzer.df = analyzer.df.iloc[:1]
+        assert analyzer._cube == {}
+        assert analyzer.aggregate_by_period(Period.WEEK)['clicks'].sum() == 10
@@ -0,0 +1,135 @@
+"""
+Тесты для инкрементальной оценки точек роста.
+"""
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics.ctr_curve import CTRCurve
+from src.analytics.opportunity_scoring import OpportunityScorer, get_top_opportunities
+
+
+@pytest.fixture
+def curve():
+    return CTRCurve.from_baseline({1: 0.3, 2: 0.2, 3: 0.1, 5: 0.05, 10: 0.02}, default=0.01)
+
+
+def sums(*rows):
+    return pd.DataFrame(rows, columns=OpportunityScorer.SUM_COLUMNS)
+
+
+def test_score(curve):
+    scorer = OpportunityScorer(MagicMock(), min_impressions=100)
+    result = scorer.score(sums(
+        ('розы', 20, 1000, 5000.0),      # позиция 5, CTR 2% при ожидаемых 5%
+        ('пионы', 400, 1000, 1000.0),    # позиция 1, CTR выше ожидаемого
+        ('редкий', 0, 50, 500.0),        # мало показов
+    ), curve)
+
+    roses, peonies, rare = result.itertuples(index=False)
+    assert roses.position == 5 and roses.expected_ctr == pytest.approx(0.05)
+    assert roses.lost_clicks == pytest.approx(30)
+    assert roses.upside_clicks == pytest.approx(50)  # до 3 позиции: 10% вместо 5%
+    assert roses.score == pytest.approx(80)
+    assert peonies.score == 0
+    assert rare.score == 0 and rare.lost_clicks > 0
+
+
+def test_rank_merges_changed_and_unchanged(curve):
+    scorer = OpportunityScorer(MagicMock(), top_k=3)
+    rng = np.random.default_rng(0)
+    changed = scorer.score(sums(*[
+        (f'q{i}', 0, int(rng.integers(100, 1000)), 500.0) for i in range(20)
+    ]), curve)
+    unchanged = changed.iloc[:0].copy()
+    unchanged.loc[0] = ['старый', 0, 100000, 500000.0, 5.0, 0.0, 0.05, 5000.0, 5000.0, 10000.0]
+
+    ranking = scorer.rank(changed, unchanged)
+
+    expected = ['старый'] + changed.nlargest(2, 'score')['entity_key'].tolist()
+    assert ranking['entity_key'].tolist() == expected
+    assert ranking['rank'].tolist() == [1, 2, 3]
+    assert scorer.rank(changed.iloc[:0], unchanged.iloc[:0]).empty
+
+
+class FakeDB:
+    """Ответы на запросы OpportunityScorer по тексту SQL."""
+
+    def __init__(self, last_run, changed, window_sums, stored_top):
+        self.last_run = last_run
+        self.changed = changed
+        self.window_sums = window_sums
+        self.stored_top = stored_top
+        self.calls = []
+
+    def fetch_one(self, sql, params=None):
+        if 'MAX(date)' in sql:
+            return {'max_date': date(2024, 3, 31)}
+        if 'opportunity_runs' in sql:
+            return self.last_run
+        return {'fitted_at': date(2024, 3, 1)}
+
+    def fetch_all(self, sql, params=None):
+        self.calls.append((sql, params))
+        if 'DISTINCT' in sql:
+            return [{'entity_key': key} for key in self.changed]
+        if 'FROM search_queries_daily' in sql:
+            return self.window_sums.to_dict('records')
+        if 'ORDER BY score DESC' in sql:
+            return self.stored_top.to_dict('records')
+        return []
+
+
+def test_full_run_without_history(curve):
+    db = FakeDB(None, [], sums(('розы', 20, 1000, 5000.0), ('пионы', 1, 500, 2000.0)), None)
+    scorer = OpportunityScorer(db, top_k=10)
+
+    with patch.object(CTRCurve, 'load', return_value=curve), \
+            patch.object(OpportunityScorer, '_save_scores') as save_scores, \
+            patch.object(OpportunityScorer, '_save_run') as save_run:
+        rankings = scorer.run()
+
+    assert rankings['query']['entity_key'].tolist() == ['розы', 'пионы']
+    assert not any('DISTINCT' in sql for sql, _ in db.calls)
+    # Полный расчет: сохраненные оценки заменяются целиком
+    assert save_scores.call_args_list[0][0][2] is None
+    assert save_run.call_args[0][1] == date(2024, 3, 4)
+
+
+def test_incremental_run_rescans_only_changed(curve):
+    stored = OpportunityScorer(MagicMock()).score(sums(('тюльпаны', 0, 3000, 15000.0)), curve)
+    last_run = {
+        'run_at': datetime(2024, 3, 31, 6),
+        'window_start': date(2024, 3, 3),
+        'window_end': date(2024, 3, 30),
+        'curve_fitted_at': date(2024, 3, 1)
+    }
+    db = FakeDB(last_run, ['розы', 'ушедший'], sums(('розы', 20, 1000, 5000.0)), stored)
+    scorer = OpportunityScorer(db, top_k=10)
+
+    with patch.object(CTRCurve, 'load', return_value=curve), \
+            patch.object(OpportunityScorer, '_save_scores') as save_scores, \
+            patch.object(OpportunityScorer, '_save_run'):
+        rankings = scorer.run()
+
+    assert rankings['query']['entity_key'].tolist() == ['тюльпаны', 'розы']
+    changed_sql, changed_params = next(call for call in db.calls if 'DISTINCT' in call[0])
+    # Перезаписанные задним числом строки находятся по updated_at, а не created_at
+    assert 'updated_at > %s' in changed_sql
+    assert changed_params == (last_run['run_at'], date(2024, 3, 30), date(2024, 3, 3), date(2024, 3, 4))
+    sums_params = next(params for sql, params in db.calls if 'GROUP BY' in sql)
+    assert sums_params[2] == ['розы', 'ушедший']
+    # Сущность без строк в окне передается на удаление
+    _, scored, keys, _, _ = save_scores.call_args_list[0][0]
+    assert scored['entity_key'].tolist() == ['розы']
+    assert keys == ['розы', 'ушедший']
+
+
+def test_get_top_opportunities():
+    db = MagicMock()
+    db.fetch_all.return_value = [{'rank': 1, 'entity_key': 'розы', 'score': 80.0}]
+
+    assert get_top_opportunities(db, 'page', limit=3) == db.fetch_all.return_value
+    assert db.fetch_all.call_args[0][1] == ('page', 3)
@@ -0,0 +1,121 @@
+"""
+Тесты для пакетного расчета фактов по страницам.
+"""
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+from src.analytics.page_analysis import PageAnalyzer
+from src.analytics.page_facts import PageFactsBuilder
+
+
+@pytest.fixture
+def builder():
+    return PageFactsBuilder(MagicMock())
+
+
+def test_by_path_normalizes_urls():
+    data = pd.DataFrame({
+        'page_path': [
+            'https://cvety.kz/almaty/roses/',
+            'https://cvety.kz/almaty/roses/?utm_source=google',
+            'https://cvety.kz/astana/',
+        ],
+        'clicks': [10, 5, 3],
+        'impressions': [100, 50, 30],
+    })
+
+    result = PageFactsBuilder._by_path(data, ['page_path', 'clicks', 'impressions'])
+
+    assert len(result) == 2
+    roses = result.set_index('page_path').loc['/almaty/roses/']
+    assert roses['clicks'] == 15 and roses['impressions'] == 150
+
+
+def test_combine(builder):
+    gsc = pd.DataFrame(
+        [('/roses/', 20, 1000, 5000.0, 12)], columns=PageFactsBuilder.GSC_COLUMNS
+    )
+    metrika = pd.DataFrame(
+        [('/roses/', 50, 10.0, 4), ('/about/', 10, 5.0, 0)],
+        columns=PageFactsBuilder.METRIKA_COLUMNS
+    )
+    ga4 = pd.DataFrame(
+        [('/roses/', 40, 2, 30000.0)], columns=PageFactsBuilder.GA4_COLUMNS
+    )
+
+    facts = builder.combine(gsc, metrika, ga4).set_index('page_path')
+
+    assert list(facts.reset_index().columns) == PageFactsBuilder.COLUMNS
+    roses = facts.loc['/roses/']
+    assert roses['ctr'] == pytest.approx(0.02)
+    assert roses['position'] == pytest.approx(5.0)
+    assert roses['bounce_rate'] == pytest.approx(0.2)
+    assert roses['conversion_rate'] == pytest.approx(0.05)
+    assert roses['revenue_per_click'] == pytest.approx(1500.0)
+    # Страница без поисковых данных остается с нулевыми метриками GSC
+    about = facts.loc['/about/']
+    assert about['clicks'] == 0 and about['ctr'] == 0
+    assert about['bounce_rate'] == pytest.approx(0.5)
+
+
+def test_run_survives_failing_source():
+    db = MagicMock()
+    db.fetch_all.return_value = [
+        {'page_url': 'https://cvety.kz/roses/', 'clicks': 20, 'impressions': 1000,
+         'weighted_position': 5000.0, 'queries': 12}
+    ]
+    metrika = MagicMock()
+    metrika.get_landing_pages.side_effect = RuntimeError('quota exceeded')
+    ga = MagicMock()
+    ga.get_landing_page_ecommerce.return_value = [
+        {'landing_page': '/roses/', 'sessions': 40, 'purchases': 2, 'revenue': 30000.0}
+    ]
+    builder = PageFactsBuilder(db, metrika=metrika, ga=ga)
+
+    with patch.object(builder, 'save') as save:
+        facts = builder.run(days=30, end_date=date(2024, 3, 31))
+
+    assert len(facts) == 1
+    roses = facts.iloc[0]
+    assert roses['page_path'] == '/roses/'
+    assert roses['visits'] == 0
+    assert roses['purchases'] == 2
+    save.assert_called_once()
+    assert save.call_args[0][1:] == (date(2024, 3, 2), date(2024, 3, 31))
+
+
+def test_page_analyzer_uses_stored_facts():
+    facts = {
+        '/roses/': {
+            'page_path': '/roses/', 'clicks': 20, 'impressions': 1000, 'ctr': 0.02,
+            'position': 5.0, 'visits': 50, 'bounce_rate': 0.2, 'goal_reaches': 4,
+            'sessions': 40, 'purchases': 2, 'revenue': 30000.0,
+            'conversion_rate': 0.05, 'revenue_per_click': 1500.0
+        }
+    }
+    analyzer = PageAnalyzer(None, facts=facts)
+
+    assert analyzer.get_page_facts('https://cvety.kz/roses/?utm=1') == facts['/roses/']
+    assert analyzer.get_page_facts('https://cvety.kz/unknown/') is None
+
+
+def test_page_analyzer_reads_facts_from_postgres():
+    # Клиент Supabase не выполняет SQL: факты читаются через PostgresClient
+    supabase = MagicMock(spec=['client'])
+    with patch('src.analytics.page_analysis.PostgresClient') as postgres:
+        postgres.return_value.fetch_all.return_value = [{'page_path': '/roses/', 'clicks': 20}]
+        analyzer = PageAnalyzer(supabase)
+
+        assert analyzer.get_page_facts('https://cvety.kz/roses/') == {
+            'page_path': '/roses/', 'clicks': 20
+        }
+    postgres.assert_called_once_with()
+
+
+def test_page_analyzer_uses_given_postgres_client():
+    db = MagicMock()
+    db.fetch_all.return_value = [{'page_path': '/roses/', 'clicks': 20}]
+
+    assert PageAnalyzer(db).get_page_facts('/roses/')['clicks'] == 20
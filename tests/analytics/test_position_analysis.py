@@ -43,3 +43,35 @@ class TestPositionAnalyzer:
         # Тест на стабильные позиции
         stable = [4, 5, 4, 5, 4]
         assert not analyzer._is_unstable(stable)
+        
+    def test_group_stats_matches_helpers(self, analyzer):
+        # Векторизованный расчет совпадает с поштучными проверками
+        df = pd.DataFrame({
+            'url': ['/a'] * 5 + ['/b'] * 4 + ['/c'] * 2 + ['/d'],
+            'query': ['розы'] * 5 + ['пионы'] * 4 + ['тюльпаны'] * 2 + ['букеты'],
+            'position': [40, 30, 20, 10, 5, 3, 4, 15, 16, 7, 7, 9]
+        })
+        
+        stats = analyzer._group_stats(df)
+        
+        for (url, query), group in df.groupby(['url', 'query']):
+            positions = group['position'].tolist()
+            row = stats.loc[(url, query)]
+            assert row['trend'] == pytest.approx(analyzer._calculate_trend(positions))
+            assert row['sudden_drop'] == analyzer._has_sudden_drop(positions)
+            assert row['unstable'] == analyzer._is_unstable(positions)
+            
+    def test_analyze_trends_and_problems(self, analyzer):
+        df = pd.DataFrame({
+            'url': ['/a'] * 4 + ['/b'] * 4,
+            'query': ['розы'] * 4 + ['пионы'] * 4,
+            'position': [40, 30, 20, 10, 3, 4, 15, 16]
+        })
+        
+        trends = analyzer._analyze_trends(df)
+        problems = analyzer._find_problems(df)
+        
+        assert trends['improving'] == [{'url': '/a', 'query': 'розы'}]
+        assert trends['stable'] == [{'url': '/b', 'query': 'пионы'}]
+        assert {'url': '/b', 'query': 'пионы', 'type': 'sudden_drop',
+                'details': 'Резкое падение позиций'} in problems
@@ -0,0 +1,76 @@
+"""
+Тесты для кластеризации поисковых запросов.
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from src.analytics.ml_models.query_clustering import QueryClusterer, get_topic_stats
+
+
+class TestQueryClusterer:
+    @pytest.fixture
+    def queries(self):
+        return [
+            'доставка цветов алматы', 'доставка цветов астана',
+            'доставка цветов в алматы', 'заказать доставку цветов',
+            'букет роз', 'букет из роз', 'букет роз купить', '101 роза букет',
+            'тюльпаны купить', 'купить тюльпаны алматы', 'тюльпаны оптом', 'тюльпаны цена',
+        ]
+
+    @pytest.fixture
+    def clusterer(self, queries):
+        return QueryClusterer(n_clusters=3).fit(queries)
+
+    def test_similar_queries_share_cluster(self, clusterer, queries):
+        assigned = clusterer.assign(queries).set_index('query')['cluster_id']
+
+        groups = [queries[:4], queries[4:8], queries[8:]]
+        for group in groups:
+            assert assigned[group].nunique() == 1
+        assert assigned[[group[0] for group in groups]].nunique() == 3
+
+    def test_clusters_are_described(self, clusterer):
+        assert clusterer.clusters['size'].sum() == 12
+        assert all(clusterer.clusters['label'] != '')
+
+    def test_assign_new_queries_without_refit(self, clusterer):
+        known = clusterer.assign(['букет роз', 'тюльпаны оптом'])['cluster_id'].tolist()
+
+        assigned = clusterer.assign(['Букет  розы', 'тюльпаны недорого', 'xyz qwerty'])
+
+        assert assigned['cluster_id'].tolist() == known + [QueryClusterer.UNASSIGNED]
+        assert assigned['query'].tolist()[0] == 'Букет  розы'
+
+    def test_serialization_roundtrip(self, clusterer, queries):
+        restored = QueryClusterer.from_bytes(clusterer.to_bytes())
+
+        assert restored.assign(queries).equals(clusterer.assign(queries))
+        assert restored.topic_labels() == clusterer.topic_labels()
+
+    def test_fitted_at_is_timezone_aware(self, clusterer):
+        # fitted_at хранится в колонке TIMESTAMP WITH TIME ZONE
+        assert clusterer.fitted_at.tzinfo is not None
+
+        restored = QueryClusterer.from_bytes(clusterer.to_bytes())
+        assert restored.fitted_at == clusterer.fitted_at
+
+    def test_fit_requires_queries(self):
+        with pytest.raises(ValueError):
+            QueryClusterer().fit(['букет'])
+
+
+def test_topic_stats_empty_without_model():
+    db = MagicMock()
+    db.fetch_one.return_value = {'model_id': None}
+
+    assert get_topic_stats(db, limit=5) == []
+    db.fetch_all.assert_not_called()
+
+
+def test_topic_stats_use_latest_model():
+    db = MagicMock()
+    db.fetch_one.return_value = {'model_id': 7}
+    db.fetch_all.return_value = [{'topic': 'розы', 'impressions': 100}]
+
+    assert get_topic_stats(db, limit=5) == [{'topic': 'розы', 'impressions': 100}]
+    assert db.fetch_all.call_args[0][1][1:] == (7, 5)
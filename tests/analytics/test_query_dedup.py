@@ -0,0 +1,57 @@
+"""
+Тесты для поиска почти одинаковых запросов.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics.query_dedup import QueryDeduplicator
+
+
+class TestQueryDeduplicator:
+    @pytest.fixture
+    def dedup(self):
+        return QueryDeduplicator()
+
+    def test_signature_estimates_jaccard(self, dedup):
+        a, b = 'доставка цветов алматы', 'доставка цветов астана'
+        sa, sb = dedup.shingles(a), dedup.shingles(b)
+        exact = len(sa & sb) / len(sa | sb)
+
+        signatures = QueryDeduplicator(num_perm=512, bands=64).signatures([a, b])
+        estimate = (signatures[0] == signatures[1]).mean()
+
+        assert abs(estimate - exact) < 0.1
+
+    def test_variants_are_grouped(self, dedup):
+        groups = dedup.groups([
+            'доставка цветов алматы',
+            'цветы доставка алматы',
+            'доставка цвтов алматы',
+            'букет роз',
+            'розы букет',
+            'купить тюльпаны',
+            '',
+            '!!!',
+        ])
+
+        assert groups[0] == groups[1] == groups[2]
+        assert groups[3] == groups[4]
+        assert len({groups[0], groups[3], groups[5], groups[6], groups[7]}) == 5
+
+    def test_similar_pairs_are_unique_and_ordered(self, dedup):
+        signatures = dedup.signatures(['букет роз', 'розы букет', 'букет роз', 'тюльпаны'])
+        pairs = dedup.similar_pairs(signatures)
+
+        assert pairs.tolist() == [[0, 1], [0, 2], [1, 2]]
+
+    def test_canonical_is_most_shown_variant_per_city(self, dedup):
+        df = pd.DataFrame({
+            'id': [1, 2, 3, 4, 5],
+            'query': ['букет роз', 'розы букет', 'букет роз', 'розы букет', 'тюльпаны'],
+            'city_id': [1, 1, 2, 2, None],
+            'impressions': [10, 50, 30, np.nan, 5],
+        })
+
+        result = dedup.canonicalize(df).set_index('id')['canonical_id']
+
+        assert result.to_dict() == {1: 2, 2: 2, 3: 3, 4: 3, 5: 5}
@@ -0,0 +1,147 @@
+"""
+Тесты для пакетной оценки сезонности.
+"""
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics.seasonality import SeasonalityEngine, autocorrelation, load_seasonality
+
+
+@pytest.fixture
+def engine():
+    return SeasonalityEngine(min_impressions=10)
+
+
+def test_autocorrelation_matches_direct_formula():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(3, 50))
+
+    result = autocorrelation(values, 10)
+
+    centered = values[0] - values[0].mean()
+    expected = (np.dot(centered[:-7], centered[7:]) / 43) / (np.dot(centered, centered) / 50)
+    assert result[0, 7] == pytest.approx(expected)
+    np.testing.assert_allclose(result[:, 0], 1.0)
+    # Постоянный ряд не дает деления на ноль
+    assert (autocorrelation(np.ones((1, 20)), 5) == 0).all()
+
+
+def test_score_separates_patterns(engine):
+    rng = np.random.default_rng(1)
+    days = 730
+    t = np.arange(days)
+    start = date(2023, 1, 2)
+    flat = 50 + rng.normal(0, 2, days)
+    weekly = 50 + 20 * np.array([1, 1, 1, 1, 0, -1, -1])[t % 7] + rng.normal(0, 2, days)
+    # Всплеск показов каждый год в начале марта
+    holiday = 20 + rng.normal(0, 2, days)
+    for year in (2023, 2024):
+        peak = (date(year, 3, 8) - start).days
+        holiday[peak - 6:peak + 1] += 500
+
+    result = engine.score(np.vstack([flat, weekly, holiday]), start)
+
+    assert result.loc[1, 'weekly_strength'] > 0.8
+    assert result.loc[0, 'weekly_strength'] < 0.3
+    assert result.loc[2, 'yearly_strength'] > 0.5
+    assert result.loc[2, 'peak_strength'] > 0.9
+    assert abs((result.loc[2, 'peak_date'] - date(2024, 3, 8)).days) <= 7
+    assert result['is_seasonal'].tolist() == [False, False, True]
+
+
+def test_short_history_has_no_yearly_strength(engine):
+    result = engine.score(np.ones((2, 60)), date(2024, 1, 1))
+
+    assert result['yearly_strength'].isna().all()
+    assert (result['peak_strength'] == 0).all()
+    assert not result['is_seasonal'].any()
+
+
+def test_flat_low_volume_query_is_not_seasonal(engine):
+    # Около 0.8 показа в день: случайные недели не должны считаться пиками
+    rng = np.random.default_rng(3)
+    values = rng.poisson(0.8, size=(5, 730))
+
+    result = engine.score(values, date(2023, 1, 2))
+
+    assert (result['peak_strength'] < 0.3).all()
+    assert not result['is_seasonal'].any()
+
+
+def test_new_query_ignores_weeks_before_first_day(engine):
+    start = date(2023, 1, 2)
+    facts = pd.DataFrame({
+        'query': ['новый'] * 30,
+        'date': [start + timedelta(days=700 + i) for i in range(30)],
+        'impressions': [20] * 30
+    })
+
+    result = engine.score_facts(facts, start, start + timedelta(days=729))
+
+    row = result.iloc[0]
+    assert row['days'] == 30
+    assert row['peak_strength'] == 0
+    assert np.isnan(row['yearly_strength'])
+    assert not row['is_seasonal']
+
+
+def test_sparse_query_needs_enough_nonzero_weeks(engine):
+    # Показы только в трех неделях года: медиана нулевая, но пика не хватает недель
+    values = np.zeros((1, 365))
+    values[0, [100, 200, 300]] = 50
+
+    result = engine.score(values, date(2024, 1, 1))
+
+    assert result.loc[0, 'peak_strength'] == 0
+
+
+def test_score_facts_builds_dense_matrix(engine):
+    start = date(2024, 1, 1)
+    end = start + timedelta(days=99)
+    facts = pd.DataFrame({
+        'query': ['цветы'] * 100 + ['розы'] * 2 + ['редкий'],
+        'date': [start + timedelta(days=i) for i in range(100)]
+        + [start + timedelta(days=50), start + timedelta(days=90), start],
+        'impressions': [10] * 100 + [300, 5, 1]
+    })
+
+    result = engine.score_facts(facts, start, end)
+
+    assert set(result['query']) == {'цветы', 'розы'}
+    assert list(result.columns) == SeasonalityEngine.COLUMNS
+    roses = result.set_index('query').loc['розы']
+    assert roses['impressions'] == 305
+    assert roses['days'] == 50
+    # Недели выровнены по последнему дню: день 50 - последний день своей недели
+    assert roses['peak_date'] == start + timedelta(days=50)
+
+
+def test_score_facts_chunks_give_same_result():
+    rng = np.random.default_rng(2)
+    start = date(2024, 1, 1)
+    facts = pd.DataFrame({
+        'query': np.repeat([f'q{i}' for i in range(7)], 70),
+        'date': [start + timedelta(days=i) for i in range(70)] * 7,
+        'impressions': rng.integers(0, 100, 7 * 70)
+    })
+    end = start + timedelta(days=69)
+
+    whole = SeasonalityEngine(min_impressions=1).score_facts(facts, start, end)
+    chunked = SeasonalityEngine(min_impressions=1, chunk_size=3).score_facts(facts, start, end)
+
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_load_seasonality():
+    db = MagicMock()
+    db.fetch_all.return_value = [
+        {'query': 'цветы на 8 марта', 'is_seasonal': True, 'seasonality_score': 0.9}
+    ]
+
+    result = load_seasonality(db, ['цветы на 8 марта', 'розы'])
+
+    assert result == {'цветы на 8 марта': (True, 0.9)}
+    assert db.fetch_all.call_args[0][1] == (['цветы на 8 марта', 'розы'],)
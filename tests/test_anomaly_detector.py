@@ -0,0 +1,124 @@
+"""Тесты для потокового детектора аномалий."""
+
+import unittest
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.anomaly_detector import StreamingAnomalyDetector
+
+
+class TestStreamingAnomalyDetector(unittest.TestCase):
+    """Тесты для StreamingAnomalyDetector.step."""
+
+    def setUp(self):
+        """Детектор без подключения к базе."""
+        self.detector = StreamingAnomalyDetector(MagicMock(), alpha=0.2, threshold=3.0, warmup=5)
+        self.start = date(2024, 9, 1)
+        self.state = pd.DataFrame(columns=StreamingAnomalyDetector.STATE_COLUMNS)
+
+    def feed(self, values):
+        """Последовательная подача дневных значений кликов для одного запроса."""
+        anomalies = []
+        for i, clicks in enumerate(values):
+            observations = pd.DataFrame({
+                'query': ['розы'],
+                'city_id': [1],
+                'clicks': [clicks],
+                'impressions': [100],
+                'position': [5.0],
+                'ctr': [clicks / 100]
+            })
+            new_state, found = self.detector.step(
+                self.state, observations, self.start + timedelta(days=i)
+            )
+            kept = self.state[~self.state['metric'].isin(new_state['metric'])]
+            self.state = new_state if kept.empty else pd.concat([kept, new_state])
+            anomalies.append(found)
+        return pd.concat(anomalies, ignore_index=True)
+
+    def test_ewma_matches_pandas(self):
+        """Среднее совпадает с pandas ewm(adjust=False)."""
+        values = [10, 12, 9, 11, 14, 10, 13]
+        self.feed(values)
+
+        clicks = self.state[self.state['metric'] == 'clicks'].iloc[0]
+        expected = pd.Series(values, dtype=float).ewm(alpha=0.2, adjust=False).mean().iloc[-1]
+        self.assertAlmostEqual(clicks['mean'], expected)
+        self.assertEqual(clicks['n'], len(values))
+
+    def test_spike_is_reported(self):
+        """Резкий скачок после периода прогрева попадает в аномалии."""
+        anomalies = self.feed([10, 11, 10, 9, 10, 11, 10, 60])
+
+        self.assertEqual(anomalies['metric_type'].tolist(), ['clicks', 'ctr'])
+        spike = anomalies.iloc[0]
+        self.assertEqual(spike['date'], self.start + timedelta(days=7))
+        self.assertEqual(spike['actual_value'], 60)
+        self.assertGreater(spike['deviation_percent'], 400)
+
+    def test_no_anomalies_during_warmup(self):
+        """До окончания прогрева аномалии не ищутся."""
+        anomalies = self.feed([10, 10, 100])
+        self.assertTrue(anomalies.empty)
+
+    def test_reprocessing_day_is_ignored(self):
+        """Повторная обработка уже учтенного дня не меняет состояние."""
+        self.feed([10, 11, 12])
+        observations = pd.DataFrame({
+            'query': ['розы'], 'city_id': [1], 'clicks': [500], 'impressions': [100],
+            'position': [5.0], 'ctr': [5.0]
+        })
+
+        new_state, anomalies = self.detector.step(
+            self.state, observations, self.start + timedelta(days=2)
+        )
+
+        self.assertTrue(new_state.empty)
+        self.assertTrue(anomalies.empty)
+
+    def test_process_date_keys_series_by_query_and_city(self):
+        """Ряды продолжаются между днями по запросу и городу."""
+        db = MagicMock()
+        detector = StreamingAnomalyDetector(db, alpha=0.2, threshold=3.0, warmup=5)
+        state = []
+
+        def fetch_all(sql, params):
+            if 'FROM search_queries_daily' in sql:
+                day = params[0]
+                clicks = 60 if day == self.start + timedelta(days=7) else 10
+                return [
+                    {'query': 'розы', 'city_id': 1, 'clicks': clicks,
+                     'impressions': 100, 'position': 5.0, 'ctr': clicks / 100},
+                    {'query': 'розы', 'city_id': 0, 'clicks': 10,
+                     'impressions': 100, 'position': 5.0, 'ctr': 0.1},
+                ]
+            return state
+
+        def save(new_state, anomalies):
+            updated = set(zip(new_state['query'], new_state['city_id'], new_state['metric']))
+            state[:] = [
+                row for row in state
+                if (row['query'], row['city_id'], row['metric']) not in updated
+            ] + new_state.to_dict('records')
+            found.append(anomalies)
+
+        found = []
+        db.fetch_all.side_effect = fetch_all
+        detector._save = save
+        for i in range(8):
+            detector.process_date(self.start + timedelta(days=i))
+
+        sql = [call.args[0] for call in db.fetch_all.call_args_list]
+        self.assertTrue(all('daily_metrics' not in query for query in sql))
+        self.assertEqual(len(state), 8)
+        self.assertTrue(all(row['n'] == 8 for row in state))
+        anomalies = pd.concat(found, ignore_index=True)
+        self.assertEqual(anomalies['metric_type'].tolist(), ['clicks', 'ctr'])
+        self.assertEqual(set(anomalies['city_id']), {1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Тесты для маршрутизатора категорий страниц."""
+
+import unittest
+
+import pandas as pd
+
+from src.reports.category_router import PageCategoryRouter, category_router
+
+
+class TestPageCategoryRouter(unittest.TestCase):
+    """Тесты для класса PageCategoryRouter."""
+
+    def test_categorize_paths_and_urls(self):
+        """Тест определения категории по пути и полному URL."""
+        test_cases = [
+            ('/product/123', 'Товары'),
+            ('/category/flowers', 'Категории'),
+            ('/blog/post-1', 'Блог'),
+            ('/about', 'Прочее'),
+            ('/', 'Прочее'),
+            ('https://cvety.kz/product/123?utm=1', 'Товары'),
+            ('https://cvety.kz/category/', 'Категории'),
+            ('https://cvety.kz', 'Прочее'),
+        ]
+
+        for url, expected in test_cases:
+            self.assertEqual(category_router.categorize(url), expected, url)
+
+    def test_first_matching_category_wins(self):
+        """Тест порядка категорий при пересекающихся шаблонах."""
+        router = PageCategoryRouter({
+            'sale': {'name': 'Акции', 'pattern': r'^/product/sale-'},
+            'product': {'name': 'Товары', 'pattern': r'^/product/'},
+            'other': {'name': 'Прочее', 'pattern': r'.*'},
+        })
+
+        self.assertEqual(router.categorize('/product/sale-roses'), 'Акции')
+        self.assertEqual(router.categorize('/product/roses'), 'Товары')
+
+    def test_categorize_series_matches_scalar(self):
+        """Тест векторизованного определения категорий."""
+        pages = pd.Series(
+            ['/product/1', '/blog/a', None, '/product/1', 'https://cvety.kz/x'],
+            index=[10, 11, 12, 13, 14]
+        )
+
+        result = category_router.categorize_series(pages)
+
+        self.assertEqual(list(result.index), [10, 11, 12, 13, 14])
+        self.assertEqual(
+            list(result),
+            ['Товары', 'Блог', 'Прочее', 'Товары', 'Прочее']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
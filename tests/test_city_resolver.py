@@ -0,0 +1,64 @@
+"""Тесты для определения города по URL и запросу."""
+
+import unittest
+
+from src.utils.city_resolver import BLOG, GENERAL, CityResolver, PrefixTrie
+
+
+class TestPrefixTrie(unittest.TestCase):
+    """Тесты для PrefixTrie."""
+
+    def test_longest_prefix(self):
+        """Выбирается самый длинный подходящий префикс."""
+        trie = PrefixTrie()
+        trie.insert('a/', 1)
+        trie.insert('a/b/', 2)
+
+        self.assertEqual(trie.longest_prefix('a/b/c'), 2)
+        self.assertEqual(trie.longest_prefix('a/c'), 1)
+        self.assertIsNone(trie.longest_prefix('b/'))
+
+
+class TestCityResolver(unittest.TestCase):
+    """Тесты для CityResolver."""
+
+    def setUp(self):
+        """Общий резолвер."""
+        self.resolver = CityResolver()
+
+    def test_page_city_label(self):
+        """Значения колонки city совпадают с прежним разбором URL."""
+        self.assertEqual(self.resolver.page_city_label('https://cvety.kz/almaty/roses/'), 'алматы')
+        self.assertEqual(self.resolver.page_city_label('https://cvety.kz/astana/'), 'астана')
+        self.assertEqual(self.resolver.page_city_label('https://blog.cvety.kz/almaty/post'), BLOG)
+        self.assertEqual(self.resolver.page_city_label('https://cvety.kz/blog/post'), BLOG)
+        self.assertEqual(self.resolver.page_city_label('https://cvety.kz/catalog/'), GENERAL)
+        # Префикс должен совпадать с сегментом пути целиком
+        self.assertEqual(self.resolver.page_city_label('https://cvety.kz/almatyroses/'), GENERAL)
+
+    def test_resolve_query_aliases(self):
+        """Кириллица, латиница и старые названия."""
+        self.assertEqual(self.resolver.resolve_query('доставка цветов нур-султан').slug, 'astana')
+        self.assertEqual(self.resolver.resolve_query('Flowers Almaty').name, 'Алматы')
+        self.assertEqual(self.resolver.resolve_query('цветы усть-каменогорск').slug, 'ust-kamenogorsk')
+        self.assertIsNone(self.resolver.resolve_query('купить розы'))
+
+    def test_resolve_query_word_forms(self):
+        """Падежные формы названия, но не другие слова с той же основой."""
+        self.assertEqual(self.resolver.resolve_query('цветы в астане').slug, 'astana')
+        self.assertEqual(self.resolver.resolve_query('доставка из караганды').slug, 'karaganda')
+        self.assertEqual(self.resolver.resolve_query('розы в семее').slug, 'semey')
+        self.assertEqual(self.resolver.resolve_query('букеты шымкенте').slug, 'shymkent')
+        self.assertIsNone(self.resolver.resolve_query('семейный букет'))
+        self.assertIsNone(self.resolver.resolve_query('almatyroses'))
+
+    def test_resolve_prefers_page(self):
+        """Город страницы важнее города в запросе."""
+        city = self.resolver.resolve('цветы астана', 'https://cvety.kz/almaty/')
+        self.assertEqual(city.slug, 'almaty')
+        city = self.resolver.resolve('цветы астана', 'https://cvety.kz/catalog/')
+        self.assertEqual(city.slug, 'astana')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Тесты для сохранения ежедневной статистики."""
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from src.scripts.collect_daily_stats import save_daily_stats
+
+
+class TestSaveDailyStats(unittest.TestCase):
+    """Тесты для save_daily_stats."""
+
+    @patch('src.scripts.collect_daily_stats.get_city_ids', return_value={})
+    @patch('psycopg2.connect')
+    def test_keeps_every_page_of_query(self, connect, get_city_ids):
+        """Страницы одного запроса сохраняются отдельными строками."""
+        cursor = connect.return_value.cursor.return_value
+        stats = {'rows': [
+            {'keys': ['https://cvety.kz/roses/', 'розы', '2024-09-02'],
+             'clicks': 5, 'impressions': 50, 'position': 3.0},
+            {'keys': ['https://cvety.kz/', 'розы', '2024-09-02'],
+             'clicks': 2, 'impressions': 40, 'position': 8.0},
+        ]}
+
+        save_daily_stats(stats, date(2024, 9, 2))
+
+        statements = [call.args for call in cursor.execute.call_args_list]
+        self.assertEqual(len(statements), 2)
+        for sql, _ in statements:
+            self.assertIn('page_url', sql)
+            self.assertIn('ON CONFLICT (date, query, city, page_url)', sql)
+            # Повторная загрузка дня отмечается для инкрементальных расчетов
+            self.assertIn('updated_at = CURRENT_TIMESTAMP', sql)
+        self.assertEqual(
+            [params[-1] for _, params in statements],
+            ['https://cvety.kz/roses/', 'https://cvety.kz/']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
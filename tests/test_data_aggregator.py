@@ -0,0 +1,76 @@
+"""Тесты для пакетного расчета трендов в DataAggregator."""
+
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src.data_aggregator import DataAggregator
+
+
+class TestDataAggregatorTrends(unittest.TestCase):
+    """Тесты для DataAggregator._compute_trends."""
+
+    def setUp(self):
+        """Подготовка тестовых рядов для нескольких запросов."""
+        rng = np.random.default_rng(42)
+        start = date(2024, 9, 1)
+        rows = []
+        for query_id, length in [(1, 30), (2, 12), (3, 5)]:
+            for i in range(length):
+                rows.append({
+                    'query_id': query_id,
+                    'date': start + timedelta(days=i),
+                    'position': 20 - 0.3 * i * query_id + rng.normal(),
+                    'clicks': 5 + i + rng.integers(0, 3),
+                    'impressions': 100 + rng.integers(0, 50),
+                    'ctr': rng.random() / 10
+                })
+        self.data = pd.DataFrame(rows)
+
+    def test_matches_linregress(self):
+        """Тест совпадения с поштучным расчетом через linregress."""
+        trends = DataAggregator._compute_trends(self.data)
+
+        self.assertEqual(len(trends), 3 * 4)
+
+        for (query_id, metric), row in trends.set_index(['query_id', 'metric']).iterrows():
+            series = self.data[self.data['query_id'] == query_id][metric].astype(float)
+            expected = stats.linregress(np.arange(len(series)), series.values)
+
+            self.assertAlmostEqual(row['slope'], expected.slope, places=8)
+            self.assertAlmostEqual(row['p_value'], expected.pvalue, places=8)
+            self.assertAlmostEqual(row['r_squared'], expected.rvalue ** 2, places=8)
+            self.assertAlmostEqual(row['mean'], series.mean(), places=8)
+            self.assertAlmostEqual(row['std'], series.std(), places=8)
+            self.assertEqual(
+                row['direction'],
+                DataAggregator._trend_direction(metric, expected.slope, expected.pvalue)
+            )
+
+    def test_constant_series(self):
+        """Тест ряда без изменений."""
+        data = pd.DataFrame({
+            'query_id': [7] * 4,
+            'date': [date(2024, 9, d) for d in range(1, 5)],
+            'position': [5.0] * 4
+        })
+
+        trends = DataAggregator._compute_trends(data, metrics=['position'])
+
+        row = trends.iloc[0]
+        self.assertEqual(row['slope'], 0.0)
+        self.assertEqual(row['direction'], 'neutral')
+        self.assertEqual(row['std'], 0.0)
+
+    def test_empty(self):
+        """Тест пустых данных."""
+        trends = DataAggregator._compute_trends(pd.DataFrame())
+        self.assertTrue(trends.empty)
+        self.assertIn('p_value', trends.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Тесты для сохранения данных Search Console."""
+
+import unittest
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+from src.scripts.fetch_search_data import save_to_database
+
+
+class TestSaveToDatabase(unittest.TestCase):
+    """Тесты для save_to_database."""
+
+    @patch('src.scripts.fetch_search_data.get_city_ids', return_value={'almaty': 1})
+    def test_refreshes_derived_tables(self, get_city_ids):
+        """Загруженные строки попадают в сводки и изменения позиций до фиксации."""
+        db = MagicMock()
+        connection = db.get_connection.return_value.__enter__.return_value
+        cursor = connection.cursor.return_value.__enter__.return_value
+        data = [
+            {'keys': ['цветы алматы', '/almaty/'], 'position': 3.0,
+             'clicks': 5, 'impressions': 50, 'ctr': 0.1},
+            {'keys': ['семейный букет', '/'], 'position': 7.0,
+             'clicks': 1, 'impressions': 20, 'ctr': 0.05},
+        ]
+
+        save_to_database(db, data, datetime(2024, 9, 2, 12, 0))
+
+        written = [
+            ('цветы алматы', 1, date(2024, 9, 2)),
+            ('семейный букет', None, date(2024, 9, 2)),
+        ]
+        db.refresh_city_rollup.assert_called_once_with(cursor, written)
+        db.record_position_changes.assert_called_once_with(cursor, written)
+        connection.commit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -133,5 +133,125 @@ class TestEnhancedPositionAnalyzer(unittest.TestCase):
         self.assertEqual(summary['min_change_threshold'], 3.0)
         self.assertEqual(summary['query_type_filter'], 'informational')
 
+    def _mock_cursor(self, rows):
+        """Настройка мока соединения, возвращающего строки rows."""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = rows
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        self.db_client.get_connection.return_value.__enter__.return_value = conn
+        return cursor
+    
+    def test_analyze_seasonality_batch(self):
+        """Тест пакетного анализа сезонности с кэшированием."""
+        week_1 = datetime(2024, 1, 1)
+        week_2 = datetime(2024, 1, 8)
+        cursor = self._mock_cursor([
+            ('розы', 'almaty', week_1, 100.0),
+            ('розы', 'almaty', week_2, 300.0),
+            ('пионы', 'astana', week_1, 100.0),
+            ('пионы', 'astana', week_2, 110.0),
+        ])
+        pairs = [('розы', 'almaty'), ('пионы', 'astana'), ('тюльпаны', 'almaty')]
+        current_date = datetime(2024, 3, 6)
+        
+        result = self.analyzer._analyze_seasonality_batch(pairs, current_date)
+        
+        self.assertTrue(result[('розы', 'almaty')][0])
+        self.assertFalse(result[('пионы', 'astana')][0])
+        self.assertEqual(result[('тюльпаны', 'almaty')], (False, 0.0))
+        cursor.execute.assert_called_once()
+        
+        # Повторный запрос в той же неделе берется из кэша
+        cached = self.analyzer._analyze_seasonality_batch(
+            pairs, current_date + timedelta(days=1)
+        )
+        self.assertEqual(cached, result)
+        cursor.execute.assert_called_once()
+
+    def test_analyze_seasonality_batch_uses_stored_scores(self):
+        """Тест использования сохраненных оценок пакетного расчета сезонности."""
+        self.db_client.fetch_all.return_value = [
+            {'query': 'розы', 'is_seasonal': True, 'seasonality_score': 0.8}
+        ]
+        cursor = self._mock_cursor([
+            ('пионы', 'astana', datetime(2024, 1, 1), 100.0),
+            ('пионы', 'astana', datetime(2024, 1, 8), 110.0),
+        ])
+        pairs = [('розы', 'almaty'), ('розы', None), ('пионы', 'astana')]
+
+        result = self.analyzer._analyze_seasonality_batch(pairs, datetime(2024, 3, 6))
+
+        self.assertEqual(result[('розы', 'almaty')], (True, 0.8))
+        self.assertEqual(result[('розы', None)], (True, 0.8))
+        self.assertFalse(result[('пионы', 'astana')][0])
+        # Запасной расчет по недельным показам выполняется только для пионов
+        self.assertEqual(cursor.execute.call_args[0][1][0], ['пионы'])
+
+    def test_get_competitors(self):
+        """Тест пакетного поиска конкурентов одним запросом."""
+        cursor = self._mock_cursor([
+            ('розы', 'https://cvety.kz/almaty/roses', 'almaty', 'https://cvety.kz/almaty/'),
+            ('розы', 'https://cvety.kz/almaty/roses', 'almaty', 'https://cvety.kz/'),
+            ('пионы', 'https://cvety.kz/peonies', '', 'https://cvety.kz/'),
+        ])
+        changes = [
+            ('розы', 'https://cvety.kz/almaty/roses', 'almaty'),
+            ('пионы', 'https://cvety.kz/peonies', None),
+            ('тюльпаны', 'https://cvety.kz/tulips', 'astana'),
+        ]
+        
+        result = self.analyzer.get_competitors(
+            changes, datetime(2024, 3, 1), datetime(2024, 3, 8)
+        )
+        
+        self.assertEqual(
+            result[changes[0]],
+            ['https://cvety.kz/almaty/', 'https://cvety.kz/']
+        )
+        self.assertEqual(result[changes[1]], ['https://cvety.kz/'])
+        self.assertNotIn(changes[2], result)
+        cursor.execute.assert_called_once()
+        
+        # Параметры передаются массивами, а не подставляются в текст запроса
+        params = cursor.execute.call_args[0][1]
+        self.assertEqual(params[0], ['розы', 'пионы', 'тюльпаны'])
+        self.assertEqual(params[2], ['almaty', '', 'astana'])
+
+    def test_analyze_positions_single_fetch(self):
+        """Тест анализа нескольких периодов по одной выборке."""
+        today = datetime.now().date()
+        week_ago = today - timedelta(days=7)
+        month_ago = today - timedelta(days=30)
+        url = 'https://cvety.kz/almaty/roses'
+        cursor = self._mock_cursor([
+            ('розы', url, 'almaty', 12.0, 100, 5, 'flowers', month_ago),
+            ('розы', url, 'almaty', 8.0, 150, 8, 'flowers', week_ago),
+            ('розы', url, 'almaty', 4.0, 200, 20, 'flowers', today),
+            ('пионы', url, 'almaty', 5.0, 80, 4, 'flowers', week_ago),
+            ('пионы', url, 'almaty', 6.0, 90, 3, 'flowers', today),
+        ])
+        
+        result = self.analyzer.analyze_positions(
+            days=[7, 30],
+            min_change=3.0,
+            include_seasonality=False,
+            include_competitors=False
+        )
+        
+        cursor.execute.assert_called_once()
+        
+        week = result['periods'][7]
+        self.assertEqual(week['stats'].total_queries, 2)
+        self.assertEqual(week['stats'].significant_changes, 1)
+        self.assertEqual(week['changes'][0].query, 'розы')
+        self.assertEqual(week['changes'][0].change, 4.0)
+        self.assertEqual(week['changes'][0].clicks_change, 12)
+        
+        month = result['periods'][30]
+        self.assertEqual(month['stats'].total_queries, 1)
+        self.assertEqual(month['changes'][0].change, 8.0)
+        self.assertEqual(month['stats'].improved_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,125 @@
+"""Тесты для пересчетов, выполняемых при загрузке метрик."""
+
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from src.database.postgres_client import PostgresClient
+
+
+class TestRecordPositionChanges(unittest.TestCase):
+    """Тесты для PostgresClient.record_position_changes."""
+
+    def setUp(self):
+        """Клиент с замоканным соединением."""
+        self.client = PostgresClient()
+        self.cursor = MagicMock()
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = self.cursor
+        self.client.get_connection = MagicMock()
+        self.client.get_connection.return_value.__enter__.return_value = connection
+
+    def _load(self, day, query_id, position, history):
+        """Загрузка одного дня: search_queries выдает новый id для каждого дня."""
+        self.cursor.fetchone.return_value = (1,)
+        self.cursor.fetchall.side_effect = [
+            [(query_id, 'розы', 1)],
+            history + [(query_id, 'розы', 1, day, position)],
+        ]
+        self.client.insert_daily_metrics([
+            {'date': day, 'query': 'розы', 'clicks': 1, 'impressions': 10,
+             'ctr': 0.1, 'position': position, 'url': '/', 'city': 'алматы'}
+        ])
+        return [(query_id, 'розы', 1, day, position)]
+
+    @staticmethod
+    def _position_changes(execute_values):
+        return [
+            row
+            for call in execute_values.call_args_list
+            if 'INSERT INTO position_changes' in call.args[1]
+            for row in call.args[2]
+        ]
+
+    @patch('src.database.postgres_client.execute_values')
+    def test_consecutive_days_record_change(self, execute_values):
+        """Изменение позиции между соседними днями записывается."""
+        history = self._load(date(2024, 9, 1), 10, 8.0, [])
+        self.assertEqual(self._position_changes(execute_values), [])
+
+        self._load(date(2024, 9, 2), 11, 5.0, history)
+
+        # Строки разных дней сопоставляются по запросу и городу, а не по id
+        self.assertEqual(
+            self._position_changes(execute_values),
+            [(11, date(2024, 9, 2), 'day', 8.0, 5.0, 3.0, 37.5)]
+        )
+        statements = [call.args[0] for call in self.cursor.execute.call_args_list]
+        self.assertTrue(any('DELETE FROM position_changes' in sql for sql in statements))
+
+    @patch('src.database.postgres_client.execute_values')
+    def test_late_day_recomputes_later_changes(self, execute_values):
+        """Загрузка прошлого дня пересчитывает изменения последующих дней."""
+        self.cursor.fetchall.return_value = [
+            (10, 'розы', None, date(2024, 9, 1), 8.0),
+            (11, 'розы', None, date(2024, 9, 2), 5.0),
+            (17, 'розы', None, date(2024, 9, 8), 4.5),
+        ]
+
+        self.client.record_position_changes(self.cursor, [('розы', None, date(2024, 9, 1))])
+
+        # Позиции читаются из search_queries по запросу и городу
+        sql, params = self.cursor.execute.call_args_list[0].args
+        self.assertIn('FROM unnest', sql)
+        self.assertEqual((params['queries'], params['city_ids']), (['розы'], [None]))
+
+        self.assertEqual(self._position_changes(execute_values), [
+            (11, date(2024, 9, 2), 'day', 8.0, 5.0, 3.0, 37.5),
+            (17, date(2024, 9, 8), 'week', 8.0, 4.5, 3.5, 43.75),
+        ])
+        query_ids, dates, periods = self.cursor.execute.call_args_list[-1].args[1]
+        self.assertEqual(
+            list(zip(query_ids, dates, periods)),
+            [
+                (10, date(2024, 9, 1), 'day'),
+                (10, date(2024, 9, 1), 'week'),
+                (11, date(2024, 9, 2), 'day'),
+                (17, date(2024, 9, 8), 'week'),
+            ]
+        )
+
+    @patch('src.database.postgres_client.execute_values')
+    def test_refresh_city_rollup(self, execute_values):
+        """Сводка по городам пересчитывается для затронутых пар (город, день)."""
+        self.client.refresh_city_rollup(self.cursor, [
+            ('розы', 1, date(2024, 9, 2)),
+            ('розы', 1, date(2024, 9, 1)),
+            ('пионы', None, date(2024, 9, 2)),
+        ])
+
+        statements = [call.args[0] for call in self.cursor.execute.call_args_list]
+        self.assertIn('DELETE FROM city_daily_stats', statements[0])
+        self.assertIn('INSERT INTO city_daily_stats', statements[1])
+
+        params = self.cursor.execute.call_args_list[-1].args[1]
+        # Строки без города относятся к city_id 0
+        self.assertEqual(params['city_ids'], [0, 1, 1])
+        self.assertEqual(
+            params['dates'],
+            [date(2024, 9, 2), date(2024, 9, 1), date(2024, 9, 2)]
+        )
+
+        activity = execute_values.call_args.args[2]
+        self.assertCountEqual(activity, [
+            (1, 'розы', date(2024, 9, 2)),
+            (0, 'пионы', date(2024, 9, 2)),
+        ])
+
+    def test_no_pairs_no_queries(self):
+        """Без записанных строк запросы не выполняются."""
+        self.client.record_position_changes(self.cursor, [])
+        self.cursor.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
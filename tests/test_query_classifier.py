@@ -0,0 +1,62 @@
+"""Тесты для общего классификатора поисковых запросов."""
+
+import unittest
+
+import pandas as pd
+
+from src.utils.query_classifier import (
+    KeywordClassifier,
+    QUERY_TYPE_CLASSIFIER,
+    get_query_category,
+    get_query_type,
+    is_branded_query
+)
+
+
+class TestKeywordClassifier(unittest.TestCase):
+    """Тесты для KeywordClassifier."""
+
+    def test_rule_priority(self):
+        """Побеждает первое правило с совпадением, а не первое вхождение в строке."""
+        self.assertEqual(get_query_type('розы купить'), 'коммерческий')
+        self.assertEqual(get_query_type('доставка цветы кз'), 'брендовый')
+        self.assertEqual(get_query_type('где купить пионы'), 'коммерческий')
+        self.assertEqual(get_query_type('Доставка роз'), 'доставка')
+        self.assertEqual(get_query_type('тюльпаны'), 'типы_цветов')
+        self.assertEqual(get_query_type('букет невесты'), 'прочее')
+
+    def test_overlapping_keywords(self):
+        """Короткое ключевое слово внутри длинного другого правила тоже находится."""
+        classifier = KeywordClassifier([
+            ('short', ['цветы']),
+            ('long', ['цветы кз'])
+        ], default='none')
+
+        self.assertEqual(classifier.classify('цветы кз'), 'short')
+        self.assertEqual(classifier.labels('цветы кз'), ['short', 'long'])
+
+    def test_categories_and_brand(self):
+        """Категории для search_queries и брендовые запросы."""
+        self.assertEqual(get_query_category('заказать букет'), 'delivery')
+        self.assertEqual(get_query_category('подарок маме'), 'gifts')
+        self.assertEqual(get_query_category('мыло'), 'other')
+        self.assertTrue(is_branded_query('CvetyKZ отзывы'))
+        self.assertFalse(is_branded_query('цветы алматы'))
+
+    def test_classify_series_matches_scalar(self):
+        """Векторизованный путь совпадает с поштучной классификацией."""
+        queries = pd.Series(
+            ['купить розы', 'доставка', None, 'как ухаживать', 'купить розы', 'мыло'],
+            index=[5, 5, 7, 8, 9, 10]
+        )
+
+        result = QUERY_TYPE_CLASSIFIER.classify_series(queries)
+
+        self.assertEqual(list(result.index), [5, 5, 7, 8, 9, 10])
+        self.assertEqual(result.tolist(), [
+            'коммерческий', 'доставка', 'прочее', 'информационный', 'коммерческий', 'прочее'
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Тесты для генератора ежедневного отчета."""
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from src.analytics.report_generator import ReportGenerator
+
+
+class TestReportGenerator(unittest.TestCase):
+    """Тесты для ReportGenerator."""
+
+    def setUp(self):
+        """Генератор с замоканным клиентом базы данных."""
+        with patch('src.analytics.report_generator.PostgresClient'):
+            self.generator = ReportGenerator()
+        self.cursor = MagicMock()
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = self.cursor
+        self.generator.db.get_connection.return_value.__enter__.return_value = connection
+        self.generator.db.get_top_movers.return_value = []
+
+    @patch('src.analytics.report_generator.get_topic_stats')
+    def test_daily_report_includes_topics(self, get_topic_stats):
+        """Отчет содержит метрики по темам запросов."""
+        self.cursor.fetchone.return_value = ({'summary': None, 'significant_changes': None},)
+        get_topic_stats.return_value = [
+            {'topic': 'доставка цветов', 'queries': 12, 'clicks': 40,
+             'impressions': 900, 'position': 4.25},
+            {'topic': 'без темы', 'queries': 3, 'clicks': 0,
+             'impressions': 20, 'position': None},
+        ]
+
+        report = self.generator.generate_daily_report(datetime(2024, 9, 2))
+
+        get_topic_stats.assert_called_once_with(self.generator.db, days=7, limit=5)
+        message = self.generator.format_report_message(report)
+        self.assertIn('Темы запросов за неделю', message)
+        self.assertIn('доставка цветов: запросов 12, клики 40, показы 900, позиция 4.2', message)
+        self.assertIn('без темы: запросов 3, клики 0, показы 20\n', message)
+
+    @patch('src.analytics.report_generator.get_topic_stats')
+    def test_topics_error_does_not_cancel_report(self, get_topic_stats):
+        """Ошибка раздела тем не отменяет ежедневный отчет."""
+        self.cursor.fetchone.return_value = ({'summary': None, 'significant_changes': None},)
+        get_topic_stats.side_effect = RuntimeError('no table')
+
+        report = self.generator.generate_daily_report(datetime(2024, 9, 2))
+
+        self.assertEqual(report['topics'], [])
+        self.assertNotIn('Темы запросов', self.generator.format_report_message(report))
+
+    @patch('src.analytics.report_generator.get_topic_stats', return_value=[])
+    def test_daily_report_movers_from_position_changes(self, get_topic_stats):
+        """Значимые изменения берутся из рассчитанных при загрузке position_changes."""
+        self.cursor.fetchone.return_value = ({'summary': None},)
+        self.generator.db.get_top_movers.return_value = [
+            {'query': 'розы', 'old_position': 8.0, 'new_position': 4.666,
+             'position_change': 3.334, 'change_percent': 41.7}
+        ]
+
+        report = self.generator.generate_daily_report(datetime(2024, 9, 2))
+
+        self.generator.db.get_top_movers.assert_called_once_with(
+            datetime(2024, 9, 2).date(), period='day', min_change=3, limit=10
+        )
+        self.assertEqual(report['significant_changes'], [
+            {'query': 'розы', 'current_pos': 4.67, 'prev_pos': 8.0, 'change': 3.33}
+        ])
+        self.assertIn('розы: 8.0 → 4.67 🔼 (3.33)', self.generator.format_report_message(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
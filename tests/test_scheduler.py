@@ -0,0 +1,162 @@
+"""Тесты для планировщика задач с зависимостями."""
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from src.utils.scheduler import DAGScheduler
+
+
+class TestDAGScheduler(unittest.TestCase):
+    """Тесты для класса DAGScheduler."""
+
+    def setUp(self):
+        """Подготовка к тестам."""
+        self.scheduler = DAGScheduler()
+        self.calls = []
+
+    def _job(self, name, delay=0.0):
+        async def run():
+            await asyncio.sleep(delay)
+            self.calls.append(name)
+        return run
+
+    def test_execution_order(self):
+        """Тест порядка выполнения зависимых задач."""
+        self.scheduler.add_job('report', self._job('report'), depends_on=['analyze'])
+        self.scheduler.add_job('analyze', self._job('analyze'), depends_on=['aggregate'])
+        self.scheduler.add_job('aggregate', self._job('aggregate'), depends_on=['collect'])
+        self.scheduler.add_job('collect', self._job('collect'))
+
+        results = asyncio.run(self.scheduler.run())
+
+        self.assertEqual(self.calls, ['collect', 'aggregate', 'analyze', 'report'])
+        self.assertTrue(all(r.status == 'success' for r in results.values()))
+
+    def test_parallel_branches(self):
+        """Тест параллельного выполнения независимых веток."""
+        self.scheduler.add_job('gsc', self._job('gsc', 0.2))
+        self.scheduler.add_job('crm', self._job('crm', 0.2))
+        self.scheduler.add_job('report', self._job('report'), depends_on=['gsc', 'crm'])
+
+        started = time.monotonic()
+        results = asyncio.run(self.scheduler.run())
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(self.calls[-1], 'report')
+        self.assertGreaterEqual(results['gsc'].duration, 0.2)
+
+    def test_retry_with_backoff(self):
+        """Тест повторного запуска упавшей задачи."""
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError('temporary error')
+
+        self.scheduler.add_job('flaky', flaky, retries=2, backoff=0.01)
+        results = asyncio.run(self.scheduler.run())
+
+        self.assertEqual(results['flaky'].status, 'success')
+        self.assertEqual(results['flaky'].attempts, 3)
+
+    def test_failed_dependency_skips_dependents(self):
+        """Тест пропуска задач при падении зависимости."""
+        def broken():
+            raise RuntimeError('boom')
+
+        self.scheduler.add_job('collect', broken, retries=0)
+        self.scheduler.add_job('report', self._job('report'), depends_on=['collect'])
+        self.scheduler.add_job('other', self._job('other'))
+
+        results = asyncio.run(self.scheduler.run())
+
+        self.assertEqual(results['collect'].status, 'failed')
+        self.assertEqual(results['report'].status, 'skipped')
+        self.assertEqual(results['other'].status, 'success')
+        self.assertNotIn('report', self.calls)
+
+    def test_after_waits_without_gating(self):
+        """Задача из after выполняется раньше, но ее ошибка не отменяет запуск."""
+        def broken():
+            self.calls.append('forecast')
+            raise RuntimeError('boom')
+
+        self.scheduler.add_job('forecast', broken, retries=0)
+        self.scheduler.add_job('slow', self._job('slow', 0.05))
+        self.scheduler.add_job(
+            'report', self._job('report'), after=['forecast', 'slow']
+        )
+
+        results = asyncio.run(self.scheduler.run())
+
+        self.assertEqual(results['forecast'].status, 'failed')
+        self.assertEqual(results['report'].status, 'success')
+        self.assertEqual(self.calls[-1], 'report')
+
+    def test_cycle_detection(self):
+        """Тест обнаружения циклических зависимостей."""
+        self.scheduler.add_job('a', self._job('a'), depends_on=['b'])
+        self.scheduler.add_job('b', self._job('b'), depends_on=['a'])
+
+        with self.assertRaises(ValueError):
+            self.scheduler.get_execution_order()
+
+    def test_unknown_dependency(self):
+        """Тест ошибки при неизвестной зависимости."""
+        self.scheduler.add_job('a', self._job('a'), depends_on=['missing'])
+
+        with self.assertRaises(ValueError):
+            self.scheduler.get_execution_order()
+
+    @patch('src.scripts.collect_daily_stats.CredentialsManager')
+    @patch('src.scripts.collect_daily_stats.TelegramService')
+    @patch('src.scripts.collect_daily_stats.GSCService')
+    def test_collect_failure_fails_job(self, gsc, telegram, credentials):
+        """Ошибка сбора статистики не считается успешным выполнением."""
+        from src.scripts.collect_daily_stats import main as collect_daily_stats
+
+        gsc.return_value.get_search_analytics.side_effect = RuntimeError('quota exceeded')
+        self.scheduler.add_job('collect', collect_daily_stats, retries=0)
+        self.scheduler.add_job('aggregate', self._job('aggregate'), depends_on=['collect'])
+
+        results = asyncio.run(self.scheduler.run())
+
+        self.assertEqual(results['collect'].status, 'failed')
+        self.assertEqual(results['aggregate'].status, 'skipped')
+        telegram.return_value.send_message.assert_called_once()
+
+        # Пустой ответ GSC тоже требует повторного сбора
+        gsc.return_value.get_search_analytics.side_effect = None
+        gsc.return_value.get_search_analytics.return_value = {}
+        self.assertIs(collect_daily_stats(), False)
+
+    def test_weekly_report_waits_for_its_sections(self):
+        """Еженедельный отчет ждет задачи своих разделов, но зависит только от агрегации."""
+        from src.scripts.schedule_reports import build_pipeline
+
+        pipeline = build_pipeline(include_weekly=True)
+
+        weekly = pipeline.jobs['weekly_report']
+        self.assertEqual(weekly.depends_on, ['aggregate'])
+        self.assertEqual(
+            set(weekly.after),
+            {'cannibalization', 'forecast', 'drop_risk', 'opportunities'}
+        )
+        self.assertNotIn('weekly_report', build_pipeline().jobs)
+
+    def test_daily_report_not_gated_on_clustering(self):
+        """Ежедневный отчет ждет кластеризацию, но зависит только от агрегации."""
+        from src.scripts.schedule_reports import build_pipeline
+
+        daily = build_pipeline().jobs['daily_report']
+
+        self.assertEqual(daily.depends_on, ['aggregate'])
+        self.assertEqual(daily.after, ['query_clusters'])
+
+
+if __name__ == '__main__':
+    unittest.main()
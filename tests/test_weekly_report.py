@@ -2,6 +2,7 @@
 
 import unittest
 from datetime import datetime, timedelta
+from unittest.mock import MagicMock
 from src.reports.weekly_report import WeeklyReport
 
 
@@ -70,5 +71,112 @@ class TestWeeklyReport(unittest.TestCase):
         self.assertGreater(len(report_text), 0)
 
 
+class TestWeeklyReportComparison(unittest.TestCase):
+    """Тесты для сравнения недель без обращения к реальной базе."""
+    
+    def setUp(self):
+        """Подготовка отчета с замоканным клиентом Supabase."""
+        self.report = WeeklyReport.__new__(WeeklyReport)
+        self.report.db = MagicMock()
+        self.query = self.report.db.client.table.return_value.select.return_value \
+            .gte.return_value.lte.return_value.order.return_value \
+            .order.return_value.range.return_value
+        
+    def _row(self, day, query, clicks, impressions, position, city='алматы'):
+        return {
+            'date': day.date().isoformat(),
+            'query': query,
+            'query_type': 'доставка',
+            'city': city,
+            'clicks': clicks,
+            'impressions': impressions,
+            'position': position
+        }
+        
+    def test_get_comparison_data(self):
+        """Тест сравнения текущей и предыдущей недели по ключу."""
+        start_date, end_date, prev_start, prev_end = self.report.get_date_range()
+        current_day = end_date - timedelta(days=1)
+        previous_day = prev_end - timedelta(days=1)
+        
+        self.query.execute.return_value.data = [
+            self._row(current_day, 'розы', 30, 300, 3.0),
+            self._row(current_day - timedelta(days=1), 'розы', 10, 100, 5.0),
+            self._row(previous_day, 'розы', 20, 200, 6.0),
+            self._row(current_day, 'пионы', 5, 50, 8.0),
+        ]
+        
+        data = self.report.get_comparison_data()
+        
+        queries = {q['query']: q for q in data['queries']}
+        self.assertEqual(queries['розы']['current_clicks'], 40)
+        self.assertEqual(queries['розы']['previous_clicks'], 20)
+        self.assertEqual(queries['розы']['clicks_change'], 100)
+        self.assertEqual(queries['розы']['position_change'], 2.0)
+        self.assertEqual(queries['пионы']['previous_clicks'], 0)
+        
+        self.assertEqual(data['categories']['доставка']['current_clicks'], 45)
+        self.assertEqual(data['categories']['доставка']['previous_clicks'], 20)
+        self.assertEqual(data['cities']['алматы']['current_impressions'], 450)
+        
+        # Выборка ограничена датами сравниваемых недель
+        table = self.report.db.client.table.return_value.select.return_value
+        table.gte.assert_called_once_with('date', prev_start.date().isoformat())
+        
+    def test_pagination(self):
+        """Тест постраничной загрузки строк."""
+        self.report.PAGE_SIZE = 2
+        start_date, end_date, _, _ = self.report.get_date_range()
+        page = [self._row(end_date, 'розы', 1, 10, 2.0)] * 2
+        self.query.execute.side_effect = [
+            MagicMock(data=page),
+            MagicMock(data=page[:1]),
+        ]
+        
+        rows = self.report._fetch_daily_rows(start_date, end_date)
+        
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(self.query.execute.call_count, 2)
+        
+        # Страницы берутся в однозначном порядке по дате и id
+        by_date = self.report.db.client.table.return_value.select.return_value \
+            .gte.return_value.lte.return_value.order
+        by_date.assert_called_with('date')
+        by_date.return_value.order.assert_called_with('id')
+
+        
+    def test_get_cannibalization(self):
+        """Тест загрузки последнего результата поиска каннибализации."""
+        table = self.report.db.client.table.return_value.select.return_value
+        table.order.return_value.limit.return_value.execute.return_value.data = [
+            {'detected_at': '2024-09-08'}
+        ]
+        latest = table.eq.return_value.order.return_value.limit.return_value
+        latest.execute.return_value.data = [{'query': 'розы', 'score': 450.0}]
+        
+        rows = self.report.get_cannibalization(limit=3)
+        
+        self.assertEqual(rows, [{'query': 'розы', 'score': 450.0}])
+        table.eq.assert_called_once_with('detected_at', '2024-09-08')
+        table.eq.return_value.order.return_value.limit.assert_called_once_with(3)
+
+    def test_failed_section_does_not_cancel_report(self):
+        """Ошибка необязательного раздела не отменяет отправку отчета."""
+        self.report.get_comparison_data = MagicMock(return_value={})
+        self.report.get_cannibalization = MagicMock(side_effect=RuntimeError('no table'))
+        self.report.get_forecast_shortfalls = MagicMock(return_value=[])
+        self.report.get_drop_risks = MagicMock(return_value=[{'query': 'розы'}])
+        self.report.get_opportunities = MagicMock(return_value=[])
+        self.report.format_comparison_report = MagicMock(return_value=('отчет', []))
+        self.report.telegram = MagicMock()
+        
+        self.assertTrue(self.report.send_weekly_report())
+        
+        data = self.report.format_comparison_report.call_args[0][0]
+        self.assertEqual(data['cannibalization'], [])
+        self.assertEqual(data['drop_risks'], [{'query': 'розы'}])
+        self.report.telegram.send_message.assert_called_once_with('отчет')
+
+
 if __name__ == '__main__':
     unittest.main()